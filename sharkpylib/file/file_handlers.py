@@ -3,6 +3,8 @@
 import os
 import re
 import pathlib
+import threading
+import collections
 
 from . import files
 
@@ -18,6 +20,63 @@ for d in DIRECTORIES.values():
     d.mkdir(parents=True, exist_ok=True)
 
 
+class FileObjectCache(object):
+    """
+    Process wide LRU cache of objects created from files. Objects are keyed by the absolute path and modification time
+    of the file, the class (or function) used to create the object and its arguments. A changed file gives a new key
+    so the file is read again. Cached objects are shared between callers and should not be modified.
+    """
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._objects = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._objects)
+
+    def _get_key(self, loader, file_path, args, kwargs):
+        if not file_path or not os.path.exists(file_path):
+            raise FileNotFoundError(file_path)
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        return (loader.__module__, loader.__qualname__, file_path, stat.st_mtime_ns, stat.st_size,
+                repr(args), repr(sorted(kwargs.items())))
+
+    def get(self, loader, file_path, *args, **kwargs):
+        """
+        Returns loader(file_path, *args, **kwargs). The object is created only if not already in the cache.
+        :param loader: class or function taking file_path as first argument
+        :param file_path: str
+        :return:
+        """
+        key = self._get_key(loader, file_path, args, kwargs)
+        with self._lock:
+            if key in self._objects:
+                self._objects.move_to_end(key)
+                return self._objects[key]
+        file_object = loader(file_path, *args, **kwargs)
+        with self._lock:
+            self._objects[key] = file_object
+            self._objects.move_to_end(key)
+            while len(self._objects) > self.maxsize:
+                self._objects.popitem(last=False)
+        return file_object
+
+    def clear(self):
+        with self._lock:
+            self._objects.clear()
+
+
+FILE_OBJECT_CACHE = FileObjectCache()
+
+
+def get_cached_file_object(loader, file_path, *args, **kwargs):
+    """
+    Returns loader(file_path, *args, **kwargs) from the process wide FILE_OBJECT_CACHE.
+    """
+    return FILE_OBJECT_CACHE.get(loader, file_path, *args, **kwargs)
+
+
 class Directory(object):
 
     def __init__(self, main_directory, *directories, file_type='', match_string='', match_format='', prefix=''):
@@ -128,7 +187,7 @@ class MappingDirectory(Directory):
 
     def get_file_object(self, file_id, **kwargs):
         file_path = self.get_path(file_id)
-        file_object = files.MappingFile(file_path, **kwargs)
+        file_object = get_cached_file_object(files.MappingFile, file_path, **kwargs)
         self._add_file_object(file_id, file_object)
         return file_object
 
@@ -145,7 +204,7 @@ class SynonymDirectory(Directory):
 
     def get_file_object(self, file_id, **kwargs):
         file_path = self.get_path(file_id)
-        file_object = files.SynonymFile(file_path, **kwargs)
+        file_object = get_cached_file_object(files.SynonymFile, file_path, **kwargs)
         self._add_file_object(file_id, file_object)
         return file_object
 
@@ -162,7 +221,7 @@ class ListDirectory(Directory):
 
     def get_file_object(self, file_id, **kwargs):
         file_path = self.get_path(file_id)
-        file_object = files.ListFile(file_path, **kwargs)
+        file_object = get_cached_file_object(files.ListFile, file_path, **kwargs)
         self._add_file_object(file_id, file_object)
         return file_object
 
@@ -179,7 +238,7 @@ class MultiListDirectory(Directory):
 
     def get_file_object(self, file_id, **kwargs):
         file_path = self.get_path(file_id)
-        file_object = files.MultiListFile(file_path, **kwargs)
+        file_object = get_cached_file_object(files.MultiListFile, file_path, **kwargs)
         self._add_file_object(file_id, file_object)
         return file_object
 
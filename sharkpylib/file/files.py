@@ -42,10 +42,10 @@ class MappingFile(object):
 
         self.columns = self.df.columns[:]
 
-    def get(self, item, missing_value=None, from_col=None, to_col=None, **kwargs):
-        if not self.file_path:
-            return item
+        # Dict indexes for (from_col, to_col) created on first use
+        self._indexes = {}
 
+    def _get_columns(self, from_col=None, to_col=None):
         if not from_col:
             from_col = self.from_col
         if not to_col:
@@ -53,15 +53,28 @@ class MappingFile(object):
 
         if not all([from_col, to_col]):
             raise ValueError
+        return from_col, to_col
+
+    def get_index(self, from_col=None, to_col=None):
+        """
+        Returns a dict mapping from_col to to_col. The first row is used for duplicates in from_col.
+        The dict is created once per (from_col, to_col).
+        :param from_col:
+        :param to_col:
+        :return: dict
+        """
+        from_col, to_col = self._get_columns(from_col, to_col)
+        key = (from_col, to_col)
+        if key not in self._indexes:
+            df = self.df.drop_duplicates(subset=from_col, keep='first')
+            self._indexes[key] = dict(zip(df[from_col], df[to_col]))
+        return self._indexes[key]
 
-        # Saving current columns
-        # self.from_col = from_col
-        # self.to_col = to_col
+    def get(self, item, missing_value=None, from_col=None, to_col=None, **kwargs):
+        if not self.file_path:
+            return item
 
-        result = self.df.loc[self.df[from_col] == item, to_col]
-        value = ''
-        if len(result):
-            value = result.values[0]
+        value = self.get_index(from_col, to_col).get(item, '')
 
         if value:
             return str(value)
@@ -71,6 +84,22 @@ class MappingFile(object):
             else:
                 return value
 
+    def get_mapped_series(self, series, missing_value=None, from_col=None, to_col=None, **kwargs):
+        """
+        Maps a pandas Series (or iterable). Same result as method get for each item.
+        :param series:
+        :param kwargs: Se options in method get
+        :return: pandas Series
+        """
+        if not isinstance(series, pd.Series):
+            series = pd.Series(list(series), dtype=object)
+        if not self.file_path:
+            return series.copy()
+        mapped = series.map(self.get_index(from_col, to_col)).fillna('').astype(str)
+        if missing_value:
+            mapped = mapped.where(mapped != '', missing_value)
+        return mapped
+
     def get_mapped_list(self, item_list, **kwargs):
         """
         Maps a iterable
@@ -78,12 +107,7 @@ class MappingFile(object):
         :param kwargs: Se options in method get
         :return:
         """
-
-        output_list = []
-        for k, item in enumerate(item_list):
-            mapped_item = self.get(item, **kwargs)
-            output_list.append(mapped_item)
-        return output_list
+        return self.get_mapped_series(item_list, **kwargs).tolist()
 
 
 class SynonymFile(object):
@@ -106,6 +106,21 @@ def latlon_distance(origin, destination):
     return km 
 
 
+def latlon_distance_array(lat1, lon1, lat2, lon2):
+    """
+    Vectorized version of latlon_distance. Arguments are arrays (or scalars) in decimal degrees.
+    :return: great circle distance in km
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, [lat1, lon1, lat2, lon2])
+    # haversine formula
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    a = np.sin(dlat/2.)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon/2.)**2
+    c = 2 * np.arcsin(np.sqrt(a))
+    km = 6363 * c  # Earth radius at around 57 degrees North
+    return km
+
+
 """
 ========================================================================
 ========================================================================
@@ -5,31 +5,47 @@
 import os
 import re
 import codecs
+import operator
 import pandas as pd
 import sharkpylib
 
 
-def convert_standard_format_to_nodc_standard_format(file_path, prefix='nodc', **kwargs):
+def convert_standard_format_to_nodc_standard_format(file_path, prefix='nodc', chunk_size=10000, **kwargs):
+    """
+    Converts a standard format file to the SMHI nodc standard format (three QC columns for each parameter).
+    The file is read twice: first for metadata (comment lines) and header, then data rows are converted and written
+    in chunks of chunk_size rows. Memory use does not depend on the size of the file.
+    :param file_path: str
+    :param prefix: prefix of the output file. If not given the file is overwritten
+    :param chunk_size: number of rows written at a time
+    :param kwargs: comment_id, encoding (for output file), data_delimiter
+    :return: output file path
+    """
     comment_id = kwargs.get('comment_id', '//')
     encoding = kwargs.get('encoding', 'cp1252')
     data_delimiter = kwargs.get('data_delimiter', '\t')
+
+    # Metadata lines are written first in output file
     metadata = []
     header = []
-    data = []
     with codecs.open(file_path, encoding='cp1252') as fid:
         for line in fid:
             if line.startswith(comment_id):
                 metadata.append(line)
-            else:
-                split_line = re.split(data_delimiter, line.strip('\n\r'))
-                split_line = [item.strip() for item in split_line]
-                if not header:
-                    header = split_line
-                else:
-                    data.append(split_line)
+            elif not header:
+                header = _split_line(line, data_delimiter)
+
+    new_columns, added_columns = sharkpylib.mappinglib.get_nodc_qc_column_layout(header)
 
-    df = pd.DataFrame(data, columns=header)
-    updated_df = sharkpylib.mappinglib.add_nodc_qc_columns_to_df(df)
+    # Each new row is picked from the row extended with the values of the added columns
+    added_values = [added_columns[col] for col in new_columns if col in added_columns]
+    column_index = dict((col, k) for k, col in enumerate(header))
+    added_index = dict((col, len(header) + k) for k, col in enumerate([col for col in new_columns
+                                                                         if col in added_columns]))
+    positions = [column_index[col] if col in column_index else added_index[col] for col in new_columns]
+    get_new_row = operator.itemgetter(*positions)
+    if len(positions) == 1:
+        get_new_row = lambda row, position=positions[0]: (row[position], )
 
     # Saving file
     if prefix:
@@ -39,13 +55,56 @@ def convert_standard_format_to_nodc_standard_format(file_path, prefix='nodc', **
     else:
         output_file_path = file_path
 
-    data_dict = updated_df.to_dict('split')
+    # Written to a temporary file so that no output (or a partly overwritten input file) is left if a line is invalid
+    temp_file_path = output_file_path + '.tmp'
+    try:
+        with codecs.open(file_path, encoding='cp1252') as fid_in, \
+                codecs.open(temp_file_path, 'w', encoding=encoding) as fid_out:
+            fid_out.write(''.join(metadata))
+            # Write column header
+            fid_out.write(data_delimiter.join(new_columns))
+            fid_out.write('\n')
+            chunk = []
+            header_found = False
+            for line in fid_in:
+                if line.startswith(comment_id):
+                    continue
+                if not header_found:
+                    header_found = True
+                    continue
+                if not line.strip('\n\r'):
+                    continue
+                row = _split_line(line, data_delimiter)
+                if len(row) != len(header):
+                    raise ValueError(f'{len(header)} columns in header but {len(row)} in data line: {line.strip()}')
+                row.extend(added_values)
+                chunk.append(data_delimiter.join(get_new_row(row)))
+                if len(chunk) >= chunk_size:
+                    fid_out.write('\n'.join(chunk) + '\n')
+                    chunk = []
+            if chunk:
+                fid_out.write('\n'.join(chunk) + '\n')
+    except Exception:
+        if os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+        raise
+
+    os.replace(temp_file_path, output_file_path)
+    return output_file_path
+
+
+def convert_standard_format_directory_to_nodc_standard_format(directory, prefix='nodc', file_type='.txt', **kwargs):
+    """
+    Converts all standard format files in directory, one file at a time.
+    See convert_standard_format_to_nodc_standard_format.
+    :return: list of output file paths
+    """
+    file_names = [file_name for file_name in sorted(os.listdir(directory))
+                  if file_name.endswith(file_type) and not (prefix and file_name.startswith(f'{prefix}_'))]
+    return [convert_standard_format_to_nodc_standard_format(os.path.join(directory, file_name), prefix=prefix,
+                                                            **kwargs) for file_name in file_names]
+
 
-    with codecs.open(output_file_path, 'w', encoding=encoding) as fid:
-        fid.write(''.join(metadata))
-        # Write column header
-        fid.write(data_delimiter.join(data_dict['columns']))
-        fid.write('\n')
-        for line in data_dict['data']:
-            fid.write(data_delimiter.join(line))
-            fid.write('\n')
\ No newline at end of file
+def _split_line(line, data_delimiter):
+    split_line = re.split(data_delimiter, line.strip('\n\r'))
+    return [item.strip() for item in split_line]
@@ -14,6 +14,7 @@ except:
 
 from .exceptions import *
 from .. import utils
+from ..qc.instrumentation import instrumentation, count_changed_flags
 
 
 import pickle
@@ -632,15 +633,47 @@ class GISMOqcManager(object):
 
         qc_routine_object = self.qc_routines.get(qc_routine)
 
+        start = instrumentation.start()
+        if start is not None:
+            flags_before = [self._get_qf_columns(gismo_object) for gismo_object in gismo_objects]
+
         # Run qc
         qc_routine_object.run_qc(gismo_objects, qc_routine=qc_routine, **kwargs)
         print('qc_routine_object', qc_routine_object)
 
+        if start is not None:
+            self._add_instrumentation_records(start, qc_routine, gismo_objects, flags_before)
+
         # Add comment in metadata
         if qc_routine_object.add_info_to_metadata:
             user = kwargs.pop('user', 'unknown user')
             add_qc_comment_in_metadata(gismo_objects=gismo_objects, text=qc_routine, user=user)
 
+    @staticmethod
+    def _get_qf_columns(gismo_object):
+        """
+        :return: dict with parameter as key and a copy of the corresponding quality flag column as value
+        """
+        qf_columns = {}
+        for par in gismo_object.get_parameter_list():
+            qpar = gismo_object.get_qf_par(par)
+            if qpar and qpar in gismo_object.df:
+                qf_columns[par] = gismo_object.df[qpar].values.copy()
+        return qf_columns
+
+    def _add_instrumentation_records(self, start, qc_routine, gismo_objects, flags_before):
+        """
+        Adds rows processed and changed flags per parameter to the instrumentation registry.
+        """
+        for gismo_object, qf_columns in zip(gismo_objects, flags_before):
+            file_id = str(getattr(gismo_object, 'file_id', ''))
+            instrumentation.add(start, source=self.__class__.__name__, routine=qc_routine,
+                                rows=len(gismo_object.df), file_id=file_id)
+            for par, old_flags in qf_columns.items():
+                new_flags = gismo_object.df[gismo_object.get_qf_par(par)].values
+                instrumentation.add(start, source=self.__class__.__name__, routine=qc_routine, parameter=par,
+                                    flag_counts=count_changed_flags(old_flags, new_flags), file_id=file_id)
+
     def get_qc_options(self, qc_routine):
         self._check_qc_routine(qc_routine)
         qc_object = self.qc_routines.get(qc_routine)
@@ -6,7 +6,94 @@ Created on Tue Mar 07 09:36:32 2017
 
 @author:
 """
+import os
+import json
 import codecs
+import threading
+
+from sharkpylib.file.file_handlers import get_cached_file_object
+
+_shared_mappings = {}
+_shared_mappings_lock = threading.Lock()
+
+
+def get_shared_mapping(mapping_class, settings_object=None, mapping_files=None):
+    """
+    Returns a mapping object (ParameterMapping or StationMapping) that is shared by all callers using the same mapping
+    file and settings. The object is created once per key and must not be modified.
+    Key is the absolute path, modification time and size of the mapping file and the settings in
+    mapping_class.settings_section.
+    :param mapping_class: ParameterMapping or StationMapping
+    :param settings_object: SamplingTypeSettings
+    :param mapping_files: MappingDirectory
+    :return:
+    """
+    section = mapping_class.settings_section
+    file_path = mapping_files.get_path(settings_object.get_data(section, 'file_name'))
+    if not file_path or not os.path.exists(file_path):
+        return mapping_class(settings_object=settings_object, mapping_files=mapping_files)
+    stat = os.stat(file_path)
+    key = (mapping_class.__name__, os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size,
+           json.dumps(settings_object.get_data(section), sort_keys=True, default=str))
+    with _shared_mappings_lock:
+        if key not in _shared_mappings:
+            _shared_mappings[key] = mapping_class(settings_object=settings_object, mapping_files=mapping_files)
+        return _shared_mappings[key]
+
+
+def clear_shared_mappings():
+    with _shared_mappings_lock:
+        _shared_mappings.clear()
+
+
+def _read_column_mapping_file(file_path, internal_column=None, external_column=None, unit_column=None,
+                              add_all_matches=False):
+    """
+    Reads a column mapping file. Used by ColumnMapping.
+    :return: dict with internal_to_external, external_to_internal and internal_to_unit
+    """
+    internal_to_external = {}
+    external_to_internal = {}
+    internal_to_unit = {}
+    fid = codecs.open(file_path, 'r')
+
+    for r, line in enumerate(fid):
+        if not line.strip():
+            continue
+        if line.startswith('#'): # Comment
+            continue
+        split_line = [item.strip() for item in line.split('\t')]
+        if r == 0:
+            header = split_line
+        else:
+            line_dict = dict(zip(header, split_line))
+            try:
+                internal_value = ' '.join([line_dict[item] for item in internal_column]).strip()
+                external_value = ' '.join([line_dict[item] for item in external_column]).strip()
+            except:
+                pass
+
+            if add_all_matches:
+                if internal_value not in internal_to_external:
+                    internal_to_external[internal_value] = []
+                if external_value not in external_to_internal:
+                    external_to_internal[external_value] = []
+
+                internal_to_external[internal_value].append(external_value)
+                external_to_internal[external_value].append(internal_value)
+            else:
+                internal_to_external[internal_value] = external_value
+                external_to_internal[external_value] = internal_value
+
+            # Add unit column if given
+            if unit_column:
+                internal_to_unit[internal_value] = line_dict[unit_column]
+            else:
+                internal_to_unit[internal_value] = ''
+    fid.close()
+    return dict(internal_to_external=internal_to_external,
+                external_to_internal=external_to_internal,
+                internal_to_unit=internal_to_unit)
 
 
 """
@@ -90,45 +177,16 @@ class ColumnMapping():
  
     #==========================================================================
     def _load_data(self):
-        self.internal_to_external = {}
-        self.external_to_internal = {}
-        self.internal_to_unit = {}
-        fid = codecs.open(self.local_file_path, 'r')
-         
-        for r, line in enumerate(fid):
-            if not line.strip():
-                continue
-            if line.startswith('#'): # Comment
-                continue
-            split_line = [item.strip() for item in line.split('\t')]
-            if r == 0:
-                header = split_line
-            else:
-                line_dict = dict(zip(header, split_line))
-                try:
-                    internal_value = ' '.join([line_dict[item] for item in self.internal_column]).strip()
-                    external_value = ' '.join([line_dict[item] for item in self.external_column]).strip()
-                except:
-                    pass
-                
-                if self.add_all_matches:
-                    if internal_value not in self.internal_to_external:
-                        self.internal_to_external[internal_value] = []
-                    if external_value not in self.external_to_internal:
-                        self.external_to_internal[external_value] = []
-                    
-                    self.internal_to_external[internal_value].append(external_value)
-                    self.external_to_internal[external_value].append(internal_value)
-                else:
-                    self.internal_to_external[internal_value] = external_value
-                    self.external_to_internal[external_value] = internal_value
-
-                # Add unit column if given
-                if self.unit_column:
-                    self.internal_to_unit[internal_value] = line_dict[self.unit_column]
-                else:
-                    self.internal_to_unit[internal_value] = ''
-        fid.close()
+        # Parsed data is shared between objects using the same file and columns
+        data = get_cached_file_object(_read_column_mapping_file,
+                                      self.local_file_path,
+                                      internal_column=self.internal_column,
+                                      external_column=self.external_column,
+                                      unit_column=self.unit_column,
+                                      add_all_matches=self.add_all_matches)
+        self.internal_to_external = data['internal_to_external']
+        self.external_to_internal = data['external_to_internal']
+        self.internal_to_unit = data['internal_to_unit']
  
     #==========================================================================
     def get_external(self, internal):
@@ -156,7 +214,8 @@ class ColumnMapping():
 ================================================================================
 """
 class ParameterMapping(ColumnMapping):
-    
+    settings_section = 'parameter_mapping'
+
     #==========================================================================
     def __init__(self, settings_object=None, mapping_files=None):
 
@@ -183,12 +242,48 @@ class ParameterMapping(ColumnMapping):
 
 
 
+def _read_station_mapping_file(file_path, encoding=None, header_starts_with=None, external_column=None,
+                               internal_column=None):
+    """
+    Reads a station mapping file. Used by StationMapping.
+    :return: dict with header, internal_to_external and external_to_internal
+    """
+    internal_to_external = {}
+    external_to_internal = {}
+
+    fid = codecs.open(file_path, 'r', encoding=encoding)
+    header = False
+    for r, line in enumerate(fid):
+        line = line.strip()
+        split_line = [item.strip() for item in line.split('\t')]
+        if not line:
+            continue
+        if line.startswith('#'):
+            continue
+        if line.startswith(header_starts_with):
+            header = split_line
+        elif header:
+            line_dict = dict(zip(header, split_line))
+
+            external = line_dict[external_column]
+            internal = line_dict[internal_column]
+
+            internal_to_external[internal] = external
+            external_to_internal[external] = internal
+
+    fid.close()
+    return dict(header=header,
+                internal_to_external=internal_to_external,
+                external_to_internal=external_to_internal)
+
+
 """
 ================================================================================
 ================================================================================
 ================================================================================
 """
 class StationMapping():
+    settings_section = 'station_mapping'
 
     #===========================================================================
     def __init__(self, 
@@ -260,40 +355,16 @@ class StationMapping():
         # self.external_by_type = {}
 
         
-        # Load data
-        fid = codecs.open(self.local_file_path, 'r', encoding=self.encoding)
-        self.header = False
-        for r, line in enumerate(fid):
-            line = line.strip()
-            split_line = [item.strip() for item in line.split('\t')]
-            if not line:
-                continue
-            if line.startswith('#'):
-                continue
-            if line.startswith(self.header_starts_with):
-                self.header = split_line
-            elif self.header:
-                line_dict = dict(zip(self.header, split_line))
-
-                external = line_dict[self.external_column]
-                internal = line_dict[self.internal_column]
-                # platform_type = line_dict[self.platform_type_column]
-                
-                self.internal_to_external[internal] = external
-                # self.internal_to_type[internal] = platform_type
-                
-                self.external_to_internal[external] = internal
-                # self.external_to_type[external] = platform_type
-                
-                # if platform_type not in self.internal_by_type:
-                #     self.internal_by_type[platform_type] = []
-                # self.internal_by_type[platform_type].append(internal)
-                #
-                # if platform_type not in self.external_by_type:
-                #     self.external_by_type[platform_type] = []
-                # self.external_by_type[platform_type].append(external)
-                
-        fid.close()
+        # Load data. Parsed data is shared between objects using the same file and columns
+        data = get_cached_file_object(_read_station_mapping_file,
+                                      self.local_file_path,
+                                      encoding=self.encoding,
+                                      header_starts_with=self.header_starts_with,
+                                      external_column=self.external_column,
+                                      internal_column=self.internal_column)
+        self.header = data['header']
+        self.internal_to_external = data['internal_to_external']
+        self.external_to_internal = data['external_to_internal']
 
     # #===========================================================================
     # def get_ferrybox_list(self):
@@ -59,6 +59,8 @@ class ProfileQCrangeSimple(object):
             data = gismo_object.get_data(*par_list)
             qf_data = gismo_object.get_qf_list(*par_list)
             t = gismo_object.get_time()[0]
+            all_depths = list(data['depth'])
+            point_time = np.full(len(all_depths), np.datetime64(pd.Timestamp(t)))
 
 
             for par in qf_data:
@@ -71,8 +73,9 @@ class ProfileQCrangeSimple(object):
                 #             break
 
                 qf_list = list(qf_data[par])
-                limits = self.limit_object.get_limit(limit_par, 'range_min', 'range_max', time=t)
-                all_depths = list(data['depth'])
+                # Limits per sample (depth is only used if given in the range file)
+                limits = self.limit_object.get_limits_for_points(limit_par, 'range_min', 'range_max',
+                                                                 time=point_time, depth=data['depth'])
                 if limits is not None:
                     result = self.qc_object.range_check(data=list(data[par]),
                                                         qf=qf_list,
@@ -242,6 +245,32 @@ class QCrangeDirectory(object):
 
         return file_object.get_limit(*args, **kwargs)
 
+    def get_limits_for_points(self, par, *args, **kwargs):
+        """
+        Returns the limits for items in args specified for parameter par for every point given in kwargs
+        (see QCrangeFile.get_limits_for_points). Ambiguous points are logged.
+
+        If no file is found for the parameter None is returned.
+
+        :param par:
+        :param args:
+        :param kwargs:
+        :return: dict with item as key and numpy array (aligned with the points) as value
+        """
+        if not self.parameters.get(par):
+            return None
+
+        if not self.file_objects.get(par):
+            self._add_file(par)
+
+        file_object = self.file_objects.get(par)
+
+        limits, ambiguous = file_object.get_limits_for_points(*args, **kwargs)
+        if ambiguous.any():
+            gismo_logger.warning('{} points match more than one row in range file for parameter {}. '
+                                 'First matching row is used.'.format(np.count_nonzero(ambiguous), par))
+        return limits
+
     def get_parameter_list(self):
         return sorted(self.parameters)
 
@@ -273,6 +302,10 @@ class QCrangeFile(object):
         kw.update(kwargs)
         self.df = pd.read_csv(file_path, **kw)
 
+        # Bins of each dimension and lookup grids for get_limits_for_points
+        self._dimensions = {}
+        self._lookup_grids = {}
+
     def _get_boolean_for_datetime_object(self, datetime_object):
         """
         Checks month in datetime object.
@@ -345,6 +378,114 @@ class QCrangeFile(object):
         return return_dict
 
 
+    def get_limits_for_points(self, *args, time=None, lat=None, lon=None, depth=None):
+        """
+        Vectorized version of get_limit. time, lat, lon and depth are arrays of the same length (one value per point).
+        Filters that are not given, or not present in the file, are not used.
+
+        The bins of each dimension are split into non overlapping intervals (pd.IntervalIndex) and a lookup grid
+        over the intervals is built. Bins and grids only depend on the file and are kept on the instance, so they are
+        built once for every combination of filters. Every point is then looked up in the grid without looping.
+
+        Points matching no row get nan. Points matching several rows (ambiguous overlaps in the file) get the value
+        of the first matching row and are reported in the returned boolean array instead of raising.
+
+        :param args: items (columns) to return
+        :return: tuple (dict with item as key and float array as value, boolean array True for ambiguous points)
+        """
+        names = []
+        codes = []
+        if time is not None and 'month' in self.df:
+            month = pd.DatetimeIndex(pd.to_datetime(np.atleast_1d(time))).month
+            names.append('month')
+            codes.append(self._get_dimension('month')[0].get_indexer(np.asarray(month, dtype=float)))
+        for values, col in [(lat, 'lat'), (lon, 'lon'), (depth, 'depth')]:
+            if values is None or col + '_min' not in self.df or col + '_max' not in self.df:
+                continue
+            values = np.atleast_1d(np.asarray(values, dtype=float))
+            if col == 'depth':
+                values = np.abs(values)
+            names.append(col)
+            codes.append(self._get_dimension(col)[0].get_indexer(values))
+
+        if not names:
+            raise GISMOExceptionMissingInputArgument('No filter given for points')
+
+        first_row, nr_rows = self._get_lookup_grid(tuple(names))
+
+        nr_points = len(codes[0])
+        codes = np.array(codes)
+        inside = (codes >= 0).all(axis=0)
+        rows = np.full(nr_points, -1, dtype=int)
+        ambiguous = np.zeros(nr_points, dtype=bool)
+        cell = np.ravel_multi_index(tuple(codes[:, inside]), first_row.shape)
+        rows[inside] = first_row.ravel()[cell]
+        ambiguous[inside] = nr_rows.ravel()[cell] > 1
+
+        matched = rows >= 0
+        return_dict = {}
+        for item in args:
+            if item in self.df.columns:
+                values = np.full(nr_points, np.nan)
+                values[matched] = self.df[item].values[rows[matched]].astype(float)
+                return_dict[item] = values
+        return return_dict, ambiguous
+
+    def _get_lookup_grid(self, names):
+        """
+        :param names: tuple of the dimensions used (month, lat, lon, depth)
+        :return: tuple (first matching row in every cell (-1 if none), number of matching rows in every cell)
+        """
+        if names not in self._lookup_grids:
+            dimensions = [self._get_dimension(name) for name in names]
+            shape = tuple(len(bins) for bins, start, stop in dimensions)
+            first_row = np.full(shape, -1, dtype=int)
+            nr_rows = np.zeros(shape, dtype=int)
+            valid_rows = np.all([(start >= 0) & (stop > start) for bins, start, stop in dimensions], axis=0)
+            for row in np.flatnonzero(valid_rows):
+                cells = tuple(slice(start[row], stop[row]) for bins, start, stop in dimensions)
+                nr_rows[cells] += 1
+                region = first_row[cells]
+                region[region == -1] = row
+            self._lookup_grids[names] = (first_row, nr_rows)
+        return self._lookup_grids[names]
+
+    def _get_dimension(self, name):
+        """
+        :param name: month, lat, lon or depth
+        :return: tuple (bins, first and last (exclusive) bin of each row in self.df)
+        """
+        if name not in self._dimensions:
+            if name == 'month':
+                self._dimensions[name] = self._get_month_dimension()
+            else:
+                self._dimensions[name] = self._get_interval_dimension(name)
+        return self._dimensions[name]
+
+    def _get_month_dimension(self):
+        """
+        :return: tuple (months, first and last (exclusive) code of each row in self.df)
+        """
+        months = pd.Index(np.unique(self.df['month'].dropna().astype(float)))
+        start = months.get_indexer(self.df['month'].astype(float))
+        stop = np.where(start >= 0, start + 1, -1)
+        return months, start, stop
+
+    def _get_interval_dimension(self, col):
+        """
+        :param col: lat, lon or depth
+        :return: tuple (intervals, first and last (exclusive) code of each row in self.df)
+        """
+        min_values = self.df[col + '_min'].astype(float).values
+        max_values = self.df[col + '_max'].astype(float).values
+        breaks = np.unique(np.concatenate([min_values, max_values]))
+        breaks = breaks[~np.isnan(breaks)]
+        intervals = pd.IntervalIndex.from_breaks(breaks, closed='left')
+        start = np.where(np.isnan(min_values), -1, np.searchsorted(breaks, min_values))
+        stop = np.where(np.isnan(max_values), -1, np.searchsorted(breaks, max_values))
+        return intervals, start, stop
+
+
 class QCdensityFile(object):
     """
     Reads a column ascii file containing combinations of parameters that should be used to calculate density.
@@ -7,6 +7,7 @@
 import os
 import datetime
 import shutil
+import multiprocessing
 from pathlib import Path
 
 from sharkpylib.odv.spreadsheet import SpreadsheetFile
@@ -33,6 +34,7 @@ try:
 except:
     pass
 from sharkpylib.qc.qc_default import QCBlueprint
+from sharkpylib.qc.instrumentation import instrumentation, count_changed_flags
 
 import logging
 gismo_logger = logging.getLogger('gismo_session')
@@ -217,11 +219,14 @@ class QCiocftp(GISMOqc):
     Updated 20181001
 
     Class handles quality control based on QC from IOCFTP.
+    Several gismo objects can be handled in one call. Each object is converted to a float matrix and the
+    IOCFTP QC is run in a process pool (if processes > 1). Resulting QF columns are written back to the objects.
     """
+    name = 'iocftp_qc0'
+    qc_logger_name = 'QC_check_file.py'
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.name = 'iocftp_qc0'
 
         gismo_root_path = os.path.dirname(os.path.abspath(__file__))
         # Paths must end with /
@@ -235,112 +240,134 @@ class QCiocftp(GISMOqc):
 
     def _set_config_paths(self):
         # Set global path to config files
-        IOCFTP_QC.set_config_path(self.cfg_directory)
-        IOCFTP_QC.set_qc_path(self.qc_directory)
+        _init_iocftp_qc(self.cfg_directory, self.qc_directory)
+
+    def _get_log_path(self):
+        return os.path.join(self.log_directory, 'LOG_QC_check_file_' + datetime.datetime.now().strftime('%Y%m%d_%H%M%S') + '.log')
 
     # ==================================================================
-    def run_qc(self, gismo_object):
-        """
-        Run QC. gismo_object must have attribute df for qc to work.
+    def run_qc(self, gismo_objects, processes=None, **kwargs):
         """
+        Run QC. gismo_objects can be a single gismo object or a list of gismo objects.
+        Every gismo object must have attribute df for qc to work.
 
-        def _to_float(value):
-            try:
-                return float(value)
-            except:
-                # print('value is "{}" of type {}'.format(value, type(value)))
-                return np.nan
-
-        if not hasattr(gismo_object, 'df'):
-            raise GISMOExceptionInvalidInputArgument
-
+        :param gismo_objects: gismo object or list of gismo objects
+        :param processes: number of worker processes. Runs in the current process if None or < 2.
+        :return:
+        """
+        if not isinstance(gismo_objects, (list, tuple)):
+            gismo_objects = [gismo_objects]
 
-        # Setup log
-        log = logging.getLogger("QC_check_file.py")
-        log.setLevel(logging.DEBUG)
-        log_path = os.path.join(self.log_directory, 'LOG_QC_check_file_' + datetime.datetime.now().strftime('%Y%m%d_%H%M%S') + '.log')
+        for gismo_object in gismo_objects:
+            if not hasattr(gismo_object, 'df'):
+                raise GISMOExceptionInvalidInputArgument
 
-        handler = logging.FileHandler(log_path)
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
-        log.addHandler(handler)
-        log.debug('Test debug')
+        start = instrumentation.start()
+        log_path = self._get_log_path()
+        handler = _add_iocftp_log_handler(self.qc_logger_name, log_path)
+        try:
+            jobs = []
+            for gismo_object in gismo_objects:
+                columns = [col for col in gismo_object.df.columns if col and col in gismo_object.original_columns]
+                header_nr = np.array([int(float(col)) for col in columns])
+                data_matrix_in = get_float_matrix(gismo_object.df, columns)
+                jobs.append((str(gismo_object.internal_station_name),
+                             str(gismo_object.external_station_name),
+                             data_matrix_in,
+                             header_nr,
+                             self.qc_logger_name))
+
+            gismo_logger.info('Running {} on {} file(s)'.format(self.name, len(jobs)))
+            if processes and processes > 1 and len(jobs) > 1:
+                with multiprocessing.Pool(processes=processes,
+                                          initializer=_init_iocftp_qc,
+                                          initargs=(self.cfg_directory, self.qc_directory,
+                                                    self.qc_logger_name, log_path)) as pool:
+                    results = pool.starmap(_run_iocftp_qc, jobs)
+            else:
+                results = [_run_iocftp_qc(*job) for job in jobs]
+        finally:
+            if handler:
+                logging.getLogger(self.qc_logger_name).removeHandler(handler)
+                handler.close()
 
-        # Create copy of df so we can compare later
-        df = gismo_object.df.copy(deep=True)
+        for gismo_object, data_matrix_out in zip(gismo_objects, results):
+            nr_changed = self._set_qf_columns(gismo_object, data_matrix_out, start=start)
+            gismo_logger.info('{}: {} flags changed in file {}'.format(self.name, nr_changed, gismo_object.file_id))
 
-        columns = []
-        # add_columns = []  # last columns in df, not used in qc, separate them in this loop
-        for item in df.columns:
-            if not item:
+    def _set_qf_columns(self, gismo_object, data_matrix_out, start=None):
+        """
+        Writes the QF columns in data_matrix_out back to gismo_object.df.
+        :param start: value from instrumentation.start(). If given changed flags are added to the registry
+        :return: number of changed flag values
+        """
+        columns = [col for col in gismo_object.df.columns if col and col in gismo_object.original_columns]
+        column_index = {col: i for i, col in enumerate(columns)}
+        nr_changed = 0
+        if start is not None:
+            instrumentation.add(start, source=self.__class__.__name__, routine=self.name,
+                                rows=len(gismo_object.df), file_id=str(gismo_object.file_id))
+        for par in columns:
+            qpar = gismo_object.get_qf_par(par)
+            if not qpar or qpar not in column_index:
                 continue
-            if item in gismo_object.original_columns:
-                columns.append(item)
-                # if item in [8181, '8181']:
-                #     # print('TYPE', type(df[item].values[0]))
-                #     df[item].astype(float)
-                # try:
-                #     # df[item].astype(float)
-                #     columns.append(item)
-                # except:
-                #     print('ITEM', item)
-            # else:
-            #     add_columns.append(item)
-
-        columns = np.asarray(columns)  # header: converting list to nd array
-        # print()
-        # print('='*50)
-        # print('COLUMNS')
-        # print('-' * 50)
-        # for col in columns:
-        #     print(col, type(col))
-        # print('-' * 50)
-        df_to_np = df[columns]  # choose original cols (no '' or non-string)
-        # data_matrix_in = df_to_np.astype('float')  # converting to df with float
-        # data_matrix_in = data_matrix_in.values  # headers lost in conversion to array
-        for col in df_to_np.columns:
-            df_to_np[col] = df_to_np[col].apply(_to_float)
-        data_matrix_in = df_to_np.values  # headers lost in conversion to array
-
-        columns = np.asfarray(columns, float)  # converting columns to float
-        columns = np.array([int(item) for item in columns])  # and then to integer
-
-        # running qc script ===========================================================
-
-        station_name = str(gismo_object.internal_station_name)
-        station_nr = str(gismo_object.external_station_name)
+            new_flags = data_matrix_out[:, column_index[qpar]].astype(int).astype(str)
+            if start is not None:
+                instrumentation.add(start, source=self.__class__.__name__, routine=self.name, parameter=par,
+                                    flag_counts=count_changed_flags(gismo_object.df[qpar].values, new_flags),
+                                    file_id=str(gismo_object.file_id))
+            nr_changed += int(np.count_nonzero(gismo_object.df[qpar].values != new_flags))
+            gismo_object.df[qpar] = new_flags
+        return nr_changed
 
-        try:
-            data_matrix_out = IOCFTP_QC.QC_CHECK_FERRYBOX(station_name,
-                                                          station_nr,
-                                                          data_matrix_in,
-                                                          columns,
-                                                          "QC_check_file.py",
-                                                          '')
-        except NameError as e:
-            raise
 
-        # converting qc-out nparray to dataframe =======================================
+def get_float_matrix(df, columns):
+    """
+    Converts the given columns in df to a float matrix in one go. Values that can not be converted are set to nan.
+    :param df: pandas dataframe
+    :param columns: list of columns in df
+    :return: numpy array with shape (len(df), len(columns)). Writable since the QC writes the flags to it
+    """
+    values = pd.Series(df[columns].to_numpy().ravel())
+    values = pd.to_numeric(values, errors='coerce').to_numpy(dtype=float, copy=True)
+    return values.reshape(len(df), len(columns))
+
 
-        df_out = pd.DataFrame(data_matrix_out, columns=columns)
+def _init_iocftp_qc(cfg_directory, qc_directory, logger_name=None, log_path=None):
+    """
+    Sets config paths in IOCFTP_QC and adds a file handler for log_path to the logger.
+    Also used as initializer for worker processes, so that workers that do not inherit the handler (spawn) log to
+    the same file.
+    """
+    IOCFTP_QC.set_config_path(cfg_directory)
+    IOCFTP_QC.set_qc_path(qc_directory)
+    if logger_name and log_path:
+        _add_iocftp_log_handler(logger_name, log_path)
 
-        # for x in add_columns:  # adding back last columns from original dataframe
-        #     df_out[x] = df[x]
 
-        # Create final df and replace qf columns
-        df_final = df.copy(deep=True)
-        for par in columns:
-            qpar = gismo_object.get_qpar(par)
-            if qpar:
-                df_final[qpar] = df_out[qpar].astype(int).astype(str)
-
-        # Print diff as a test
-        for col in df.columns:
-            array_before = df[col].values
-            array_after = df_final[col].values
-            diff = np.where(array_before != array_after)[0]
-            if len(diff):
-                print(col, diff)
+def _add_iocftp_log_handler(logger_name, log_path):
+    """
+    :return: the added logging.FileHandler, None if the logger already has a handler for log_path
+    """
+    log = logging.getLogger(logger_name)
+    log.setLevel(logging.DEBUG)
+    for handler in log.handlers:
+        if getattr(handler, 'baseFilename', None) == os.path.abspath(log_path):
+            return None
+    handler = logging.FileHandler(log_path)
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    log.addHandler(handler)
+    return handler
+
+
+def _run_iocftp_qc(station_name, station_nr, data_matrix, header_nr, logger_name):
+    return IOCFTP_QC.QC_CHECK_FERRYBOX(station_name,
+                                       station_nr,
+                                       data_matrix,
+                                       header_nr,
+                                       logger_name,
+                                       '')
 
 
 class QCprofileDV(GISMOqc):
@@ -14,7 +14,7 @@ try:
 except:
     pass
 
-from .mapping import StationMapping, ParameterMapping
+from .mapping import StationMapping, ParameterMapping, get_shared_mapping
 from .gismo import GISMOdata
 from .. import utils
 
@@ -94,6 +94,9 @@ class GISMOfile(GISMOdata):
     Base class for a GISMO data file.
     A GISMO-file only has data from one sampling type.
     """
+    # Attributes shared between GISMO objects. These are not pickled but loaded again by _load_shared_objects
+    shared_attributes = ['station_mapping', 'parameter_mapping']
+
     # ==========================================================================
     def __init__(self, data_file_path=None, settings_file_path=None, root_directory=None, mapping_files=None, **kwargs):
 
@@ -110,8 +113,7 @@ class GISMOfile(GISMOdata):
         self.sampling_type = kwargs.get('sampling_type', '')
 
         self._load_settings_file()
-        self._load_station_mapping()
-        self._load_parameter_mapping()
+        self._load_shared_objects()
 
         self.comment_id = self.settings.get_data('properties', 'comment_id')
         self.file_encoding = self.settings.get_data('properties', 'encoding')
@@ -170,15 +172,32 @@ class GISMOfile(GISMOdata):
     #             continue
     #         self.mapping_files[file_name] = os.path.join(self.mapping_files_directory, file_name)
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for attr in self.shared_attributes:
+            state.pop(attr, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._load_shared_objects()
+
+    # ==========================================================================
+    def _load_shared_objects(self):
+        self._load_station_mapping()
+        self._load_parameter_mapping()
+
     # ==========================================================================
     def _load_station_mapping(self):
-        self.station_mapping = StationMapping(settings_object=self.settings,
-                                              mapping_files=self.mapping_files)
+        self.station_mapping = get_shared_mapping(StationMapping,
+                                                  settings_object=self.settings,
+                                                  mapping_files=self.mapping_files)
 
     # ==========================================================================
     def _load_parameter_mapping(self):
-        self.parameter_mapping = ParameterMapping(settings_object=self.settings,
-                                                  mapping_files=self.mapping_files)
+        self.parameter_mapping = get_shared_mapping(ParameterMapping,
+                                                    settings_object=self.settings,
+                                                    mapping_files=self.mapping_files)
 
 
     # ==========================================================================
@@ -1666,6 +1685,7 @@ class NODCStandardFormatCTD(DVStandardFormatCTD):
     """
     The standard format for NODC includes 3 qc columns for each parameter.
     """
+    shared_attributes = DVStandardFormatCTD.shared_attributes + ['mapping_qf_dv_to_cmems', 'mapping_qf_cmems_to_dv']
 
     def __init__(self, **kwargs):
         print('kwargs 4', kwargs)
@@ -1678,15 +1698,17 @@ class NODCStandardFormatCTD(DVStandardFormatCTD):
 
         self.valid_qc_routines = ['Manual', 'Profile range simple', 'Profile report']
 
-        self.mapping_qf_dv_to_cmems = self.mapping_files.get_file_object('mapping_quality_flags_dv_to_cmems.txt')
-        self.mapping_qf_cmems_to_dv = self.mapping_files.get_file_object('mapping_quality_flags_cmems_to_dv.txt')
-
         self.valid_flags = list(set(self.valid_flags + [self.mapping_qf_dv_to_cmems.get(item)
                                                         for item in self.valid_flags]))
 
     def __str__(self):
         return f'Standard format NODC file: {self.file_id}'
 
+    def _load_shared_objects(self):
+        super()._load_shared_objects()
+        self.mapping_qf_dv_to_cmems = self.mapping_files.get_file_object('mapping_quality_flags_dv_to_cmems.txt')
+        self.mapping_qf_cmems_to_dv = self.mapping_files.get_file_object('mapping_quality_flags_cmems_to_dv.txt')
+
     def __repr__(self):
         return f'{self.__class__.__name__}({self.file_id}'
 
@@ -69,31 +69,9 @@ class CreateIOCFTPfile(object):
         :return:
         """
         df = self.mapping_object.df_filtered.copy().fillna('')
-        added_columns = []
-        parent_added_column = []
-        new_columns_in_order = []
-        for col in df.columns:
-            col = str(col)
-            new_columns_in_order.append(col)
-            if len(col) == 4:
-                qc_col = '8'+col
-                new_columns_in_order.append(qc_col)
-                added_columns.append(qc_col)
-                parent_added_column.append(col)
-
-        # Add qc columns to df
-        qc0_flag_series = np.zeros(len(df)).astype(int).astype(str)
-        for col, parent_col in zip(added_columns, parent_added_column):
-            boolean = df[parent_col] == ''
-            add_series = qc0_flag_series.copy()
-            add_series[boolean] = ''  # Check if this should be included
-            df[col] = add_series
-
-        # Reorder columns in df
-        df = df[new_columns_in_order]
 
         # Save df
-        self.df_iocftp = df.fillna('')
+        self.df_iocftp = add_QC0_columns_to_df(df).fillna('')
 
     def save_iocftp_file(self, directory=None):
         """
@@ -126,35 +104,29 @@ class CreateIOCFTPfile(object):
 def add_QC0_columns_to_df(df, **kwargs):
     """
     Adds QCO_columns to the given dataframe. parameters that already has QC0 column will not added again.
+    QC0 columns are added for all columns that has four digits. QC columns has an 8 an prefix and are placed after the
+    parameter. All QC0 columns are inserted at once.
     :param df:
     :param kwargs:
-    :return:
+    :return: new dataframe
     """
-    pass
-    # QC0_columns = []
-    # added_columns = []
-    # parent_added_column = []
-    # new_columns_in_order = []
-    # for col in df.columns:
-    #     col = str(col)
-    #     new_columns_in_order.append(col)
-    #     if len(col) == 4:
-    #         qc_col = '8' + col
-    #         new_columns_in_order.append(qc_col)
-    #         added_columns.append(qc_col)
-    #         parent_added_column.append(col)
-    #
-    # # Add qc columns to df
-    # qc0_flag_series = np.zeros(len(df)).astype(int).astype(str)
-    # for col, parent_col in zip(added_columns, parent_added_column):
-    #     boolean = df[parent_col] == ''
-    #     add_series = qc0_flag_series.copy()
-    #     add_series[boolean] = ''  # Check if this should be included
-    #     df[col] = add_series
-    #
-    # # Reorder columns in df
-    # df = df[new_columns_in_order]
-
-
-
-
+    qc0_columns = {}
+    new_columns_in_order = []
+    for col in df.columns:
+        col = str(col)
+        if len(col) == 5 and col.startswith('8') and col[1:] in df.columns:
+            # Existing QC0 column is placed after its parameter
+            continue
+        new_columns_in_order.append(col)
+        if len(col) == 4:
+            qc_col = '8' + col
+            new_columns_in_order.append(qc_col)
+            if qc_col in df.columns:
+                continue
+            qc0_columns[qc_col] = np.where(df[col] == '', '', '0')  # Check if '' should be included
+
+    if qc0_columns:
+        df = pd.concat([df, pd.DataFrame(qc0_columns, index=df.index)], axis=1)
+
+    # Reorder columns in df
+    return df[new_columns_in_order]
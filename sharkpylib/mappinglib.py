@@ -159,22 +159,39 @@ class MapAndFilterPandasDataframe(object):
         self.filtered_columns_list = file_io.get_list_from_column_file(file_path, column_name, **kwargs)
 
     def map(self):
-        self.mapped_columns = []
+        """
+        Renames all columns in one call. The mapping file is compiled to a dict the first time it is used.
+        :return:
+        """
         if not self.mapping_object:
             raise exceptionlib.MissingInformation('No mapping file added!')
-        for col in self.original_columns:
-            self.mapped_columns.append(self.mapping_object.get(col))
+        self.mapped_columns = self.mapping_object.get_mapped_list(self.original_columns)
         self.df.columns = self.mapped_columns[:]
 
+    def map_values(self, *columns, mapping_object=None, **kwargs):
+        """
+        Maps the values in the given columns. Each unique value is mapped once (via categorical codes).
+        :param columns: columns to map
+        :param mapping_object: MappingFile, default is the mapping file set with set_mapping_file
+        :param kwargs: Se options in MappingFile.get
+        :return:
+        """
+        mapping_object = mapping_object or self.mapping_object
+        if not mapping_object:
+            raise exceptionlib.MissingInformation('No mapping file added!')
+        for col in columns:
+            categorical = pd.Categorical(self.df[col])
+            # Last item is used for missing values (code -1)
+            mapped = mapping_object.get_mapped_list(list(categorical.categories) + [np.nan], **kwargs)
+            self.df[col] = np.array(mapped, dtype=object)[categorical.codes]
+
     def filter(self):
         """
         Filters columns in the dataframe. Also sort according to list.
         :return:
         """
-        self.filtered_columns = []
-        for col in self.filtered_columns_list:
-            if col in self.df.columns:
-                self.filtered_columns.append(col)
+        columns = set(self.df.columns)
+        self.filtered_columns = [col for col in self.filtered_columns_list if col in columns]
 
         self.df_filtered = self.df[self.filtered_columns]
 
@@ -323,15 +340,14 @@ def create_file_for_qc0(file_path=None, mapping_file_path=None, file_col=None, q
     return df
 
 
-def add_nodc_qc_columns_to_df(df=None, file_path=None, default_q='', default_qc0='0', default_qc1='0', **kwargs):
+def get_nodc_qc_column_layout(columns, default_q='', default_qc0='0', default_qc1='0'):
     """
-    Adds the three QC columns that should be present in the SMHI nods standard format.
-    :param df:
-    :param columns:
+    Returns the column layout of the SMHI nodc standard format where three QC columns follow each data parameter.
+    :param columns: list of columns in the standard format
     :param default_q:
     :param default_qc0:
     :param default_qc1:
-    :return:
+    :return: list of all columns in order, dict with added columns as keys and default value as values
     """
     def q_col(par):
         if any([par.startswith(qc) for qc in ['Q_', 'QC0_', 'QC1']]):
@@ -342,16 +358,9 @@ def add_nodc_qc_columns_to_df(df=None, file_path=None, default_q='', default_qc0
     qc0 = 'QC0'
     qc1 = 'QC1'
 
-    if file_path:
-        df = txt_reader.load_txt_df(file_path)
-
-    columns = list(df.columns)
-
     # Find metadata columns
-    metadata_columns = ListDirectory().get_file_object('list_metadata_columns.txt').get()
-    data_columns = [col for col in columns if col not in metadata_columns]
-
-    data_par_list = [par for par in data_columns if not q_col(par)]
+    metadata_columns = set(ListDirectory().get_file_object('list_metadata_columns.txt').get())
+    data_par_list = set([par for par in columns if par not in metadata_columns and not q_col(par)])
 
     # Add qc columns
     new_columns = []
@@ -366,18 +375,45 @@ def add_nodc_qc_columns_to_df(df=None, file_path=None, default_q='', default_qc0
             if par not in new_columns:
                 new_columns.append(par)
 
-    # Add columns to dataframe if missing
+    # Default values for columns missing in columns
+    existing_columns = set(columns)
+    added_columns = {}
     for col in new_columns:
-        if col not in columns:
-            if col.startswith(qc0):
-                df[col] = default_qc0
-            elif col.startswith(qc1):
-                df[col] = default_qc1
-            elif col.startswith(q):
-                df[col] = default_q
-
-    # Change columns order
-    df = df[new_columns]
+        if col in existing_columns or col in added_columns:
+            continue
+        if col.startswith(qc0):
+            added_columns[col] = default_qc0
+        elif col.startswith(qc1):
+            added_columns[col] = default_qc1
+        elif col.startswith(q):
+            added_columns[col] = default_q
+    return new_columns, added_columns
+
+
+def add_nodc_qc_columns_to_df(df=None, file_path=None, default_q='', default_qc0='0', default_qc1='0', **kwargs):
+    """
+    Adds the three QC columns that should be present in the SMHI nods standard format.
+    The new column layout is computed once and the new dataframe is created in one step.
+    :param df:
+    :param columns:
+    :param default_q:
+    :param default_qc0:
+    :param default_qc1:
+    :return:
+    """
+    if file_path:
+        df = txt_reader.load_txt_df(file_path)
+
+    new_columns, added_columns = get_nodc_qc_column_layout(list(df.columns),
+                                                           default_q=default_q,
+                                                           default_qc0=default_qc0,
+                                                           default_qc1=default_qc1)
+
+    if df.columns.has_duplicates:
+        df = pd.concat([df, pd.DataFrame(added_columns, index=df.index)], axis=1)[new_columns]
+    else:
+        df = pd.DataFrame({col: df[col] if col in df.columns else added_columns[col] for col in new_columns},
+                          index=df.index, columns=new_columns)
 
     if kwargs.get('save_file'):
         if file_path:
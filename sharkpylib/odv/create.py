@@ -10,6 +10,7 @@ Created on Thu Oct 25 2018
 import os
 import codecs
 import datetime
+import multiprocessing
 
 try:
     import numpy as np
@@ -82,17 +83,14 @@ class SimpleODVfile:
         data = {}
         for c, col in enumerate(df.columns):
             if c == 0:
-                col_list = []
-                for value in df[col]:
-                    col_list.append(datetime.datetime.strptime(value, '%Y%m%d%H%M%S'))
-                data['time'] = col_list
+                data['time'] = list(pd.to_datetime(df[col], format='%Y%m%d%H%M%S').dt.to_pydatetime())
                 # data['time'] = list(df[col].apply(lambda x: datetime.datetime.strptime(x, '%Y%m%d%H%M%S')))
             elif col == '8002':
-                data['lat'] = list(df[col])
+                data['lat'] = df[col].tolist()
             elif col == '8003':
-                data['lon'] = list(df[col])
+                data['lon'] = df[col].tolist()
             else:
-                data[col] = list(df[col])
+                data[col] = df[col].tolist()
 
             data['data_type'] = 'Trajectories'
 
@@ -111,17 +109,14 @@ class SimpleODVfile:
         data = {}
         for c, col in enumerate(df.columns):
             if c == 0:
-                col_list = []
-                for value in df[col]:
-                    col_list.append(datetime.datetime.strptime(value, '%Y%m%d%H%M%S'))
-                data['time'] = col_list
+                data['time'] = list(pd.to_datetime(df[col], format='%Y%m%d%H%M%S').dt.to_pydatetime())
                 # data['time'] = list(df[col].apply(lambda x: datetime.datetime.strptime(x, '%Y%m%d%H%M%S')))
             elif col == '8002':
-                data['lat'] = list(df[col])
+                data['lat'] = df[col].tolist()
             elif col == '8003':
-                data['lon'] = list(df[col])
+                data['lon'] = df[col].tolist()
             else:
-                data[col] = list(df[col])
+                data[col] = df[col].tolist()
 
             data['data_type'] = 'TimeSeries'
 
@@ -175,13 +170,20 @@ class SimpleODVfile:
                    qf_suffix=qf_suffix,
                    parameter_mapping=par_mapping)
 
-    def create_file(self, file_path):
-        all_lines = []
-        all_lines.extend(self._get_semantic_header_rows())
-        all_lines.append(self._get_header_row(mapped=True))
-        all_lines.extend(self._get_data_rows())
+    def create_file(self, file_path, chunk_size=100000):
+        """
+        Writes the odv file. Data rows are formatted column wise and written in chunks of chunk_size rows.
+        :param file_path: str
+        :param chunk_size: int, number of data rows formatted and written at a time
+        :return:
+        """
+        header_lines = self._get_semantic_header_rows()
+        header_lines.append(self._get_header_row(mapped=True))
         with codecs.open(file_path, 'w', encoding=self.encoding) as fid:
-            fid.write('\n'.join(all_lines))
+            fid.write('\n'.join(header_lines))
+            for data_rows in self._get_data_row_chunks(chunk_size=chunk_size):
+                fid.write('\n')
+                fid.write('\n'.join(data_rows))
 
     def _save_column_types(self):
         self.col_type = {}
@@ -209,28 +211,19 @@ class SimpleODVfile:
         :return:
         """
 
-        self.data['yyyy-mm-ddThh:mm:ss.sss'] = []
-        self.data['Longitude [degrees_east]'] = []
-        self.data['Latitude [degrees_north]'] = []
-        self.data['Bot. Depth [m]'] = []
+        def get_list(value, nr_rows):
+            if type(value) == list:
+                return value[:nr_rows]
+            return [value] * nr_rows
 
-        for index in range(len(self.data['time'])):
-            if type(self.data['time']) == list:
-                self.data['yyyy-mm-ddThh:mm:ss.sss'].append(self.data['time'][index].strftime('%Y-%m-%dT%H:%M:%S'))
-            else:
-                self.data['yyyy-mm-ddThh:mm:ss.sss'].append(self.data['time'].strftime('%Y-%m-%dT%H:%M:%S'))
-            if type(self.data['lon']) == list:
-                self.data['Longitude [degrees_east]'].append(self.data['lon'][index])
-            else:
-                self.data['Longitude [degrees_east]'].append(self.data['lon'])
-            if type(self.data['lat']) == list:
-                self.data['Latitude [degrees_north]'].append(self.data['lat'][index])
-            else:
-                self.data['Latitude [degrees_north]'].append(self.data['lat'])
-            if type(self.data.get('bot_depth', '')) == list:
-                self.data['Bot. Depth [m]'].append(self.data['bot_depth'][index])
-            else:
-                self.data['Bot. Depth [m]'].append(self.data.get('bot_depth', ''))
+        nr_rows = len(self.data['time'])
+        if type(self.data['time']) == list:
+            self.data['yyyy-mm-ddThh:mm:ss.sss'] = [t.strftime('%Y-%m-%dT%H:%M:%S') for t in self.data['time']]
+        else:
+            self.data['yyyy-mm-ddThh:mm:ss.sss'] = [self.data['time'].strftime('%Y-%m-%dT%H:%M:%S')] * nr_rows
+        self.data['Longitude [degrees_east]'] = get_list(self.data['lon'], nr_rows)
+        self.data['Latitude [degrees_north]'] = get_list(self.data['lat'], nr_rows)
+        self.data['Bot. Depth [m]'] = get_list(self.data.get('bot_depth', ''), nr_rows)
 
         self.data['time_ISO8601'] = self.data['yyyy-mm-ddThh:mm:ss.sss']
 
@@ -273,36 +266,56 @@ class SimpleODVfile:
 
     def _get_data_rows(self):
         data_rows = []
-        for i in range(len(self.data['time_ISO8601'])):
-            data_rows.append(self._get_data_row_string(i))
+        for rows in self._get_data_row_chunks():
+            data_rows.extend(rows)
         return data_rows
 
+    def _get_data_row_chunks(self, chunk_size=100000):
+        """
+        Yields lists of data row strings with (at most) chunk_size rows in each.
+        """
+        nr_rows = len(self.data['time_ISO8601'])
+        for start in range(0, nr_rows, chunk_size):
+            yield self._get_data_row_strings(start, min(start + chunk_size, nr_rows))
+
     def _get_data_row_string(self, index):
-        data_row_list = []
+        return self._get_data_row_strings(index, index + 1)[0]
+
+    def _get_data_row_strings(self, start, end):
+        """
+        Formats the data rows from start to end (not included). Formatting is made for one column at a time.
+        :return: list of data row strings
+        """
+        columns = []
         for col in self._get_header_row(as_list=True):
             if col == self.qf_tag:
                 continue
-            if col in ['Cruise', 'Station', 'Type']:
-                lower_col = col.lower()
-                if col == 'Type':
-                    default = 'B'
-                else:
-                    default = f'{col}_{index}'
-                value = self.data.get(lower_col, default)
-                if type(value) != str:
-                    value = self.data[lower_col][index]
-            else:
-                value = self.data[col][index]
-
-            data_row_list.append(value)
-
+            columns.append(self._get_column_strings(col, start, end))
             if col == 'time_ISO8601':
-                data_row_list.append('1')
+                columns.append(['1'] * (end - start))
             elif self.col_type.get(col) == 'par':
                 qf_par = self.qf_prefix + col + self.qf_suffix
-                data_row_list.append(str(int(self.data[qf_par][index])))
+                columns.append(self._get_qf_column_strings(qf_par, start, end))
+        return [self.delimiter.join(row) for row in zip(*columns)]
+
+    def _get_column_strings(self, col, start, end):
+        if col in ['Cruise', 'Station', 'Type']:
+            lower_col = col.lower()
+            value = self.data.get(lower_col)
+            if value is None:
+                if col == 'Type':
+                    return ['B'] * (end - start)
+                return [f'{col}_{index}' for index in range(start, end)]
+            if type(value) == str:
+                return [value] * (end - start)
+            return list(value[start:end])
+        return list(self.data[col][start:end])
 
-        return self.delimiter.join(data_row_list)
+    def _get_qf_column_strings(self, qf_par, start, end):
+        values = np.asarray(self.data[qf_par][start:end])
+        if values.dtype.kind not in 'iu':
+            values = values.astype(float).astype(int)
+        return values.astype(str).tolist()
 
 
 class CreateODVfilesBaseRow(object):
@@ -410,30 +423,29 @@ class CreateODVfilesBaseRow(object):
 
     def add_p06_column(self):
         for unit in set(self.df['_unit']):
-            # print('Adding P06 code for unit {}: {}'.format(unit, self.p06_mapping.get(unit)))
-            boolean = self.df['_unit'] == unit
-            mapped_unit = self.p06_mapping.get(unit)
-            if not mapped_unit:
+            if not self.p06_mapping.get(unit):
                 raise ExceptionUnmappedValue('Unit: {}'.format(unit))
-            self.df.loc[boolean, '_p06'] = mapped_unit
+        self.df['_p06'] = self.df['_unit'].map(self.p06_mapping)
         print('Done adding P06 column!')
 
     def add_semantic_header_column(self):
-        def get_semantic_header_line(series):
-            string = '//<subject>SDN:LOCAL:{}</subject><object>SDN:P01::{}</object><units>SDN:P06::{}</units>'.format(
-                series['_data_column_name'], series['_p01'], series['_p06'])
-            return string
-        self.df['_semantic_line'] = self.df.apply(get_semantic_header_line, axis=1)
+        self.df['_semantic_line'] = '//<subject>SDN:LOCAL:' + self.df['_data_column_name'].astype(str) + \
+                                    '</subject><object>SDN:P01::' + self.df['_p01'].astype(str) + \
+                                    '</object><units>SDN:P06::' + self.df['_p06'].astype(str) + '</units>'
         print('Done adding semantic line column!')
 
 
-    def create_files(self, station_id='', odv_files=False, cdi_lines=False):
-        """  """
+    def create_files(self, station_id='', odv_files=False, cdi_lines=False, processes=None):
+        """
+        Creates one odv file and/or cdi lines per station. Rows for each station are found with one groupby.
+        :param processes: int. If > 1 stations are handled in a process pool. Cdi lines are merged in station order,
+                          the result is the same as for a serial run.
+        """
         self.all_cdi_lines = []
         if self.primary_variabel == 'time_series':
             all_station_id_list = sorted(self.station_id_set)
             if station_id:
-                if type(station_id) == 'str':
+                if type(station_id) == str:
                     station_id_list = [station_id]
                 else:
                     station_id_list = station_id
@@ -443,23 +455,48 @@ class CreateODVfilesBaseRow(object):
             else:
                 station_id_list = all_station_id_list
 
-            for sid in station_id_list:
-                sid_df = self.df.loc[self.df['_station_id']==sid]
-                self.current_odv_object = CreateODVfileTimeseriesRow(sid_df, output_directory=self.output_directory)
-
-                if odv_files:
-                    self.current_odv_object.create_odv_file()
-                if cdi_lines:
-                    self.all_cdi_lines.extend(self.current_odv_object.get_cdi_lines())
+            station_indices = self.df.groupby('_station_id', sort=False).indices
+            if processes and processes > 1 and len(station_id_list) > 1:
+                self._create_files_in_pool(station_id_list, station_indices, CreateODVfileTimeseriesRow,
+                                           odv_files=odv_files, cdi_lines=cdi_lines, processes=processes)
+            else:
+                for sid in station_id_list:
+                    sid_df = self.df.iloc[station_indices[sid]]
+                    self.current_odv_object = CreateODVfileTimeseriesRow(sid_df, output_directory=self.output_directory)
+
+                    if odv_files:
+                        self.current_odv_object.create_odv_file()
+                    if cdi_lines:
+                        self.all_cdi_lines.extend(self.current_odv_object.get_cdi_lines())
         else:
             raise ExceptionNotImplemented('Creation of primary variable {} is not implemented.'.format(self.primary_variabel))
 
         self.cdi_info_file_path = os.path.join(self.output_directory, 'odv/cdi_info.txt')
         with codecs.open(self.cdi_info_file_path, 'w') as fid:
-            fid.write('\t'.join(self.current_odv_object.cdi_lines_columns))
+            fid.write('\t'.join(CreateODVfileRow.cdi_lines_columns))
             fid.write('\n')
             fid.write('\n'.join(self.all_cdi_lines))
 
+    def _create_files_in_pool(self, station_id_list, station_indices, odv_class, odv_files=False, cdi_lines=False,
+                              processes=2):
+        """
+        The stations are split in consecutive chunks (several per process). Each job gets the rows of its stations.
+        Cdi lines are returned from the jobs and added in the order of station_id_list.
+        """
+        os.makedirs(os.path.join(self.output_directory, 'odv'), exist_ok=True)
+        nr_chunks = min(len(station_id_list), processes * 4)
+        jobs = []
+        for chunk in np.array_split(np.arange(len(station_id_list)), nr_chunks):
+            chunk_station_id_list = [station_id_list[i] for i in chunk]
+            rows = np.concatenate([station_indices[sid] for sid in chunk_station_id_list])
+            jobs.append((self.df.iloc[rows], chunk_station_id_list, odv_class, self.output_directory,
+                         odv_files, cdi_lines))
+        with multiprocessing.Pool(processes=processes) as pool:
+            results = pool.starmap(_create_odv_files_for_stations, jobs)
+        for chunk_cdi_lines in results:
+            self.all_cdi_lines.extend(chunk_cdi_lines)
+        self.current_odv_object = None
+
     def limit_data_scope(self):
 
         # Remove lines with insufficient data
@@ -482,7 +519,7 @@ class CreateODVfilesBaseRow(object):
         print('Done limiting data scope!')
 
     def map_qf(self):
-        self.df['_qf'] = self.df['_qf'].apply(lambda qf: self.qf_mapping.get(qf, '0'))
+        self.df['_qf'] = self.df['_qf'].map(lambda qf: self.qf_mapping.get(qf, '0'))
         print('Done mapping qf!')
 
     def _add_basic_columns(self):
@@ -524,9 +561,7 @@ class CreateODVfilesBaseRow(object):
                 nr_added_p01_codes += 1
         print('{} P01 codes added to mapping file'.format(nr_added_p01_codes))
 
-        for p01 in self.p01_set:
-            boolean = self.df['_p01'] == p01
-            self.df.loc[boolean, '_p02'] = p01_to_p02.get(p01, '')
+        self.df['_p02'] = self.df['_p01'].map(lambda p01: p01_to_p02.get(p01, ''))
 
         # Save mapping file
         if p01_to_p02_file_path:
@@ -556,13 +591,6 @@ class CreateODVfilesBiotaEEA(CreateODVfilesBaseRow):
 
     def _add_basic_columns(self):
 
-        def get_local_cdi_id(series):
-            string = '{}_{}_{}'.format(series['Species'].replace(' ', '_'),
-                                       series['_statn'].replace(' ', '_').replace('/', '_').replace('å', 'a').replace(
-                                           'ä', 'a').replace('ö', 'o'),
-                                       series['_sdate'].replace('-', ''))
-            return string
-
         # Remove lines with unvalid time (hour and/or minute equals 0
         self.df = self.df.loc[self.df['Month'] != '0']
         self.df = self.df.loc[self.df['Day'] != '0']
@@ -588,7 +616,10 @@ class CreateODVfilesBiotaEEA(CreateODVfilesBaseRow):
         self.df['_edmo_originator'] = '545'
         self.df['_edmo_custodian'] = '730' # 730=ICES
 
-        self.df['_local_cdi_id'] = self.df.apply(get_local_cdi_id, axis=1)
+        statn = self.df['_statn'].str.replace(' ', '_').str.replace('/', '_').str.replace('å', 'a').str.replace(
+            'ä', 'a').str.replace('ö', 'o')
+        self.df['_local_cdi_id'] = self.df['Species'].str.replace(' ', '_') + '_' + statn + '_' + \
+                                   self.df['_sdate'].str.replace('-', '')
 
         self.df['_dataset_name'] = self.df['_local_cdi_id']
         self.df['_dataset_id'] = self.df['_local_cdi_id']
@@ -606,57 +637,51 @@ class CreateODVfilesBiotaEEA(CreateODVfilesBaseRow):
             p01_mapping_df = pd.read_csv(self.kwargs.get('p01_mapping_file_path'), sep='\t', encoding='cp1252')
             p01_mapping = dict(zip(p01_mapping_df['vocab_search_string'], p01_mapping_df['P01']))
 
-        for p01_search_string in set(self.df['P01_search_string']):
-            boolean = self.df['P01_search_string'] == p01_search_string
-            self.df.loc[boolean, '_p01'] = p01_mapping.get(p01_search_string)
+        self.df['_p01'] = self.df['P01_search_string'].map(lambda string: p01_mapping.get(string))
 
     def _add_data_column_name(self):
-        def get_column_name(series):
-            ba = self.basis_mapping.get(series['Basis'])
-            if not ba:
-                raise ExceptionUnmappedValue('Basis: {}'.format(series['Basis']))
-            string = '{}_{}_{}_{}'.format(series['Species'].replace(' ', '_'), series['_substance'],
-                                          ba, series['Tissue']).replace(' ', '')
-            return string
-
-        self.df['_data_column_name'] = self.df.apply(get_column_name, axis=1)
+        for basis in set(self.df['Basis']):
+            if not self.basis_mapping.get(basis):
+                raise ExceptionUnmappedValue('Basis: {}'.format(basis))
+        column_name = self.df['Species'].str.replace(' ', '_') + '_' + self.df['_substance'] + '_' + \
+                      self.df['Basis'].map(self.basis_mapping) + '_' + self.df['Tissue']
+        self.df['_data_column_name'] = column_name.str.replace(' ', '')
 
 
 
 class CreateODVfileRow(object):
+    cdi_lines_columns = ['LOCAL_CDI_ID',
+                         'EDMO_AUTHOR',
+                         'AREA_TYPE',
+                         'DATASET_NAME',
+                         'DATASET_ID',
+                         'DATASET_REV_DATE',
+                         'EDMO_ORIGINATOR',
+                         'DATASET_ABS',
+                         'EDMO_CUSTODIAN',
+                         'PDV_CODE',
+                         'PLATFORM_TYPE',
+                         'DATASET_ACCESS',
+                         'CRUISE_NAME',
+                         'STATION_NAME',
+                         'STATION_LATITUDE',
+                         'STATION_LONGITUDE',
+                         'STATION_DATE',
+                         'EDMO_DISTRIBUTOR',
+                         'FORMAT',
+                         'FORMAT_VERSION',
+                         'DATA_SIZE',
+                         'DIST_DATABASE_REF',
+                         'DIST_WEBSITE',
+                         'DIST_METHODE',
+                         'INSTRUMENT',
+                         'ABSTRACT']
 
     def __init__(self, df, output_directory=None, **kwargs):
         self.df = df.copy(deep=True)
         self.df.reset_index(inplace=True)
         self.output_directory = output_directory
 
-        self.cdi_lines_columns = ['LOCAL_CDI_ID',
-                                  'EDMO_AUTHOR',
-                                  'AREA_TYPE',
-                                  'DATASET_NAME',
-                                  'DATASET_ID',
-                                  'DATASET_REV_DATE',
-                                  'EDMO_ORIGINATOR',
-                                  'DATASET_ABS',
-                                  'EDMO_CUSTODIAN',
-                                  'PDV_CODE',
-                                  'PLATFORM_TYPE',
-                                  'DATASET_ACCESS',
-                                  'CRUISE_NAME',
-                                  'STATION_NAME',
-                                  'STATION_LATITUDE',
-                                  'STATION_LONGITUDE',
-                                  'STATION_DATE',
-                                  'EDMO_DISTRIBUTOR',
-                                  'FORMAT',
-                                  'FORMAT_VERSION',
-                                  'DATA_SIZE',
-                                  'DIST_DATABASE_REF',
-                                  'DIST_WEBSITE',
-                                  'DIST_METHODE',
-                                  'INSTRUMENT',
-                                  'ABSTRACT']
-
         self.cdi_mapping = {'LOCAL_CDI_ID': '_local_cdi_id',
 
                             'EDMO_AUTHOR': '_edmo_author',
@@ -715,45 +740,23 @@ class CreateODVfileRow(object):
                                  'Bot. Depth [m]']
 
 
-        # Loop parameters (in row format)
-        self.semantic_dict = {}
-        self.data_dict = {}
-
-        self.sample_id_list = sorted(set(self.df['_sample_id']))
+        # Rows sorted on sample_id (stable sort). Columns are used as lists, stations are small.
+        # For duplicates the last row is used (parameters and semantic lines).
         # Only one sample_id (='') if not used
-
-        for sid in self.sample_id_list:
-            self.data_dict[sid] = {}
-            iddf = self.df.loc[self.df['_sample_id'] == sid].copy(deep=True).reset_index()
-            for index in iddf.index:
-                series = iddf.iloc[index]
-                self.semantic_dict[series['_data_column_name']] = series['_semantic_line']
-
-                sample_id_line = []
-                # Mandatory columns
-                if index == 0:
-                    self.data_dict[sid]['Cruise'] = series['_cruise']
-                    self.data_dict[sid]['Station'] = series['_statn']
-                    self.data_dict[sid]['Type'] = '*'
-                    self.data_dict[sid]['yyyy-mm-ddThh:mm:ss.sss'] = series['_sdate']
-                    self.data_dict[sid]['Longitude [degrees_east]'] = '+' + str(series['_longi_dg'])
-                    self.data_dict[sid]['Latitude [degrees_north]'] = '+' + str(series['_latit_dg'])
-                    self.data_dict[sid]['LOCAL_CDI_ID'] = series['_local_cdi_id']
-                    self.data_dict[sid]['EDMO_code'] = series['_edmo_author']
-                    self.data_dict[sid]['Bot. Depth [m]'] = ''
-
-                    # Add primary variable
-                    self.data_dict[sid][self.primary_variable['data_column_name']] = series[self.primary_variable['dataframe_column']]
-
-                    for item in self.include_columns:
-                        self.data_dict[sid][item['data_column_name']] = series[item['dataframe_column']]
-
-                # Data
-                column_name = series['_data_column_name']
-                #                 print(column_name)
-                self.data_dict[sid][column_name] = {}
-                self.data_dict[sid][column_name]['value'] = series['_concentration']
-                self.data_dict[sid][column_name]['qf'] = series['_qf']
+        df = self.df.sort_values('_sample_id', kind='mergesort')
+        data_columns = ['_sample_id', '_data_column_name', '_semantic_line', '_concentration', '_qf', '_cruise',
+                        '_statn', '_sdate', '_longi_dg', '_latit_dg', '_local_cdi_id', '_edmo_author']
+        data_columns.extend([item['dataframe_column'] for item in [self.primary_variable] + self.include_columns])
+        data = dict((col, df[col].tolist()) for col in set(data_columns))
+
+        self.semantic_dict = dict(zip(data['_data_column_name'], data['_semantic_line']))
+        # First row for each sample_id (metadata) and last row for each sample_id and parameter (data)
+        first_row = {}
+        data_row = {}
+        for i, key in enumerate(zip(data['_sample_id'], data['_data_column_name'])):
+            first_row.setdefault(key[0], i)
+            data_row[key] = i
+        self.sample_id_list = sorted(first_row)
 
         # Create semantic lines
         self.semantic_lines = []
@@ -782,27 +785,31 @@ class CreateODVfileRow(object):
 
         self.data_lines = []  # One row for each "sample_id"
         self.data_lines.append('\t'.join(self.header))
-        for k, sid in enumerate(sorted(self.data_dict)):
-            self.data_line = []
-            for col in self.header:
-                if col == 'QV:SEADATANET':
-                    continue
-                if col == self.primary_variable['data_column_name']:
-                    self.data_line.append(self.data_dict[sid][col])
-                    self.data_line.append('1')
-                elif col in self.mandatory_header:
-                    self.data_line.append(self.data_dict[sid][col])
-                elif col not in self.data_dict[sid]: # All sample_id might not have all parameters
-                    self.data_line.append('')  # for value
-                    self.data_line.append('')  # for qf
-                elif type(self.data_dict[sid][col]) == dict:
-#                    print(self.data_dict[sid].keys())
-                    self.data_line.append(self.data_dict[sid][col]['value'])
-                    self.data_line.append(self.data_dict[sid][col]['qf'])
-                else:  # From "self.include_columns"
-                    self.data_line.append(self.data_dict[sid][col])
-                    self.data_line.append('1')
-            self.data_lines.append('\t'.join(self.data_line))
+        parameter_list = sorted(self.semantic_dict)
+        for sid in self.sample_id_list:
+            i = first_row[sid]
+            data_line = [data['_cruise'][i],
+                         data['_statn'][i],
+                         '*',
+                         data['_sdate'][i],
+                         '+' + str(data['_longi_dg'][i]),
+                         '+' + str(data['_latit_dg'][i]),
+                         data['_local_cdi_id'][i],
+                         data['_edmo_author'][i],
+                         '']
+            # Primary variable and "include_columns"
+            for item in [self.primary_variable] + self.include_columns:
+                data_line.append(data[item['dataframe_column']][i])
+                data_line.append('1')
+            for col in parameter_list:
+                k = data_row.get((sid, col))
+                if k is None:  # All sample_id might not have all parameters
+                    data_line.append('')  # for value
+                    data_line.append('')  # for qf
+                else:
+                    data_line.append(data['_concentration'][k])
+                    data_line.append(data['_qf'][k])
+            self.data_lines.append('\t'.join(data_line))
 
         # Combine all lines
         self.all_lines = self.comment_list + ['//', '//SDN_parameter_mapping'] + self.semantic_lines + [
@@ -812,9 +819,8 @@ class CreateODVfileRow(object):
 
         if self.output_directory is not None:
             self.odv_output_directory = os.path.join(self.output_directory, 'odv')
-            if not os.path.exists(self.odv_output_directory):
-                os.makedirs(self.odv_output_directory)
-            self.file_path = os.path.join(self.odv_output_directory, '{}.txt'.format(series['_local_cdi_id']))
+            os.makedirs(self.odv_output_directory, exist_ok=True)
+            self.file_path = os.path.join(self.odv_output_directory, '{}.txt'.format(data['_local_cdi_id'][-1]))
             # print(self.file_path)
             with codecs.open(self.file_path, 'w', encoding='utf8') as fid:
                 fid.write(self.text)
@@ -826,10 +832,10 @@ class CreateODVfileRow(object):
         if 'AYMD' in p02_list:
             p02_list.pop(p02_list.index('AYMD'))
         cdi_lines = []
+        series = self.df.iloc[0]
         for p02 in p02_list:
             cdi_line = []
             for item in self.cdi_lines_columns:
-                series = self.df.iloc[0]
                 col = self.cdi_mapping.get(item)
                 if col in series:
                     value = series[col]
@@ -867,6 +873,22 @@ class CreateODVfileTimeseriesRow(CreateODVfileRow):
         self.area_type = 'Point'
 
 
+def _create_odv_files_for_stations(df, station_id_list, odv_class, output_directory, odv_files, cdi_lines):
+    """
+    Worker for CreateODVfilesBaseRow.create_files. Creates odv files for the given stations.
+    :return: list of cdi lines in the order of station_id_list
+    """
+    station_indices = df.groupby('_station_id', sort=False).indices
+    all_cdi_lines = []
+    for sid in station_id_list:
+        odv_object = odv_class(df.iloc[station_indices[sid]], output_directory=output_directory)
+        if odv_files:
+            odv_object.create_odv_file()
+        if cdi_lines:
+            all_cdi_lines.extend(odv_object.get_cdi_lines())
+    return all_cdi_lines
+
+
 # ==============================================================================
 class CreateODVException(Exception):
     """
@@ -40,46 +40,20 @@ class HistoryFlagFile:
     #==========================================================================
     def _load_file(self):
         header = ['info', 'time', 'user', 'type', 'comment']
-        self.df = pd.read_csv(self.file_path, sep='\t', encoding='cp1252', header=None)
-        self.df.columns = header
-    
-        self.df['local_cdi_id'] = self.df['info'].apply(self._add_local_cdi_id_column_from_info)
-        self.df['edmo'] = self.df['info'].apply(self._add_edmo_column_from_info)
-        self.df['QF'] = self.df[['type', 'comment']].apply(self._add_flag_column, axis=1)
-        self.df['par'] = self.df['comment'].apply(self._add_par_column)
-        self.df['flag_depth'] = self.df['comment'].apply(self._add_flag_depth_column)
+        self.df = pd.read_csv(self.file_path, sep='\t', encoding='cp1252', header=None, names=header, dtype=str)
+
+        info = self.df['info'].str.extract(r'^[^:]*:(?P<info>[^:]*)', expand=False).str.strip().str.split(' ')
+        self.df['local_cdi_id'] = info.str[0]
+        self.df['edmo'] = info.str[-1].str[:-1]
+        self.df['QF'] = self.df['comment'].str[-1].where(self.df['type'] == 'EDITFLAGS', '')
+        comment = self.df['comment'].str.extract(r'^(?P<par>[^@]*)(?:@.*)?$').join(
+            self.df['comment'].str.extract(r'^[^=]*=(?P<flag_depth>[^=]*)'))
+        self.df['par'] = comment['par'].str.strip()
+        self.df['flag_depth'] = comment['flag_depth'].str.strip()
     
         self.df.sort_values(['local_cdi_id', 'par'], inplace=True)
         
         
-    #==========================================================================
-    def _add_local_cdi_id_column_from_info(self, x): 
-        return x.split(':')[1].strip().split(' ')[0] 
-
-    
-    #==========================================================================
-    def _add_edmo_column_from_info(self, x): 
-        return x.split(':')[1].strip().split(' ')[-1][:-1]
-    
-    
-    #==========================================================================
-    def _add_flag_column(self, x): 
-        if x[0] == 'EDITFLAGS':
-            return x[1][-1]
-        else:
-            return ''
-            
-    
-    #==========================================================================
-    def _add_par_column(self, x): 
-        return x.split('@')[0].strip()
-    
-    
-    #==========================================================================
-    def _add_flag_depth_column(self, x): 
-        return x.split('=')[1].strip()
-    
-    
     #==========================================================================
     def _add_from_flag_column(self, x):
         from_flag = re.findall('(?<=\d:)\d*', x)
@@ -156,32 +130,23 @@ class HistoryFlagFile:
         
         pars = ['local_cdi_id', 'par', 'flag_depth' ]
         pars.extend(additional_columns)
-#        print(pars)
+
+        df = self.df
+        boolean = self._get_boolean_from_kwargs(**kwargs)
+        if len(boolean):
+            df = df.loc[boolean, :]
+        if not_in_flag_depth: 
+            df = df.loc[~df['flag_depth'].str.contains(not_in_flag_depth)]
+
         all_cdi_id = set()
-        for cdi in self.get_local_cdi_list(unique=True): 
-            df = self.df.copy()
-            boolean = self._get_boolean_from_kwargs(**kwargs)
-            
-            if len(boolean):
-                df = df.loc[boolean, :]
-            
-            df = df.loc[df['local_cdi_id']==cdi, pars]
-            
-            
-            
-            if not_in_flag_depth: 
-                df = df.loc[~df['flag_depth'].str.contains(not_in_flag_depth)]
-            
-            if not len(df):
-                continue
-            
-            set_par = list(set(df['par'].values))
+        for cdi, cdi_df in df[pars].groupby('local_cdi_id', sort=True):
+            set_par = list(set(cdi_df['par'].values))
 
             if len(set_par)==1 and set_par[0] == exclude_par:
                 continue 
             else:
                 file_path = os.path.join(directory, 'flags_for_local_cdi_id_{}.txt'.format(cdi)) 
-                df.to_csv(file_path, sep='\t', index=False, encoding='cp1252')
+                cdi_df.to_csv(file_path, sep='\t', index=False, encoding='cp1252')
                 all_cdi_id.add(cdi)
         
         with codecs.open(os.path.join(directory, 'all_flagged_local_cdi_id_odv_style.txt'), 'w') as fid: 
@@ -253,54 +218,34 @@ class HistoryFile:
     #==========================================================================
     def __init__(self, file_name):
         
-        self.nr = []
-        self.ID = []
-        self.EDMO = []
-        self.date = []
-        self.who = []
-        self.action = []
-        self.allinfo = []
+        with open(file_name,'r') as f:
+            lines = pd.Series(f.read().splitlines())
+        lines = lines[lines.str.strip() != '']
+
+        # All lines are parsed at once. allinfo is the rest of the line with single spaces between words
+        self.df = lines.str.extract(r'^\s*\S(?P<nr>\S*)\S\s+(?P<ID>\S+)\s+(?P<EDMO>\S*)\S\s+(?P<date>\S+)\s+'
+                                    r'(?P<who>\S+)\s+(?P<action>\S+)\s*(?P<allinfo>.*?)\s*$')
+        self.df['allinfo'] = self.df['allinfo'].str.replace(r'\s+', ' ', regex=True)
+
+        self.nr = self.df['nr'].tolist()
+        self.ID = self.df['ID'].tolist()
+        self.EDMO = self.df['EDMO'].tolist()
+        self.date = self.df['date'].tolist()
+        self.who = self.df['who'].tolist()
+        self.action = self.df['action'].tolist()
+        self.allinfo = self.df['allinfo'].tolist()
+
+        # Edited flags: "<par> @ <primary variable> = <depth>:<from flag> ... -> <to flag>"
+        flag_df = self.df.loc[lines.str.contains('EDITFLAGS').values].copy()
+        flag_df[['par', 'flag_all']] = flag_df['allinfo'].str.extract(r'^\s*([^@]*?)\s*@\s*([^@]*?)\s*$')
         self.editflags = {}
-        
-        f = open(file_name,'r')
-        
-        for line in f:
-            splited_line = line.split()
-            nr = splited_line[0][1:-1]
-            self.nr.append(nr)
-            ID = splited_line[1]
-            self.ID.append(ID)
-            edmo = splited_line[2][:-1]
-            self.EDMO.append(edmo)
-            self.date.append(splited_line[3])
-            self.who.append(splited_line[4])
-            self.action.append(splited_line[5])
-            
-            allinfo = ' '.join(splited_line[6:])
-            self.allinfo.append(allinfo)
-            
-            if 'EDITFLAGS' in line:
-                par, flag_all = [item.strip() for item in allinfo.split('@')]
-                slask, rest = [item.strip() for item in flag_all.split(' = ')]
-                to_flag = rest[-1]
-                rest = rest[1:-6]
-                pair = rest.split(' ')
-                for p in pair:
-                    d,fl = p.split(':')
-                
-                if edmo not in self.editflags:
-                    self.editflags[edmo] = {}
-                if par not in self.editflags[edmo]:
-                    self.editflags[edmo][par] = {}
-                if ID not in self.editflags[edmo][par]:
-                    self.editflags[edmo][par][ID] = {}
-                    self.editflags[edmo][par][ID][u'Accession Number'] = nr
-                    self.editflags[edmo][par][ID][u'All_flags'] = []
-                
-                if flag_all not in self.editflags[edmo][par][ID]:
-                    self.editflags[edmo][par][ID][u'All_flags'].append(flag_all)
- 
-        f.close()
+        for nr, ID, edmo, par, flag_all in zip(flag_df['nr'], flag_df['ID'], flag_df['EDMO'], flag_df['par'],
+                                               flag_df['flag_all']):
+            id_dict = self.editflags.setdefault(edmo, {}).setdefault(par, {})
+            if ID not in id_dict:
+                id_dict[ID] = {u'Accession Number': nr,
+                               u'All_flags': []}
+            id_dict[ID][u'All_flags'].append(flag_all)
         
     #==========================================================================
     def print_flags(self):
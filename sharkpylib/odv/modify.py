@@ -8,6 +8,7 @@
 
 import os
 import codecs
+import multiprocessing
 try:
     import pandas as pd
     import numpy as np
@@ -41,6 +42,277 @@ class ModifyLog(object):
             self.all_strings[string] = True
 
 
+class ModifyLogBuffer(object):
+    """
+    Collects log entries (same interface as ModifyLog) to be written to a ModifyLog later, eg. by the main process
+    when files are modified in a process pool.
+    """
+    def __init__(self):
+        self.entries = []
+
+    def add_warning(self, file_name, text):
+        self.entries.append(('warning', file_name, text))
+
+    def add_info(self, file_name, text):
+        self.entries.append(('info', file_name, text))
+
+    def write_to_log(self, log):
+        for level, file_name, text in self.entries:
+            getattr(log, 'add_{}'.format(level))(file_name, text)
+
+
+class ODVfileTransform(object):
+    """
+    Streaming version of the modifications in ModifyODVfile. Modifications are registered with the same methods as in
+    ModifyODVfile and are compiled into a per-line transform when the header of a file is read. Files are then read and
+    written in one pass. The result is the same as load_metadata, load_data, the modifications and write_new_odv.
+    Ex:
+        transform = ODVfileTransform()
+        transform.replace_values_in_col(column_name='Bot. Depth [m]', old_val='None', new_val='')
+        transform.add_column(current_column_name='Depth [m]', new_column='QV:SEADATANET')
+        transform_odv_directory(directory, transform, output_dir, log_path=log_path, processes=4)
+
+    Only scalar data can be added with add_column.
+    """
+
+    primary_par = 'time_ISO8601 [yyyy-mm-dd]'
+    primary_semantic = '//<subject>SDN:LOCAL:time_ISO8601</subject><object>SDN:P01::DTUT8601</object><units>SDN:P06::TISO</units>'
+
+    def __init__(self, header_locator='Cruise', comment_prefix='//', match_nr_columns_with_header=False):
+        self.header_locator = header_locator
+        self.comment_prefix = comment_prefix
+        self.match_nr_columns_with_header = match_nr_columns_with_header
+        self.edits = []
+
+    def add_column(self, current_column_name='', new_column='QV:SEADATANET', data='1', position=1):
+        if type(data) == list:
+            raise ValueError('Only scalar data can be added in ODVfileTransform')
+        self.edits.append(('add_column', (current_column_name, new_column, data, position)))
+
+    def convert_to_timeseries(self, last_metadata_variable='Bot. Depth [m]'):
+        self.edits.append(('convert_to_timeseries', (last_metadata_variable, )))
+
+    def rename_column(self, **kwargs):
+        self.edits.append(('rename_column', (kwargs, )))
+
+    def replace_string_in_metadata(self, from_string, to_string):
+        self.edits.append(('replace_string_in_metadata', (from_string, to_string)))
+
+    def replace_string_in_column(self, from_string, to_string, *args):
+        self.edits.append(('replace_string_in_column', (from_string, to_string, args)))
+
+    def set_qf_for_column(self, column, flag, replace_flag=None):
+        self.edits.append(('set_qf_for_column', (column, flag, replace_flag)))
+
+    def replace_values_in_col(self, column_name='Bot. Depth [m]', old_val='None', new_val=''):
+        self.edits.append(('replace_values_in_col', (column_name, old_val, new_val)))
+
+    def transform_file(self, file_path, output_file_path, log=None, **kwargs):
+        """
+        Reads file_path and writes the modified file to output_file_path in one pass.
+        Metadata (lines before the header) is kept in memory, data lines are modified one at a time.
+        :param log: ModifyLog or ModifyLogBuffer
+        :return: number of data lines written
+        """
+        metadata = []
+        nr_lines = 0
+        with codecs.open(file_path, encoding=kwargs.get('encoding_in', kwargs.get('encoding', 'cp1252'))) as fid_in, \
+                codecs.open(output_file_path, 'w',
+                            encoding=kwargs.get('encoding_out', kwargs.get('encoding', 'cp1252'))) as fid_out:
+            transform = None
+            for line in fid_in:
+                line = line.strip('\n\r')
+                if not line.strip():
+                    continue
+                if transform is None:
+                    if not line.startswith(self.header_locator):
+                        metadata.append(line)
+                        continue
+                    header = line.split('\t')
+                    metadata, header, transform = self._compile(file_path, metadata, header, log)
+                    for meta_line in metadata:
+                        meta_line = meta_line.strip()
+                        if meta_line:
+                            fid_out.write(meta_line + '\n')
+                    fid_out.write('\t'.join(header) + '\n')
+                    continue
+                if line.startswith(self.comment_prefix):
+                    continue
+                fid_out.write('\t'.join(transform(line.split('\t'))) + '\n')
+                nr_lines += 1
+        return nr_lines
+
+    def _compile(self, file_path, metadata, header, log=None):
+        """
+        Applies the modifications to metadata and header and compiles the modifications of the data lines.
+        :return: metadata, header, function that modifies a split data line
+        """
+        metadata = metadata[:]
+        original_header = header
+        header = header[:]
+        nr_columns = len(header)
+        operations = []
+        first_line_values = {}
+        modifications_made = []
+
+        def add_column(current_column_name, new_column, data, position):
+            if current_column_name not in header:
+                return
+            index = header.index(current_column_name) + position
+            if index < len(header) and header[index] == new_column:
+                print('WARNING! The column you want to insert is already present in your file: %s' % file_path)
+                return
+            header.insert(index, new_column)
+            if callable(data):
+                operations.append(lambda row: row.insert(index, data(row)))
+            else:
+                operations.append(lambda row: row.insert(index, data))
+            if log:
+                log.add_info(file_path, 'Column {} added {} positions after current column name {}'.format(
+                    new_column, position, current_column_name))
+
+        def convert_to_timeseries(last_metadata_variable):
+            if 'convert_to_timeseries' in modifications_made:
+                return
+            modifications_made.append('convert_to_timeseries')
+            # Check if file already has time as primary variable (as in odvfile.ODVfile.get_primary_variable)
+            if 'Bot. Depth [m]' in original_header:
+                index = original_header.index('Bot. Depth [m]') + 1
+                if index < len(original_header) and self.primary_par in original_header[index]:
+                    return
+            for k, line in enumerate(metadata):
+                if line.startswith('//<subject>'):
+                    metadata.insert(k, self.primary_semantic)
+                    break
+            # Time is taken from the first data line
+            time_index = header.index('yyyy-mm-ddThh:mm:ss.sss')
+
+            def get_time(row):
+                if 'time' not in first_line_values:
+                    first_line_values['time'] = row[time_index]
+                return first_line_values['time']
+
+            add_column(last_metadata_variable, self.primary_par, get_time, 1)
+            add_column(self.primary_par, 'QV:SEADATANET', '1', 1)
+
+        def rename_column(mapping):
+            header[:] = [mapping.get(col, col) for col in header]
+
+        def replace_string_in_metadata(from_string, to_string):
+            for k, line in enumerate(metadata):
+                if log and from_string in line:
+                    log.add_info(file_path, 'String "{}" replaced with "{}'.format(from_string, to_string))
+                metadata[k] = line.replace(from_string, to_string)
+
+        def replace_string_in_column(from_string, to_string, columns):
+            for col in columns:
+                if col not in header:
+                    continue
+                index = header.index(col)
+
+                def replace_string(row, index=index):
+                    row[index] = row[index].replace(from_string, to_string)
+                operations.append(replace_string)
+
+        def set_qf_for_column(column, flag, replace_flag):
+            if column not in header:
+                print('Column {} not in file {}'.format(column, file_path))
+                return
+            qf_index = header.index(column) + 1
+
+            def set_qf(row):
+                if replace_flag is None:
+                    row[qf_index] = str(flag)
+                elif row[qf_index] == replace_flag:
+                    row[qf_index] = str(flag)
+                # Replace with flag 9 if missing value
+                if row[qf_index - 1] == '':
+                    row[qf_index] = '9'
+            operations.append(set_qf)
+
+        def replace_values_in_col(column_name, old_val, new_val):
+            if column_name not in header:
+                return
+            index = header.index(column_name)
+
+            def replace_value(row):
+                if row[index] == old_val:
+                    row[index] = new_val
+            operations.append(replace_value)
+
+        compilers = dict(add_column=add_column,
+                         convert_to_timeseries=convert_to_timeseries,
+                         rename_column=rename_column,
+                         replace_string_in_metadata=replace_string_in_metadata,
+                         replace_string_in_column=replace_string_in_column,
+                         set_qf_for_column=set_qf_for_column,
+                         replace_values_in_col=replace_values_in_col)
+        for name, args in self.edits:
+            compilers[name](*args)
+
+        match_nr_columns = self.match_nr_columns_with_header
+
+        def transform(row):
+            if match_nr_columns:
+                if len(row) != nr_columns and log:
+                    log.add_warning(file_path, 'Header not the same length as data line')
+                row = row[:nr_columns]
+            for operation in operations:
+                operation(row)
+            return row
+
+        return metadata, header, transform
+
+
+def _transform_odv_file(file_path, transform, output_file_path, kwargs):
+    """
+    Worker for transform_odv_files.
+    :return: log entries
+    """
+    log = ModifyLogBuffer()
+    transform.transform_file(file_path, output_file_path, log=log, **kwargs)
+    return log.entries
+
+
+def transform_odv_files(file_paths, transform, output_dir, log_path=None, processes=None, **kwargs):
+    """
+    Modifies the given files with the ODVfileTransform. New files are saved with the same file name in output_dir.
+    :param file_paths: list of file paths
+    :param transform: ODVfileTransform
+    :param output_dir: directory to save new files in
+    :param log_path: path to ModifyLog file. Log entries are written in the order of file_paths
+    :param processes: int. If > 1 files are modified in a process pool
+    :param kwargs: encoding options, see ModifyODVfile
+    :return: list of output file paths
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    jobs = [(file_path, transform, os.path.join(output_dir, os.path.basename(file_path)), kwargs)
+            for file_path in file_paths]
+    if processes and processes > 1 and len(jobs) > 1:
+        with multiprocessing.Pool(processes=processes) as pool:
+            results = pool.starmap(_transform_odv_file, jobs)
+    else:
+        results = [_transform_odv_file(*job) for job in jobs]
+
+    if log_path:
+        log = ModifyLog(log_path)
+        for entries in results:
+            buffer = ModifyLogBuffer()
+            buffer.entries = entries
+            buffer.write_to_log(log)
+    return [job[2] for job in jobs]
+
+
+def transform_odv_directory(directory, transform, output_dir, **kwargs):
+    """
+    Modifies all odv files (.txt) in directory with the ODVfileTransform. See transform_odv_files.
+    """
+    file_paths = [os.path.join(directory, file_name) for file_name in sorted(os.listdir(directory))
+                  if file_name.endswith('.txt')]
+    return transform_odv_files(file_paths, transform, output_dir, **kwargs)
+
+
 class ModifyODVfile_old(object):
 
     def __init__(self, file_path):
@@ -359,6 +631,21 @@ class ModifyODVfile(object):
 
         self.df.loc[self.df[column_name] == old_val, column_name] = new_val
 
+    def write_transformed_odv(self, transform, output_dir='D:/temp', file_name=False, **kwargs):
+        """
+        Streaming alternative to load_metadata, load_data, modifications and write_new_odv.
+        The file is read and written in one pass with the modifications registered in transform.
+
+        :param transform: ODVfileTransform
+        :param output_dir: directory to store the new ODV-file
+        :param file_name:
+        :param kwargs: encoding options
+        :return:
+        """
+        if not file_name:
+            file_name = self.file_path.split('\\')[-1]
+        transform.transform_file(self.file_path, os.path.join(output_dir, file_name), log=self.log, **kwargs)
+
     def write_new_odv(self, output_dir='D:/temp', file_name=False, df=False, metadata=False, **kwargs):
         """
         Write data and metadata to file.
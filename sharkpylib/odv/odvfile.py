@@ -1,26 +1,84 @@
 # Copyright (c) 2018 SMHI, Swedish Meteorological and Hydrological Institute
 # License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
 import os
+import re
+import json
 import codecs
+import multiprocessing
+
 
 class ODVdirectory(object):
+    """
+    Handles all odv files (.txt) in a directory. Information about the files (header, primary variable, P01/P02 codes
+    and LOCAL_CDI_IDs) is held in an ODVcatalog that is saved in the directory and updated for new or changed files.
+
+    :param kwargs:
+        header_locator: default 'Cruise'
+        last_metadata_variable: default 'Bot. Depth [m]'
+        catalog_file_path: default <directory>/odv_catalog.json
+        save_catalog: default False. If True the catalog is saved as json in the directory
+        processes: number of processes used when scanning and searching files
+    """
     def __init__(self, directory, **kwargs):
         self.directory = directory
         self.file_paths = []
+        self.header_locator = kwargs.get('header_locator', 'Cruise')
+        self.last_metadata_variable = kwargs.get('last_metadata_variable', 'Bot. Depth [m]')
+        self.processes = kwargs.get('processes')
+        self._catalog = None
+        self._catalog_kwargs = dict(catalog_file_path=kwargs.get('catalog_file_path'),
+                                    save=kwargs.get('save_catalog', False),
+                                    header_locator=self.header_locator,
+                                    last_metadata_variable=self.last_metadata_variable,
+                                    encoding=kwargs.get('encoding', 'cp1252'))
         self._load_file_paths()
 
     def _load_file_paths(self):
-        print('yes')
         self.file_paths = [os.path.join(self.directory, file_name) for file_name in os.listdir(self.directory) if file_name.endswith('.txt')]
 
-    def get_files_with_string(self, string):
-        return [file_path for file_path in self.file_paths if ODVfile(file_path).has_string(string)]
+    @property
+    def catalog(self):
+        if self._catalog is None:
+            self._catalog = ODVcatalog(self.directory, processes=self.processes, **self._catalog_kwargs)
+        return self._catalog
+
+    def rescan(self):
+        """
+        Updates file paths and the catalog. Only new and changed files are scanned.
+        :return:
+        """
+        self._load_file_paths()
+        self.catalog.update(processes=self.processes)
+
+    def get_files_with_string(self, string, **kwargs):
+        """
+        P01 and P02 codes (ex. "SDN:P01::TEMPPR01") are looked up in the catalog. Other strings are searched for in the
+        files, see search_files.
+        :param string: str
+        :param kwargs: processes, chunk_size
+        :return: list of file paths
+        """
+        match = re.match(r'^SDN:(P0[12])::(\w+)$', string)
+        if match:
+            code_type, code = match.groups()
+            return self.catalog.get_files_with_code(code, code_type=code_type.lower(), file_paths=self.file_paths,
+                                                    startswith=True)
+        return search_files(self.file_paths, string, processes=kwargs.get('processes', self.processes),
+                            chunk_size=kwargs.get('chunk_size', ODVfile.chunk_size))
+
+    def get_files_with_local_cdi_id(self, local_cdi_id):
+        return [file_path for file_path in self.file_paths
+                if local_cdi_id in self.catalog.get_entry(file_path).get('local_cdi_ids', [])]
 
     def get_mapping_of_primary_variable(self, **kwargs):
+        last_metadata_variable = kwargs.get('last_metadata_variable', self.last_metadata_variable)
         mapping = dict()
         for file_path in self.file_paths:
-            file_object = ODVfile(file_path, **kwargs)
-            primary_variable = file_object.get_primary_variable()
+            entry = self.catalog.get_entry(file_path)
+            if last_metadata_variable == self.last_metadata_variable:
+                primary_variable = entry['primary_variable']
+            else:
+                primary_variable = get_primary_variable_from_header(entry['header'], last_metadata_variable)
             mapping.setdefault(primary_variable, [])
             if kwargs.get('whole_path'):
                 mapping[primary_variable].append(file_path)
@@ -29,22 +87,138 @@ class ODVdirectory(object):
         return mapping
 
 
+class ODVcatalog(object):
+    """
+    Persistent catalog of the odv files (.txt) in a directory. For each file the catalog holds:
+        size, mtime, header, primary_variable, p01, p02, local_cdi_ids
+    P01 and P02 codes are taken from the semantic header (comment lines). If save is True the catalog is saved as json
+    and files are only scanned again if size or modification time has changed. Ex:
+        catalog = ODVcatalog(directory, save=True, processes=4)
+        file_paths = catalog.get_files_with_code('TEMPPR01', code_type='p01')
+    """
+    version = 1
+
+    def __init__(self, directory, catalog_file_path=None, save=False, header_locator='Cruise',
+                 last_metadata_variable='Bot. Depth [m]', encoding='cp1252', processes=None):
+        self.directory = directory
+        self.catalog_file_path = catalog_file_path or os.path.join(directory, 'odv_catalog.json')
+        self.save_catalog = save
+        self.header_locator = header_locator
+        self.last_metadata_variable = last_metadata_variable
+        self.encoding = encoding
+        self.files = {}
+        self._load()
+        self.update(processes=processes)
+
+    def _get_settings(self):
+        return dict(version=self.version,
+                    header_locator=self.header_locator,
+                    last_metadata_variable=self.last_metadata_variable,
+                    encoding=self.encoding)
+
+    def _load(self):
+        """
+        Loads the saved catalog if it exists and is created with the same settings.
+        :return: True if loaded
+        """
+        if not os.path.exists(self.catalog_file_path):
+            return False
+        try:
+            with open(self.catalog_file_path) as fid:
+                data = json.load(fid)
+        except ValueError:
+            return False
+        if data.get('settings') != self._get_settings():
+            return False
+        self.files = data['files']
+        return True
+
+    def save(self):
+        data = dict(settings=self._get_settings(),
+                    files=self.files)
+        try:
+            with open(self.catalog_file_path, 'w') as fid:
+                json.dump(data, fid)
+        except OSError:
+            print('Could not save catalog: {}'.format(self.catalog_file_path))
+
+    def update(self, processes=None):
+        """
+        Scans new and changed files and removes files that no longer exist.
+        :param processes: int. If > 1 files are scanned in a process pool
+        :return: list of scanned file names
+        """
+        file_names = [file_name for file_name in os.listdir(self.directory) if file_name.endswith('.txt')]
+        changed = False
+        for file_name in set(self.files) - set(file_names):
+            self.files.pop(file_name)
+            changed = True
+        to_scan = []
+        for file_name in file_names:
+            stat = os.stat(os.path.join(self.directory, file_name))
+            entry = self.files.get(file_name)
+            if not entry or entry['size'] != stat.st_size or entry['mtime'] != stat.st_mtime:
+                to_scan.append(file_name)
+        if to_scan:
+            jobs = [(os.path.join(self.directory, file_name), self.header_locator, self.last_metadata_variable,
+                     self.encoding) for file_name in to_scan]
+            if processes and processes > 1 and len(jobs) > 1:
+                with multiprocessing.Pool(processes=processes) as pool:
+                    entries = pool.starmap(_get_catalog_entry, jobs)
+            else:
+                entries = [_get_catalog_entry(*job) for job in jobs]
+            self.files.update(zip(to_scan, entries))
+            changed = True
+        if changed and self.save_catalog:
+            self.save()
+        return to_scan
+
+    def get_entry(self, file_path):
+        return self.files[os.path.basename(file_path)]
+
+    def get_files_with_code(self, code, code_type='p01', file_paths=None, startswith=False):
+        """
+        :param code: P01 or P02 code without prefix, ex. TEMPPR01
+        :param code_type: 'p01' or 'p02'
+        :param file_paths: list of file paths to check. Default is all files in the catalog
+        :param startswith: if True also codes starting with code are matched
+        :return: list of file paths
+        """
+        if file_paths is None:
+            file_paths = [os.path.join(self.directory, file_name) for file_name in sorted(self.files)]
+        result = []
+        for file_path in file_paths:
+            codes = self.get_entry(file_path)[code_type]
+            if startswith:
+                if any(item.startswith(code) for item in codes):
+                    result.append(file_path)
+            elif code in codes:
+                result.append(file_path)
+        return result
+
+
 class ODVfile(object):
+    chunk_size = 1024 * 1024
+
     def __init__(self, file_path, **kwargs):
         self.file_path = file_path
         self.header_locator = kwargs.get('header_locator', 'Cruise')
         self.last_metadata_variable = kwargs.get('last_metadata_variable', 'Bot. Depth [m]')
+        self.encoding = kwargs.get('encoding', 'cp1252')
 
-    def has_string(self, string):
-        with codecs.open(self.file_path) as fid:
-            text = fid.read()
-            # print(text)
-            # Check old P011
-            if 'P011' in text:
-                print('Old p-code P011 found in file {}'.format(self.file_path))
-            if string in text:
-                return True
-            return False
+    def has_string(self, string, chunk_size=None):
+        """
+        Searches for string in the file. The file is read in chunks of chunk_size bytes.
+        :param string: str
+        :param chunk_size: int
+        :return: True if string is found
+        """
+        found = find_strings_in_file(self.file_path, ['P011', string], encoding=self.encoding,
+                                     chunk_size=chunk_size or self.chunk_size)
+        # Check old P011
+        if 'P011' in found:
+            print('Old p-code P011 found in file {}'.format(self.file_path))
+        return string in found
 
     def get_primary_variable(self):
         """
@@ -60,3 +234,129 @@ class ODVfile(object):
                     for k, col in enumerate(split_line):
                         if col == self.last_metadata_variable:
                             return split_line[k+1]
+
+    def get_catalog_entry(self):
+        """
+        Reads the file once and returns information for the ODVcatalog.
+        :return: dict with keys: size, mtime, header, primary_variable, p01, p02, local_cdi_ids
+        """
+        stat = os.stat(self.file_path)
+        header = []
+        p01 = set()
+        p02 = set()
+        local_cdi_ids = {}
+        local_cdi_index = None
+        with codecs.open(self.file_path, encoding=self.encoding, errors='replace') as fid:
+            for line in fid:
+                if line.startswith('//'):
+                    p01.update(re.findall(r'SDN:P01::(\w+)', line))
+                    p02.update(re.findall(r'SDN:P02::(\w+)', line))
+                    continue
+                line = line.rstrip('\r\n')
+                if not header:
+                    if line.startswith(self.header_locator):
+                        header = line.split('\t')
+                        if 'LOCAL_CDI_ID' in header:
+                            local_cdi_index = header.index('LOCAL_CDI_ID')
+                    continue
+                if local_cdi_index is None:
+                    continue
+                split_line = line.split('\t')
+                if local_cdi_index < len(split_line) and split_line[local_cdi_index]:
+                    local_cdi_ids[split_line[local_cdi_index]] = True
+        return dict(size=stat.st_size,
+                    mtime=stat.st_mtime,
+                    header=header,
+                    primary_variable=get_primary_variable_from_header(header, self.last_metadata_variable),
+                    p01=sorted(p01),
+                    p02=sorted(p02),
+                    local_cdi_ids=list(local_cdi_ids))
+
+
+def get_primary_variable_from_header(header, last_metadata_variable='Bot. Depth [m]'):
+    """
+    :param header: list of columns
+    :param last_metadata_variable: str
+    :return: the column after last_metadata_variable, None if not found
+    """
+    if last_metadata_variable not in header:
+        return None
+    index = header.index(last_metadata_variable) + 1
+    if index < len(header):
+        return header[index]
+
+
+def find_strings_in_file(file_path, strings, encoding='cp1252', chunk_size=1024 * 1024):
+    """
+    Searches for strings in the file without reading the whole file into memory. The file is read in binary chunks
+    that overlap so that strings over chunk borders are found.
+    :param file_path: str
+    :param strings: list of strings
+    :param encoding: encoding of the file. Strings are searched for encoded both in encoding and in utf-8
+    :param chunk_size: int, number of bytes to read at a time
+    :return: set of the strings found in the file
+    """
+    byte_strings = {string: _get_byte_strings(string, [encoding, 'utf-8']) for string in strings if string}
+    found = set()
+    overlap = max([len(byte_string) for items in byte_strings.values() for byte_string in items] + [1]) - 1
+    tail = b''
+    with open(file_path, 'rb') as fid:
+        while len(found) < len(byte_strings):
+            chunk = fid.read(chunk_size)
+            if not chunk:
+                break
+            text = tail + chunk
+            for string, items in byte_strings.items():
+                if string not in found and any(byte_string in text for byte_string in items):
+                    found.add(string)
+            tail = text[-overlap:] if overlap else b''
+    return found
+
+
+def _get_byte_strings(string, encodings):
+    """
+    :return: list of the unique byte strings of string in encodings. Encodings that can not encode string are skipped
+    """
+    byte_strings = []
+    for encoding in encodings:
+        try:
+            byte_string = string.encode(encoding)
+        except UnicodeEncodeError:
+            continue
+        if byte_string not in byte_strings:
+            byte_strings.append(byte_string)
+    return byte_strings
+
+
+def _get_catalog_entry(file_path, header_locator, last_metadata_variable, encoding):
+    """
+    Worker for ODVcatalog.update
+    """
+    return ODVfile(file_path, header_locator=header_locator, last_metadata_variable=last_metadata_variable,
+                   encoding=encoding).get_catalog_entry()
+
+
+def _file_has_string(file_path, string, encoding, chunk_size):
+    """
+    Worker for search_files
+    """
+    return string in find_strings_in_file(file_path, [string], encoding=encoding, chunk_size=chunk_size)
+
+
+def search_files(file_paths, string, processes=None, encoding='cp1252', chunk_size=ODVfile.chunk_size):
+    """
+    Streaming substring search in several files.
+    :param file_paths: list of file paths
+    :param string: str
+    :param processes: int. If > 1 files are searched in a process pool
+    :param encoding: str
+    :param chunk_size: int
+    :return: list of the file paths containing string
+    """
+    jobs = [(file_path, string, encoding, chunk_size) for file_path in file_paths]
+    if processes and processes > 1 and len(jobs) > 1:
+        with multiprocessing.Pool(processes=processes) as pool:
+            result = pool.starmap(_file_has_string, jobs)
+    else:
+        result = [_file_has_string(*job) for job in jobs]
+    return [file_path for file_path, has_string in zip(file_paths, result) if has_string]
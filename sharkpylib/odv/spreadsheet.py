@@ -9,6 +9,11 @@ Created on 30 jun 2016
 '''
 
 import codecs
+import csv
+import io
+import json
+import locale
+import multiprocessing
 import re
 import os
 import datetime
@@ -32,121 +37,373 @@ from sharkpylib import mappinglib as mapping
 ===============================================================================
 ===============================================================================
 """
-class SpreadsheetFile():
+class SpreadsheetScanner():
     """
-    Class to hande vocabulary things in ODV spreadsheet file
+    Reads an ODV spreadsheet file once and dispatches every row to the registered consumers (see SpreadsheetConsumer).
+    Several results (eg. local_cdi_id list, station count and edited flags) can thereby be produced in one pass
+    without keeping the file in memory.
+
+    Rows are dispatched as:
+        comment_row: rows starting with "//" (including MetaVariable and DataVariable definitions)
+        header_row: the "Cruise" row, split on tab
+        data_row: all other rows, split on tab. has_metadata is True if the first column (Cruise) has a value
+        edit_flag_row: rows containing "EDITFLAGS" (dispatched after comment_row/data_row)
+    The scan stops early when all consumers are done.
     """
-    
-    #==========================================================================
-    def __init__(self, file_path=None):
+    def __init__(self, file_path, encoding='utf8'):
         self.file_path = file_path
+        self.encoding = encoding
+        self.consumers = []
+        self.nr_lines = 0
 
-    def get_edited_flags(self, qf_prefix='QF_', qf_suffix=''):
-        def is_header_row(row):
-            if row.startswith('Cruise\t'):
-                return True
-            return False
+    def add_consumer(self, consumer):
+        self.consumers.append(consumer)
+        return consumer
 
-        def is_data_row(row):
-            if any([is_header_row(row), is_comment_row(row)]):
-                return False
-            return True
-
-        def row_has_metadata(row):
-            if not is_data_row(row):
-                return False
-            if row.startswith('\t'):
-                return False
-            return True
-
-        def is_comment_row(row):
-            if row.startswith('//'):
-                return True
-            return False
+    def scan(self, show_process_every=None):
+        """
+        :param show_process_every: print progress every n:th line
+        :return: number of lines read
+        """
+        t0 = time.time()
+        consumers = list(self.consumers)
+        k = -1
+        with codecs.open(self.file_path, encoding=self.encoding) as fid:
+            for k, line in enumerate(fid):
+                if show_process_every:
+                    if not k%show_process_every:
+                        print('Working on line {} as time {}'.format(k, time.time()-t0))
+                line = line.rstrip('\r\n')
+                if line.startswith('//'):
+                    for consumer in consumers:
+                        consumer.comment_row(line, k)
+                elif line.startswith('Cruise'):
+                    header = line.split('\t')
+                    for consumer in consumers:
+                        consumer.header_row(header, k)
+                else:
+                    split_line = line.split('\t')
+                    has_metadata = bool(split_line[0].strip())
+                    for consumer in consumers:
+                        consumer.data_row(split_line, k, has_metadata)
+                if 'EDITFLAGS' in line:
+                    for consumer in consumers:
+                        consumer.edit_flag_row(line, k)
+                if any(consumer.done for consumer in consumers):
+                    consumers = [consumer for consumer in consumers if not consumer.done]
+                    if not consumers:
+                        break
+        self.nr_lines = k + 1
+        return self.nr_lines
+
+
+class SpreadsheetConsumer():
+    """
+    Base class for consumers of SpreadsheetScanner. Override the row methods needed and set self.done = True
+    when no more rows are needed. The result is found in self.result after the scan.
+    """
+    def __init__(self):
+        self.done = False
+        self.result = None
+
+    def comment_row(self, line, row_nr):
+        pass
+
+    def header_row(self, header, row_nr):
+        pass
+
+    def data_row(self, split_line, row_nr, has_metadata):
+        pass
+
+    def edit_flag_row(self, line, row_nr):
+        pass
 
-        def is_flag_row(row):
-            if 'EDITFLAGS' in row:
-                return True
+
+class LocalCdiConsumer(SpreadsheetConsumer):
+    """ Collects the sorted unique list of LOCAL_CDI_ID:s (column 7 on station rows) """
+    def __init__(self):
+        super().__init__()
+        self._cdi_set = set()
+        self.result = []
+
+    def data_row(self, split_line, row_nr, has_metadata):
+        if has_metadata:
+            self._cdi_set.add(split_line[6])
+            self.result = None
+
+    @property
+    def cdi_list(self):
+        if self.result is None:
+            self.result = sorted(self._cdi_set)
+        return self.result
+
+
+class StationCountConsumer(SpreadsheetConsumer):
+    """ Counts the number of stations acording to odv (data rows with value in the first column) """
+    def __init__(self):
+        super().__init__()
+        self.result = 0
+
+    def data_row(self, split_line, row_nr, has_metadata):
+        if has_metadata:
+            self.result += 1
+
+
+class UniqueListConsumer(SpreadsheetConsumer):
+    """
+    Collects unique values of the given column. If col == "id" a combined id of time and position is used.
+    self.result is False if the column is not found in header.
+    """
+    def __init__(self, col, **kwargs):
+        super().__init__()
+        self.col = col
+        self.kwargs = kwargs
+        self.header = None
+        self.index = None
+        self._data_set = set()
+
+    def header_row(self, header, row_nr):
+        self.header = header
+        if self.col == 'id':
+            self._time_index = header.index('yyyy-mm-ddThh:mm:ss.sss')
+            self._lat_index = header.index('Latitude [degrees_north]')
+            self._lon_index = header.index('Longitude [degrees_east]')
+            return
+        if self.col not in header:
+            print('Column "{}" not in header!'.format(self.col))
+            self.result = False
+            self.done = True
+            return
+        self.index = header.index(self.col)
+
+    def data_row(self, split_line, row_nr, has_metadata):
+        if self.kwargs.get('metadata') and not split_line[0]:
+            return
+        if self.col == 'id':
+            self._add_id(split_line, row_nr)
+        else:
+            self._data_set.add(split_line[self.index])
+
+    def _add_id(self, split_line, row_nr):
+        # Combine several columns
+        data_set_list = []
+        time_string = split_line[self._time_index]
+        if not time_string.strip():
+            return
+        try:
+            time_object = get_datetime_object(time_string)
+        except:
+            print('k', row_nr)
+            print(time_string)
+            return
+
+        data_set_list.append(time_object.strftime('%Y-%m-%d'))
+        if self.kwargs.get('include_time', True):
+            data_set_list.append(time_object.strftime('%H:%M'))
+        else:
+            data_set_list.append('')
+
+        precision = self.kwargs.get('id_pos_precision', 6)
+        lat = str(mapping.to_decmin(mapping.sdate_from_odv_time_string(split_line[self._lat_index])))[:precision]
+        lon = str(mapping.to_decmin(mapping.sdate_from_odv_time_string(split_line[self._lon_index])))[:precision]
+        data_set_list.append(lat)
+        data_set_list.append(lon)
+        self._data_set.add('_'.join(data_set_list))
+
+    @property
+    def unique_list(self):
+        if self.result is False:
             return False
+        return sorted(self._data_set)
+
+
+class VocabListConsumer(SpreadsheetConsumer):
+    """ Collects vocabulary codes (eg. P01) given in the comment rows before the header """
+    def __init__(self, vocab='P01'):
+        super().__init__()
+        self.re_string = '(?<={}::)[ ]*[A-Z0-9]+'.format(vocab.upper())
+        self._code_set = set()
 
-        def get_key(cdata):
-            time_object = datetime.datetime.strptime(cdata[time_par], time_format)
-            if data_type == 'Profiles':
-                return (time_object, cdata[header[7]])
+    def comment_row(self, line, row_nr):
+        result = re.findall(self.re_string, line)
+        if not result:
+            return
+        vocab_code = result[0].strip().split(u':')[-1]
+        if not vocab_code:
+            print(line)
+        self._code_set.add(vocab_code)
+
+    def header_row(self, header, row_nr):
+        self.done = True
+
+    @property
+    def vocab_list(self):
+        return list(self._code_set)
+
+
+class RowDataConsumer(SpreadsheetConsumer):
+    """
+    Collects data in a row format: one row for every data variable on every data line with metadata, vocabularies,
+    parameter, value and quality flag.
+    """
+    def __init__(self):
+        super().__init__()
+        self.metadata_dict = {}
+        self.data_dict = {}
+        self.vocab_dict = {}
+        self.vocab_list = []
+        self.header = None
+        self.data_header = []
+        self.data = []
+        self._metadata_columns = []
+        self._current_metadata = {}
+
+    def comment_row(self, line, row_nr):
+        if line.startswith('//<MetaVariable>'):
+            par = line.split('="')[1].split('"')[0]
+            self.metadata_dict[par] = False
+            self.metadata_dict['yyyy-mm-ddThh:mm:ss.sss'] = False
+        elif line.startswith('//<DataVariable>'):
+            par = line.split('="')[1].split('"')[0]
+            # Check primary variable
+            if 'is_primary_variable="T"' in line:
+                self.metadata_dict[par] = False
             else:
-                return (time_object, time_object)
-
-        time_format = '%Y-%m-%dT%H:%M:%S'
-        time_par = 'yyyy-mm-ddThh:mm:ss.sss'
-
-        data = {}
-        with codecs.open(self.file_path) as fid:
-            header = None
-            metadata = None
-            line_data = None
-            current_data = {}
-            key = None
-            data_type = ''
-            for i, line in enumerate(fid):
-                if '<DataType>' in line:
-                    data_type = line.split('<')[1].split('>')[1]
-                    continue
-                split_line = [item.strip() for item in line.split('\t')]
-                if is_header_row(line):
-                    header = split_line
-                    continue
-                if row_has_metadata(line):
-                    metadata = split_line[:7]
-
-                if is_data_row(line):
-                    line_data = metadata + split_line[7:]
-
-                if is_comment_row(line):
-                    metadata = None
-                    line_data = None
-
-                if line_data:
-                    current_data = {}
-                    h0 = ''
-                    for h, d in zip(header, line_data):
-                        h1 = h
-                        # if h == 'QF':
-                        #     h1 = qf_prefix + h0 + qf_suffix
-                        # else:
-                        #     h0 = h
-                        current_data[h1] = d
-
-                    # current_data = dict(zip(header, line_data))
-                    # key = ';'.join([current_data['yyyy-mm-ddThh:mm:ss.sss'],
-                    #                 current_data['Longitude [degrees_east]'],
-                    #                 current_data['Latitude [degrees_north]'],
-                    #                 current_data[header[7]]])
-                    key = get_key(current_data)
-                    data.setdefault(key, {})
-                    for col, value in current_data.items():
-                        data[key][col] = value
-
-                if is_flag_row(line):
-                    data[key].setdefault('flags', {})
-                    all_info = line.split('\t')[3]
-                    par = all_info.split('@')[0].strip()
-                    flag = all_info.split('->')[-1].split('<')[0].strip()
-                    data[key]['flags'][par] = flag
-
-        for key in list(data.keys()):
-            if not data[key].get('flags'):
-                data.pop(key)
+                self.data_dict[par] = False
+                self.vocab_dict[par] = get_vocabs_from_string(line)
+
+    def header_row(self, header, row_nr):
+        self.header = header
+        header_index = dict((item, k) for k, item in enumerate(header))
+        # Column index for metadata and data
+        for key in self.metadata_dict:
+            self.metadata_dict[key] = header_index.get(key)
+        for key in self.data_dict:
+            self.data_dict[key] = header_index.get(key)
+        self._metadata_columns = [item for item in header if item in self.metadata_dict]
+
+        # Check which vocabularies to add. Needs to be done after Data variable check
+        vocab_set = set()
+        for par in self.vocab_dict:
+            vocab_set.update(self.vocab_dict[par].keys())
+        self.vocab_list = sorted(vocab_set)
+        self._vocab_lines = dict((par, [self.vocab_dict.get(par, {}).get(voc, '') for voc in self.vocab_list])
+                                 for par in self.data_dict)
+        self.data_header = self._metadata_columns + self.vocab_list + ['parameter', 'value', 'qflag']
+
+    def data_row(self, split_line, row_nr, has_metadata):
+        line_dict = dict(zip(self.header, split_line))
+        # Save metadata line
+        if split_line[3]:  # time
+            for item in self.metadata_dict:
+                self._current_metadata[item] = line_dict.get(item, '')
+        else:
+            for item in self.metadata_dict:
+                line_dict[item] = self._current_metadata[item]
+
+        metadata_line = [line_dict[item] for item in self._metadata_columns]
+        for par in sorted(self.data_dict):
+            index = self.data_dict[par]
+            if index is None:
+                continue
+            self.data.append(metadata_line + self._vocab_lines[par] + [par,
+                                                                       split_line[index],        # Value
+                                                                       split_line[index + 1]])   # QF
+
 
+class EditedFlagsConsumer(SpreadsheetConsumer):
+    """
+    Collects flags changed in ODV (EDITFLAGS rows).
+    Result is a dict: result[parameter][flag] = list of keys (time, primary variable value)
+    """
+    time_format = '%Y-%m-%dT%H:%M:%S'
+    time_par = 'yyyy-mm-ddThh:mm:ss.sss'
+
+    def __init__(self):
+        super().__init__()
+        self.data_type = ''
+        self.header = None
+        self._metadata = None
+        self._key = None
+        self._flags = {}
+
+    def comment_row(self, line, row_nr):
+        if '<DataType>' in line:
+            self.data_type = line.split('<')[1].split('>')[1]
+        self._metadata = None
+
+    def header_row(self, header, row_nr):
+        self.header = [item.strip() for item in header]
+
+    def data_row(self, split_line, row_nr, has_metadata):
+        split_line = [item.strip() for item in split_line]
+        if not split_line[0] and self._metadata is None:
+            return
+        if has_metadata:
+            self._metadata = split_line[:7]
+        line_data = self._metadata + split_line[7:]
+        # Only the key of the latest data row is needed to match EDITFLAGS rows
+        self._key = self._get_key(dict(zip(self.header, line_data)))
+
+    def _get_key(self, cdata):
+        time_object = datetime.datetime.strptime(cdata[self.time_par], self.time_format)
+        if self.data_type == 'Profiles':
+            return (time_object, cdata[self.header[7]])
+        else:
+            return (time_object, time_object)
+
+    def edit_flag_row(self, line, row_nr):
+        all_info = line.split('\t')[3]
+        par = all_info.split('@')[0].strip()
+        flag = all_info.split('->')[-1].split('<')[0].strip()
+        self._flags.setdefault(self._key, {})[par] = flag
+
+    @property
+    def edited_flags(self):
         fdata = {}
-        for key, value in data.items():
-            d = key[0]
-            for par, f in value['flags'].items():
+        for key, flags in self._flags.items():
+            for par, f in flags.items():
                 fdata.setdefault(par, {})
                 fdata[par].setdefault(f, [])
                 fdata[par][f].append(key)
-
         return fdata
 
+
+"""
+===============================================================================
+===============================================================================
+"""
+class SpreadsheetFile():
+    """
+    Class to hande vocabulary things in ODV spreadsheet file
+
+    All get-methods read the file once with a SpreadsheetScanner. Use scan to get several results in one pass, ex:
+        cdi_consumer = LocalCdiConsumer()
+        count_consumer = StationCountConsumer()
+        SpreadsheetFile(file_path).scan(cdi_consumer, count_consumer)
+    """
+    
+    #==========================================================================
+    def __init__(self, file_path=None):
+        self.file_path = file_path
+
+    def scan(self, *consumers, show_process_every=None, encoding='utf8'):
+        """
+        Reads the file once and dispatches rows to all given consumers.
+        :param consumers: SpreadsheetConsumer objects
+        :param encoding: encoding of the file. None means the default encoding of the platform
+        :return: number of lines read
+        """
+        scanner = SpreadsheetScanner(self.file_path, encoding=encoding)
+        for consumer in consumers:
+            scanner.add_consumer(consumer)
+        return scanner.scan(show_process_every=show_process_every)
+
+    def get_edited_flags(self, qf_prefix='QF_', qf_suffix='', encoding=None):
+        consumer = EditedFlagsConsumer()
+        self.scan(consumer, encoding=encoding)
+        return consumer.edited_flags
+
     #==========================================================================
     def set_negative_value_to_zero(self, output_file_path):
         re_string = '\t-.+?\t'
@@ -159,36 +416,23 @@ class SpreadsheetFile():
         fid_out.close()
                 
     #==========================================================================
-    def get_local_cdi_list(self, print_to_file='', show_process_every=100000): 
+    def get_local_cdi_list(self, print_to_file='', show_process_every=100000, encoding=None):
         """
         Created:    20180523
         Updated:    20180613
         
         Returns a list of all local_cdi_id:s found in the spreadseet file
         """
-        t0 = time.time()
-        cdi_set = set()
         print('='*50)
         print(self.file_path)
         print('-'*50)
-        with codecs.open(self.file_path) as fid: 
-            for k, line in enumerate(fid): 
-                if show_process_every:
-                    if not k%show_process_every:
-                        print('Working on line {} as time {}'.format(k, time.time()-t0))
-                if line.startswith('//'):
-                    continue
-                elif line.startswith('Cruise'):
-                    continue 
-                else:
-                    split_line = line.split('\t')
-                    if split_line[0].strip(): # added by MW 20180613
-                        cdi_set.add(split_line[6])
+        consumer = LocalCdiConsumer()
+        nr_lines = self.scan(consumer, show_process_every=show_process_every, encoding=encoding)
+        sorted_cdi_set = consumer.cdi_list
         if show_process_every:
-            print('Number of lines: {}'.format(k))
-            print('Number of local_cdi_id is: {}'.format(len(cdi_set)))
-            
-        sorted_cdi_set = sorted(cdi_set)
+            print('Number of lines: {}'.format(nr_lines))
+            print('Number of local_cdi_id is: {}'.format(len(sorted_cdi_set)))
+
         if print_to_file:
             with codecs.open(print_to_file, 'w') as fid:
                 fid.write('\n'.join(sorted_cdi_set))
@@ -196,7 +440,7 @@ class SpreadsheetFile():
     
     
     #==========================================================================
-    def get_odv_station_count(self, show_process_every=100000): 
+    def get_odv_station_count(self, show_process_every=100000, encoding=None):
         """
         Created:    20180613
         Updated:    
@@ -204,28 +448,15 @@ class SpreadsheetFile():
         Returns the number of stations acording to odv. 
         A station is identified as a non comment (or Cruise) row having value in first column (Cruise). 
         """
-        t0 = time.time()
-        nr_stations = 0
         print('='*50)
         print(self.file_path)
         print('-'*50)
-        with codecs.open(self.file_path) as fid: 
-            for k, line in enumerate(fid): 
-                if show_process_every:
-                    if not k%show_process_every:
-                        print('Working on line {} as time {}'.format(k, time.time()-t0))
-                if line.startswith('//'):
-                    continue
-                elif line.startswith('Cruise'):
-                    continue
-                else:
-                    split_line = line.split('\t')
-                    if split_line[0].strip(): 
-                        nr_stations += 1
+        consumer = StationCountConsumer()
+        nr_lines = self.scan(consumer, show_process_every=show_process_every, encoding=encoding)
         if show_process_every:
-            print('Number of lines: {}'.format(k))
+            print('Number of lines: {}'.format(nr_lines))
             
-        return nr_stations
+        return consumer.result
 
 
 
@@ -237,72 +468,20 @@ class SpreadsheetFile():
         
         Returns a list of all unique values of the given column in the spreadseet file
         """
-        t0 = time.time()
-        data_set = set()
         if show_process_every:
             print('='*50)
             print(self.file_path)
             print('-'*50)
-        with codecs.open(self.file_path, encoding=kwargs.get('encoding', 'utf8')) as fid:
-            for k, line in enumerate(fid): 
-                if show_process_every:
-                    if not k%show_process_every:
-                        print('Working on line {} as time {}'.format(k, time.time()-t0))
-                if line.startswith('//'):
-                    continue
-                elif line.startswith('Cruise'):
-                    header = line.split('\t')
-                    if col == 'id':
-                        continue
-                    else:
-                        if col not in header:
-                            print('Column "{}" not in header!'.format(col))
-                            return False
-                        index = header.index(col)
-                    continue
-                else:
-                    split_line = line.split('\t')
-                    if kwargs.get('metadata') and not split_line[0]:
-                        continue
-                    if col == 'id':
-                        # Combine several columns
-                        data_set_list = []
-                        time_string = split_line[header.index('yyyy-mm-ddThh:mm:ss.sss')]
-                        if not time_string.strip():
-                            continue
-                        try:
-                            time_object = get_datetime_object(time_string)
-                        except:
-                            print(self.file_path)
-                            print('k', k)
-                            print(time_string)
-
-                        data_set_list.append(time_object.strftime('%Y-%m-%d'))
-                        if kwargs.get('include_time', True):
-                            data_set_list.append(time_object.strftime('%H:%M'))
-                        else:
-                            data_set_list.append('')
-                        # print(header.index('Latitude [degrees_north]'))
-                        # print(split_line[header.index('Latitude [degrees_north]')])
-                        # print(split_line)
-
-                        lat = str(mapping.to_decmin(mapping.sdate_from_odv_time_string(split_line[header.index('Latitude [degrees_north]')])))[:kwargs.get('id_pos_precision', 6)]
-                        lon = str(mapping.to_decmin(mapping.sdate_from_odv_time_string(split_line[header.index('Longitude [degrees_east]')])))[:kwargs.get('id_pos_precision', 6)]
-
-                        # lat = geography.decdeg_to_decmin(split_line[header.index('Latitude [degrees_north]')], string_type=True)[:kwargs.get('id_pos_precision', 6)]
-                        # lon = geography.decdeg_to_decmin(split_line[header.index('Longitude [degrees_east]')], string_type=True)[:kwargs.get('id_pos_precision', 6)]
-                        data_set_list.append(lat)
-                        data_set_list.append(lon)
-                        data_set.add('_'.join(data_set_list))
-                    else:
-                        if not split_line[index]:
-                            print(k)
-                        data_set.add(split_line[index])
+        consumer = UniqueListConsumer(col, **kwargs)
+        nr_lines = self.scan(consumer, show_process_every=show_process_every,
+                             encoding=kwargs.get('encoding', 'utf8'))
+        sorted_data_set = consumer.unique_list
+        if sorted_data_set is False:
+            return False
         if show_process_every:
-            print('Number of lines: {}'.format(k))
-            print('Number of "{}" is: {}'.format(col, len(data_set)))
+            print('Number of lines: {}'.format(nr_lines))
+            print('Number of "{}" is: {}'.format(col, len(sorted_data_set)))
             
-        sorted_data_set = sorted(data_set)
         if print_to_file:
             with codecs.open(print_to_file, 'w') as fid:
                 fid.write('\n'.join(sorted_data_set))
@@ -313,23 +492,9 @@ class SpreadsheetFile():
         """
         Function to create P01 list from txt-files.
         """
-        vocab_code_list = []
-
-        with codecs.open(self.file_path, 'r', encoding=kwargs.get('encoding', 'utf8')) as fid:
-            for line in fid:
-                if line.startswith(u'Cruise'):
-                    break
-                try:
-                    re_string = '(?<={}::)[ ]*[A-Z0-9]+'.format(vocab.upper())
-                    vocab_string = re.findall(re_string, line)[0].strip()
-                    vocab_code = vocab_string.split(u':')[-1]
-                    if not vocab_code:
-                        print(line)
-                    vocab_code_list.append(vocab_code)
-                except:
-                    pass
-
-        vocab_code_list = list(set(vocab_code_list))
+        consumer = VocabListConsumer(vocab=vocab)
+        self.scan(consumer, encoding=kwargs.get('encoding', 'utf8'))
+        vocab_code_list = consumer.vocab_list
         if sort:
             vocab_code_list = sorted(vocab_code_list)
 
@@ -347,119 +512,15 @@ class SpreadsheetFile():
         
         Extracts data in a row data format. 
         """ 
-        t0 = time.time() 
-        metadata_dict = {}
-        data_dict = {}
-        
-        data = [] 
-        current_metadata_list = [] 
-        current_metadata_dict = {}
-        keep_pars = kwargs.get('keep_as_id', [])
-        if type(keep_pars) != list:
-            keep_pars = [keep_pars]
-        vocab_dict = {}
-        with codecs.open(self.file_path, encoding='utf8') as fid: 
-            for k, line in enumerate(fid): 
-                if show_process_every:
-                    if not k%show_process_every:
-                        print('Working on line {} as time {}'.format(k, time.time()-t0)) 
-                if line.startswith('//<MetaVariable>'): 
-                    par = line.split('="')[1].split('"')[0]
-                    metadata_dict[par] = False 
-                    metadata_dict['yyyy-mm-ddThh:mm:ss.sss'] = False  
-                elif line.startswith('//<DataVariable>'): 
-                    par = line.split('="')[1].split('"')[0]
-                    # Check primary variable
-                    if 'is_primary_variable="T"' in line:
-                        metadata_dict[par] = False 
-                    else:
-                        data_dict[par] = False 
-                        vocab_dict[par] = get_vocabs_from_string(line)
-#                    nr_metadata_rows += 1
-                elif line.startswith('//'):
-                    continue 
-                elif line.startswith('Cruise'):
-                    header = line.split('\t') 
-                    
-#                     header_dict = dict((item, k) for k, item in enumerate(header)) 
-                    
-                    # Find columns for data and metadata 
-#                     for key in metadata_dict.keys():
-#                         metadata_dict[key] = header_dict[key]
-#                     for key in data_dict.keys():
-#                         data_dict[key] = header_dict[key]
-                        
-                    # Check which vocabularies to add. Needs to be done after Data variable check 
-                    vocab_set = set()
-                    for par in vocab_dict:
-                        vocab_set.update(vocab_dict[par].keys())
-                    vocab_list = sorted(vocab_set)
-                     
-                else:
-                    split_line = line.split('\t') 
-                    line_dict = dict(zip(header, split_line))
-                    # Save metadata line 
-                    if split_line[3]: # time
-                        for item in metadata_dict: 
-                            current_metadata_dict[item] = line_dict[item]
-                    else:
-                        for item in metadata_dict: 
-                            line_dict[item] = current_metadata_dict[item]
-                            
-                     
-#                     print(split_line)
-#                     # Update metadata. If metadata variable is missing the previos metadata is used
-#                     for item in metadata_dict:
-#                         print(item)
-#                         if not line_dict[item]:
-#                             line_dict[item] = current_metadata_dict[item]
-#                         else: 
-#                             current_metadata_dict[item] = line_dict[item]
-                               
-                               
-                    
-                            
-#                     # Add keep parameters. They will be unique for each row 
-#                     for par in keep_pars: 
-#                         data_line.append(line_dict[par])
-                    
-#                     if split_line[metadata_dict['Station']]: 
-#                         # First row for station. Add information to be used on the rest of the lines 
-#                         current_metadata_list = split_line[:len(metadata_dict)] 
-                    
-                    
-                    # Add data 
-                    for par in sorted(data_dict):
-                        data_line = []
-                        # Add metadata 
-                        for item in header: # To get the right order 
-                            if item in metadata_dict:
-                                data_line.append(line_dict[item]) 
-                        
-                        # Add data from line
-                        
-#                         # Metadata first 
-#                         data_line = current_metadata_list[:] 
-                        
-                        # Then vocabulary 
-                        for voc in vocab_list:
-                            data_line.append(vocab_dict.get(par, {}).get(voc, ''))
-                        
-                        # Then data
-                        data_line.append(par)                           # Parameter
-                        data_line.append(split_line[data_dict[par]])    # Value     
-                        data_line.append(split_line[data_dict[par]+1])  # QF 
-
-                        # Add line to data
-#                         print(len(data_line))
-                        data.append(data_line)
-
-
-        # Create dataframe  
-        data_header = [item for item in header if item in metadata_dict] + vocab_list + ['parameter', 'value', 'qflag']
-#         print(len(data_header), len(data[0]))
-        self.row_df = pd.DataFrame(data, columns=data_header) 
-        
+        consumer = RowDataConsumer()
+        self.scan(consumer, show_process_every=show_process_every)
+        self._set_row_data(consumer, print_to_file=print_to_file, **kwargs)
+
+    def _set_row_data(self, consumer, print_to_file='', **kwargs):
+        """
+        Creates self.row_df from a RowDataConsumer that has been used in a scan.
+        """
+        self.row_df = pd.DataFrame(consumer.data, columns=consumer.data_header)
         
         # Map header 
         mapping_file_path = os.path.join(odv_directory_path, 'odv_parameter_mapping.txt')
@@ -467,8 +528,6 @@ class SpreadsheetFile():
         new_header = [parameter_mapping.get_mapping(item) for item in self.row_df.columns] 
         
         self.row_df.columns = new_header 
-#         for par in sorted(self.row_df.columns): 
-#             print(par)
 
         # Refine data 
         for key in kwargs: 
@@ -478,8 +537,8 @@ class SpreadsheetFile():
                     value = [value]
                 self.row_df = self.row_df.loc[self.row_df[key].isin(value), :]
             
-        self.data_dict = data_dict
-        self.metadata_dict = metadata_dict
+        self.data_dict = consumer.data_dict
+        self.metadata_dict = consumer.metadata_dict
         
         # Add columns 
         self.row_df['SDATE'] = self.row_df['odv_time_string'].apply(mapping.sdate_from_odv_time_string)
@@ -519,6 +578,205 @@ class SpreadsheetFile():
         # astype(str) ???
 
 
+"""
+===============================================================================
+===============================================================================
+"""
+class SpreadsheetIndex():
+    """
+    Byte offset index of the stations in an ODV spreadsheet file.
+    A station block starts at a data row with value in the first column (Cruise) and ends where the next station
+    starts (or at end of file). For each station the index holds:
+        offset, length, nr_rows, cruise, station, local_cdi_id, time, lat, lon, variables (data variables with values)
+
+    The index is saved as a sidecar file (<file_path>.index.json) and is rebuilt if the size or modification time
+    of the spreadsheet file has changed (if the sidecar file can not be saved the index is only kept in memory).
+    Stations can then be read by seeking directly to them, ex:
+        index = SpreadsheetIndex(file_path)
+        entries = index.get_entries(local_cdi_id=['cdi_1', 'cdi_2'])
+        df = index.get_dataframe(entries)
+    """
+    version = 1
+    metadata_columns = {'Cruise': 'cruise',
+                        'Station': 'station',
+                        'LOCAL_CDI_ID': 'local_cdi_id',
+                        'yyyy-mm-ddThh:mm:ss.sss': 'time',
+                        'Latitude [degrees_north]': 'lat',
+                        'Longitude [degrees_east]': 'lon'}
+
+    def __init__(self, file_path, index_file_path=None, encoding='utf8', save=True, rebuild=False):
+        self.file_path = str(file_path)
+        self.index_file_path = index_file_path or self.file_path + '.index.json'
+        # None means the default encoding of the platform (same as SpreadsheetFile)
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self.header = []
+        self.header_offset = 0
+        self.header_length = 0
+        self.stations = []
+        if rebuild or not self._load():
+            self._build()
+            if save:
+                self.save()
+
+    def _get_file_stat(self):
+        stat = os.stat(self.file_path)
+        return stat.st_size, stat.st_mtime
+
+    def _load(self):
+        """
+        Loads the sidecar file if it exists and is valid for the current spreadsheet file.
+        :return: True if loaded
+        """
+        if not os.path.exists(self.index_file_path):
+            return False
+        try:
+            with open(self.index_file_path) as fid:
+                data = json.load(fid)
+        except ValueError:
+            return False
+        file_size, file_mtime = self._get_file_stat()
+        if data.get('version') != self.version or \
+                data.get('file_size') != file_size or \
+                data.get('file_mtime') != file_mtime or \
+                data.get('encoding') != self.encoding:
+            return False
+        self.header = data['header']
+        self.header_offset = data['header_offset']
+        self.header_length = data['header_length']
+        self.stations = data['stations']
+        return True
+
+    def _build(self):
+        self.header = []
+        self.stations = []
+        column_index = {}
+        variable_index = {}
+        current = None
+        current_variables = set()
+        offset = 0
+
+        def finish_station(end_offset):
+            current['length'] = end_offset - current['offset']
+            current['variables'] = [var for var in variable_index if var in current_variables]
+            self.stations.append(current)
+
+        with open(self.file_path, 'rb') as fid:
+            for byte_line in fid:
+                line_offset = offset
+                offset += len(byte_line)
+                if byte_line.startswith(b'//'):
+                    continue
+                line = byte_line.decode(self.encoding).rstrip('\r\n')
+                split_line = line.split('\t')
+                if line.startswith('Cruise'):
+                    self.header = split_line
+                    self.header_offset = line_offset
+                    self.header_length = len(byte_line)
+                    column_index = dict((col, k) for k, col in enumerate(split_line) if col in self.metadata_columns)
+                    # Data variables are found after the primary variable and are followed by a quality column
+                    variable_index = dict((col, k) for k, col in enumerate(split_line)
+                                          if k > 6 and col != 'QF' and not col.startswith('QV:'))
+                    continue
+                if split_line[0].strip():
+                    if current is not None:
+                        finish_station(line_offset)
+                    current = dict(offset=line_offset, nr_rows=0)
+                    for col, key in self.metadata_columns.items():
+                        value = split_line[column_index[col]] if col in column_index else ''
+                        if key in ['lat', 'lon']:
+                            try:
+                                value = float(value)
+                            except ValueError:
+                                value = None
+                        current[key] = value
+                    current_variables = set()
+                if current is None:
+                    continue
+                current['nr_rows'] += 1
+                for var, k in variable_index.items():
+                    if k < len(split_line) and split_line[k].strip():
+                        current_variables.add(var)
+        if current is not None:
+            finish_station(offset)
+
+    def save(self):
+        file_size, file_mtime = self._get_file_stat()
+        data = dict(version=self.version,
+                    file_size=file_size,
+                    file_mtime=file_mtime,
+                    encoding=self.encoding,
+                    header=self.header,
+                    header_offset=self.header_offset,
+                    header_length=self.header_length,
+                    stations=self.stations)
+        try:
+            with open(self.index_file_path, 'w') as fid:
+                json.dump(data, fid)
+        except OSError:
+            # The index is still used in memory, ex. if the directory is read-only
+            print('Could not save index: {}'.format(self.index_file_path))
+
+    def get_local_cdi_list(self):
+        """
+        :return: sorted list of all local_cdi_id:s in the file
+        """
+        return sorted(set(entry['local_cdi_id'] for entry in self.stations))
+
+    def get_station_count(self):
+        return len(self.stations)
+
+    def get_entries(self, **kwargs):
+        """
+        Returns index entries matching all given filters. Keys are entry keys (eg. local_cdi_id, station, cruise),
+        value is a single value or a list of accepted values.
+        :return: list of dicts
+        """
+        entries = self.stations
+        for key, value in kwargs.items():
+            if type(value) not in [list, set, tuple]:
+                value = [value]
+            value = set(value)
+            entries = [entry for entry in entries if entry.get(key) in value]
+        return entries
+
+    def read_station_lines(self, entries=None):
+        """
+        Reads the rows of the given stations by seeking to their offsets.
+        :param entries: list of index entries. All stations if not given
+        :return: list of lines (as strings without line break). Comment rows are excluded.
+        """
+        if entries is None:
+            entries = self.stations
+        lines = []
+        with open(self.file_path, 'rb') as fid:
+            for entry in entries:
+                fid.seek(entry['offset'])
+                block = fid.read(entry['length']).decode(self.encoding)
+                lines.extend([line.rstrip('\r') for line in block.split('\n')
+                              if line.strip() and not line.startswith('//')])
+        return lines
+
+    def get_dataframe(self, entries=None):
+        """
+        Reads the given stations into a pd.DataFrame with the spreadsheet header as columns.
+        Metadata is not repeated on rows where it is left out in the file.
+        :param entries: list of index entries. All stations if not given
+        :return: pd.DataFrame
+        """
+        data_lines = [line.split('\t') for line in self.read_station_lines(entries)]
+        return pd.DataFrame(data_lines, columns=self.header)
+
+
+def get_local_cdi_list_from_index(file_path, **kwargs):
+    """
+    Returns the local_cdi_id:s in the spreadsheet file using the SpreadsheetIndex. The index is created if needed.
+    :param file_path: spreadsheet file path
+    :param kwargs: passed to SpreadsheetIndex
+    :return: sorted list
+    """
+    return SpreadsheetIndex(file_path, **kwargs).get_local_cdi_list()
+
+
 """
 ===============================================================================
 ===============================================================================
@@ -529,11 +787,15 @@ class SpreadsheetFileColumns():
     """
     Class takes an ODV spreadsheet file, removes all comment lines and reads as pandas dataframe.
     OBS! Make sure NOT to "Use compact output".
+    If file_path is a list of files, processes > 1 loads the files in a process pool.
     """
+    metadata_columns = ['Cruise', 'Station', 'Type', 'yyyy-mm-ddThh:mm:ss.sss',
+                        'Longitude [degrees_east]', 'Latitude [degrees_north]', 'LOCAL_CDI_ID']
 
     # ==========================================================================
     def __init__(self, file_path=None, **kwargs):
         self.file_path = file_path
+        self.processes = kwargs.get('processes')
         self._load_data()
         self._add_columns(**kwargs)
 
@@ -561,53 +823,33 @@ class SpreadsheetFileColumns():
 
 
     def _load_several_files(self):
-        dfs = {}
-        headers = {}
-        for file_path in self.file_path:
-            data_lines = []
-            with codecs.open(file_path, encoding='utf8') as fid:
-                for line in fid:
-                    if line.startswith('//'):
-                        continue
-                    else:
-                        split_line = line.strip().split('\t')
-                        if line.startswith('Cruise'):
-                            # Header
-                            header = split_line
-                            new_header = []
-                            latest = None
-                            for h in header:
-                                if h == 'QV:SEADATANET':
-                                    new_header.append(' - '.join([latest, h]))
-                                else:
-                                    latest = h
-                                    new_header.append(h)
-                            headers[file_path] = new_header
-                        else:
-                            # Data line
-                            data_lines.append(split_line)
-            dfs[file_path] = pd.DataFrame(data_lines, columns=new_header)
-
-        header_list = []
-        for h in headers:
-            header_list.extend(headers[h])
-        header_list = sorted(set(header_list))
-
-        for item in dfs:
-            for h in header_list:
-                if h not in dfs[item].columns:
-                    dfs[item][h] = ''
-        self.header_list = header_list
-        # self.dfs = dfs
-        self.df = None
-        for item in dfs:
-            df = dfs[item].copy(deep=True)[header_list]
-            if self.df is None:
-                self.df = df
-            else:
-                # return
-                self.df = self.df.append(df)
+        """
+        Loads several files into one dataframe. Columns missing in a file are set to empty string.
+        Files are parsed in a process pool if processes > 1 is given to __init__.
+        Repeated metadata columns are categorical.
+        """
+        file_paths = list(self.file_path)
+        headers = dict((file_path, _get_spreadsheet_header(file_path)[1]) for file_path in file_paths)
+        header_list = set()
+        for h in headers.values():
+            header_list.update(h)
+        self.header_list = sorted(header_list)
+
+        jobs = [(file_path, self.header_list) for file_path in file_paths]
+        if self.processes and self.processes > 1 and len(jobs) > 1:
+            with multiprocessing.Pool(processes=min(self.processes, len(jobs))) as pool:
+                dfs = pool.starmap(_load_spreadsheet_data, jobs)
+        else:
+            dfs = [_load_spreadsheet_data(*job) for job in jobs]
 
+        # Union of categories so that the columns stay categorical in the concatenated dataframe
+        for col in self.metadata_columns:
+            if col not in self.header_list:
+                continue
+            categories = sorted(set().union(*[df[col].unique() for df in dfs]))
+            for df in dfs:
+                df[col] = pd.Categorical(df[col], categories=categories)
+        self.df = pd.concat(dfs)
 
     def _add_columns(self, **kwargs):
         # Add columns
@@ -622,7 +864,7 @@ class SpreadsheetFileColumns():
         self.df['LONGI_decdeg'] = self.df['Longitude [degrees_east]']
         self.df['LATIT'] = self.df['LATIT_decdeg'].apply(mapping.to_decmin)
         self.df['LONGI'] = self.df['LONGI_decdeg'].apply(mapping.to_decmin)
-        self.df['STATN'] = self.df['Station']
+        self.df['STATN'] = self.df['Station'].astype(str)
 
         # Add MYEAR
         self.df['MYEAR'] = self.df['SDATE'].apply(lambda x: int(x[:4]))
@@ -653,6 +895,50 @@ class SpreadsheetFileColumns():
 ===============================================================================
 ===============================================================================
 """       
+def _get_spreadsheet_header(file_path, encoding='utf8'):
+    """
+    Reads the comment block and header of a spreadsheet file.
+    Quality columns (QF, QV:SEADATANET) are renamed to "<parameter> - <quality column>" so that column names are
+    unique, ex. "TEMP [degC] - QF".
+    :return: number of lines before the header, header
+    """
+    with codecs.open(file_path, encoding=encoding) as fid:
+        for k, line in enumerate(fid):
+            if line.startswith('Cruise'):
+                break
+        else:
+            raise ValueError('No header found in file: {}'.format(file_path))
+    header = []
+    latest = None
+    for h in line.strip().split('\t'):
+        if h == 'QF' or h.startswith('QV:'):
+            header.append(' - '.join([latest, h]))
+        else:
+            latest = h
+            header.append(h)
+    return k, header
+
+
+def _load_spreadsheet_data(file_path, header_list=None, encoding='utf8'):
+    """
+    Loads the data rows of a spreadsheet file with pd.read_csv. Comment rows are excluded.
+    :param header_list: columns of the returned dataframe. Missing columns are set to empty string
+    :return: pd.DataFrame with string values
+    """
+    nr_lines, header = _get_spreadsheet_header(file_path, encoding=encoding)
+    with codecs.open(file_path, encoding=encoding) as fid:
+        for k in range(nr_lines + 1):
+            next(fid)
+        text = ''.join([line for line in fid if not line.startswith('//')])
+    df = pd.read_csv(io.StringIO(text), sep='\t', header=None, names=range(len(header)), dtype=str,
+                     keep_default_na=False, quoting=csv.QUOTE_NONE, engine='c')
+    df = df.fillna('')
+    df.columns = header
+    if header_list is not None:
+        df = df.reindex(columns=header_list, fill_value='')
+    return df
+
+
 def get_vocabs_from_string(string): 
     """
     Search in the string to find BODC vocabularies (P01, P06 etc. 
@@ -677,7 +963,9 @@ def get_vocabs_from_string(string):
 def compare_non_matching_local_cdi_id(directory='', 
                                       spreadsheet_file_name_1=None, 
                                       spreadsheet_file_name_2=None, 
-                                      print_to_files=False): 
+                                      print_to_files=False,
+                                      use_index=False,
+                                      encoding=None):
     """
     Created:    20180523
     Updated:    
@@ -686,6 +974,8 @@ def compare_non_matching_local_cdi_id(directory='',
     input files needs to be in the same directory. 
     Returns a dict with the result. 
     Prints to files in print_to_files=True 
+    If use_index=True the local_cdi_ids are taken from the SpreadsheetIndex of the files (created if needed).
+    encoding is the encoding of the files. None means the default encoding of the platform.
     """
     result = {}
     
@@ -695,36 +985,30 @@ def compare_non_matching_local_cdi_id(directory='',
     spreadsheet_file_path_1 = os.path.join(directory, spreadsheet_file_name_1)
     spreadsheet_file_path_2 = os.path.join(directory, spreadsheet_file_name_2)
     
-    object_1 = SpreadsheetFile(spreadsheet_file_path_1)
-    object_2 = SpreadsheetFile(spreadsheet_file_path_2) 
-    
-    cdi_list_1 = object_1.get_local_cdi_list()
-    print('= Done getting first list!')
-    cdi_list_2 = object_2.get_local_cdi_list()
-    print('= Done getting second list!')
+    if use_index:
+        cdi_list_1 = get_local_cdi_list_from_index(spreadsheet_file_path_1, encoding=encoding)
+        print('= Done getting first list!')
+        cdi_list_2 = get_local_cdi_list_from_index(spreadsheet_file_path_2, encoding=encoding)
+        print('= Done getting second list!')
+    else:
+        object_1 = SpreadsheetFile(spreadsheet_file_path_1)
+        object_2 = SpreadsheetFile(spreadsheet_file_path_2)
+
+        cdi_list_1 = object_1.get_local_cdi_list(encoding=encoding)
+        print('= Done getting first list!')
+        cdi_list_2 = object_2.get_local_cdi_list(encoding=encoding)
+        print('= Done getting second list!')
     
     result['cdi_id_list_' + base_1] = cdi_list_1
     result['cdi_id_list_' + base_2] = cdi_list_2
     
     # Check 2 not in 1  
-    cdi_not_in_1 = set()
-    for cdi in cdi_list_2:
-        if cdi not in cdi_list_1:
-            cdi_not_in_1.add(cdi)
-    cdi_not_in_1 = sorted(cdi_not_in_1)
+    cdi_not_in_1 = sorted(set(cdi_list_2) - set(cdi_list_1))
     print('Nr of local_cdi_id not in file 1: {}'.format(len(cdi_not_in_1))) 
     result['cdi_id_not_in_' + base_1] = cdi_not_in_1
     
-    t0 = time.time()
     # Check 1 not in 2 
-    cdi_not_in_2 = set()
-#    print(type(cdi_not_in_2))
-    for cdi in cdi_list_1:
-        if cdi not in cdi_list_2:
-#            print(type(cdi_not_in_2))
-            cdi_not_in_2.add(cdi)
-    print('TIME:', time.time()-t0)
-    cdi_not_in_2 = sorted(cdi_not_in_2)
+    cdi_not_in_2 = sorted(set(cdi_list_1) - set(cdi_list_2))
     print('Nr of local_cdi_id not in file 1: {}'.format(len(cdi_not_in_2))) 
     result['cdi_id_not_in_' + base_2] = cdi_not_in_2
           
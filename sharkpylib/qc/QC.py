@@ -6,12 +6,145 @@
 
 try:
     import numpy as np
+    import pandas as pd
     import seawater as sw
 except:
     pass
 
+from sharkpylib.qc import flags
+
+
+"""
+========================================================================
+Vectorized profile checks. All functions work on float arrays and boolean masks.
+Several profiles can be checked at once by giving groups (one group code per row, each profile stored in consecutive
+rows). Checks comparing a value to a previous value never look across a group boundary.
+========================================================================
+"""
+def get_ignore_boolean(qf, qf_ignore):
+    """
+    :param qf: array like of flags (str) or uint8 flag codes (see sharkpylib.qc.flags)
+    :param qf_ignore: list of flags (str) to ignore
+    :return: boolean array, True where the flag is in qf_ignore
+    """
+    qf = np.asarray(qf)
+    if not qf_ignore:
+        return np.zeros(len(qf), dtype=bool)
+    if qf.dtype == np.uint8:
+        return np.isin(qf, flags.SHARK.to_codes([f for f in qf_ignore if f in flags.SHARK.codes]))
+    return np.isin(qf.astype(str), [str(f) for f in qf_ignore])
+
+
+def get_group_start(nr_rows, groups=None):
+    """
+    :return: index of the first row in the group of every row
+    """
+    if groups is None:
+        return np.zeros(nr_rows, dtype=int)
+    groups = np.asarray(groups)
+    new_group = np.ones(nr_rows, dtype=bool)
+    new_group[1:] = groups[1:] != groups[:-1]
+    starts = np.flatnonzero(new_group)
+    return starts[np.cumsum(new_group) - 1]
+
+
+def previous_valid_index(valid, groups=None):
+    """
+    :param valid: boolean array
+    :param groups: group code for every row
+    :return: index of the closest previous valid row in the same group, -1 if there is none
+    """
+    nr_rows = len(valid)
+    index = np.where(valid, np.arange(nr_rows), -1)
+    previous = np.full(nr_rows, -1)
+    if nr_rows > 1:
+        previous[1:] = np.maximum.accumulate(index)[:-1]
+    previous[previous < get_group_start(nr_rows, groups)] = -1
+    return previous
+
+
+def range_boolean(data, lower_limit, upper_limit, ignore=None, depth=None, max_depth=False, min_depth=False):
+    """
+    :param data: float array
+    :param lower_limit: float or float array, flag data below this value
+    :param upper_limit: float or float array, flag data above this value
+    :param ignore: boolean array, True for values that should not be checked
+    :param depth: float array, used with max_depth and min_depth
+    :return: boolean array, True for values out of range
+    """
+    check = np.ones(len(data), dtype=bool)
+    if depth is not None:
+        if max_depth:
+            check &= depth <= max_depth
+        if min_depth:
+            check &= depth >= min_depth
+    if ignore is not None:
+        check &= ~ignore
+    with np.errstate(invalid='ignore'):
+        return check & ((data < lower_limit) | (data > upper_limit))
+
+
+def increasing_boolean(data, min_delta=0.01, ignore=None, groups=None):
+    """
+    Checks that data is increasing. A value is flagged if it is at least min_delta lower than the previous value that
+    is not ignored. As in the original loop implementation a previous value of 0 is not used for comparison.
+    :param data: float array
+    :param min_delta: float
+    :param ignore: boolean array, True for values that should not be checked (and not be used as previous value)
+    :param groups: group code for every row
+    :return: boolean array, True for values that are not increasing
+    """
+    valid = np.ones(len(data), dtype=bool) if ignore is None else ~ignore
+    previous = previous_valid_index(valid, groups)
+    has_previous = previous >= 0
+    previous_data = np.where(has_previous, data[previous], np.nan)
+    with np.errstate(invalid='ignore'):
+        return valid & has_previous & (previous_data != 0) & (previous_data > data) & \
+               (previous_data - data >= min_delta)
+
+
+def sensor_diff_boolean(data1, data2, max_diff=0.2, ignore1=None, ignore2=None):
+    """
+    :param data1: float array, primary sensor
+    :param data2: float array, secondary sensor
+    :param max_diff: float
+    :param ignore1: boolean array, True for values in data1 that should not be compared
+    :param ignore2: boolean array, True for values in data2 that should not be compared
+    :return: boolean array, True where the difference is max_diff or larger
+    """
+    check = np.ones(len(data1), dtype=bool)
+    if ignore1 is not None:
+        check &= ~ignore1
+    if ignore2 is not None:
+        check &= ~ignore2
+    with np.errstate(invalid='ignore'):
+        return check & (np.abs(data1 - data2) >= max_diff)
+
+
+def std_from_mean_boolean(data, nr_std=3, groups=None):
+    """
+    :param data: float array
+    :param nr_std: number of standard deviations
+    :param groups: group code for every row. Mean and std are calculated per group
+    :return: boolean array, True for values more than nr_std standard deviations from the mean
+    """
+    if groups is None:
+        groups = np.zeros(len(data), dtype=int)
+    grouped = pd.Series(data).groupby(np.asarray(groups), sort=False)
+    mean_value = grouped.transform('mean').to_numpy()
+    std_value = grouped.transform('std', ddof=0).to_numpy()
+    with np.errstate(invalid='ignore'):
+        return np.abs(data - mean_value) > (std_value * float(nr_std))
+
+
 class QC(object):
+    """
+    Profile checks. Inputs are converted to float arrays and flag arrays once and checked with the vectorized
+    functions above. Flags can be given as str or as uint8 flag codes (see sharkpylib.qc.flags). New flags are
+    returned in the same format as given.
 
+    Use run_profiles to check many profiles in one call.
+    """
     def __init__(self):
 
         pass
@@ -24,187 +157,115 @@ class QC(object):
         :return: input as numpy array
         """
         try:
-            data = np.array(in_data, dtype=dtype)
-        except:
+            return np.array(in_data, dtype=dtype)
+        except (TypeError, ValueError):
+            pass
+        try:
+            # Empty strings are treated as missing values
+            serie = pd.Series(list(in_data), dtype=object)
+        except TypeError:
+            print('input is not iterable:', in_data, type(in_data))
+            return None
+        if dtype == 'float':
+            serie = serie.where(serie != '', np.nan)
             try:
-                iterator = iter(in_data)
-                data = np.array([], dtype=dtype)
-                for i in iterator:
-                    if i == '':
-                        data = np.append(data, np.nan)
-                    else:
-                        try:
-                            if dtype == 'float':
-                                data = np.append(data, float(i))
-                            elif dtype == 'str':
-                                data = np.append(data, str(i))
-                            else:
-                                data = np.append(data)
-
-                        except:
-                            raise ValueError('Cant convert %i to float' % i)
-            except TypeError as te:
-                print('input is not iterable:', in_data, type(in_data))
-
-        return data
-
-    def range_check(self, data=False, qf=False, lower_limit=0, upper_limit=40, depth=False, max_depth=False, min_depth=False, qf_ignore=['B','S','?']):
+                return serie.to_numpy(dtype=float)
+            except (TypeError, ValueError):
+                raise ValueError('Cant convert %s to float' % in_data)
+        return serie.where(serie != '', np.nan).astype(dtype).to_numpy()
+
+    def _convert_qf(self, qf):
+        """
+        :return: qf as uint8 code array if given as codes, else as str array
+        """
+        if isinstance(qf, np.ndarray) and qf.dtype == np.uint8:
+            return qf.copy()
+        return self._convert_to_np_array(qf, dtype=str)
+
+    @staticmethod
+    def _get_new_qf(qfindex, qf=None, flag='B'):
+        """
+        :return: qf (or empty flags) with flag where qfindex is True
+        """
+        if qf is None:
+            new_qf = np.array([''] * len(qfindex))
+        else:
+            new_qf = qf
+        if new_qf.dtype == np.uint8:
+            new_qf[qfindex] = flags.get_flag_code(flag)
+        else:
+            new_qf[qfindex] = flag
+        return new_qf
 
+    def range_check(self, data=False, qf=False, lower_limit=0, upper_limit=40, depth=False, max_depth=False,
+                    min_depth=False, qf_ignore=['B', 'S', '?'], groups=None):
         """
         Range check routine for checking if data is below lower_limit or above upper_limit
         :param data: data input as a list or iterable that can be converted to a numpy array
         :param qf: quality flag as a list or iterable that can be converted to a numpy array
-        :param lower_limit: lower value, flag data below this value
-        :param upper_limit: upper value, flag data above this value
+        :param lower_limit: lower value, flag data below this value (float or array with one value per row)
+        :param upper_limit: upper value, flag data above this value (float or array with one value per row)
         :param depth: depth input as a list or iterable that can be converted to a numpy array
         :param max_depth: max depth, check only data above this depth
         :param min_depth: min depth, check only data below this depth
         :return: index for flag changes and the new flag array, also an array with numeric index positions for suggested flag changes
         """
+        data = self._convert_to_np_array(data)
 
-        if data:
-            data = self._convert_to_np_array(data)
-        #     try:
-        #         self.data = np.array(data)
-        #     except:
-        #         try:
-        #             iterator = iter(data)
-        #             self.data = np.array([])
-        #             for i in iterator:
-        #                 self.data = np.append(self.data, i)
-        #         except TypeError as te:
-        #             print('data is not iterable:', data)
-        # else:
-        #     raise ValueError('no data was supplied!')
-
-        index_depth = np.full((len(data)), True)
-
-        if depth:
+        if depth is not False and depth is not None and len(depth):
             depth = self._convert_to_np_array(depth)
-            # try:
-            #     self.depth = np.array(depth)
-            # except:
-            #     try:
-            #         iterator = iter(depth)
-            #         self.depth = np.array([])
-            #         for i in iterator:
-            #             self.depth = np.append(self.depth, i)
-            #     except TypeError as te:
-            #         print('depth is not iterable:', depth)
-
             if len(depth) != len(data):
                 raise ValueError('data and depth are not the same length, %s and %s' % (len(data), len(depth)))
+        else:
+            depth = None
 
-            if max_depth:
-                index_depth = index_depth & (depth <= max_depth)
-
-            if min_depth:
-                index_depth = index_depth & (depth >= min_depth)
-
-
-        if qf:
-            qf = self._convert_to_np_array(qf)
-            # try:
-            #     self.qf = np.array(qf)
-            # except:
-            #     try:
-            #         iterator = iter(qf)
-            #         self.qf = np.array([])
-            #         for i in iterator:
-            #             self.qf = np.append(self.qf, i)
-            #     except TypeError as te:
-            #         print('qf is not iterable:', qf)
-
-            if qf_ignore:
-                for i in qf_ignore:
-                    index_depth = index_depth & (qf != i)
-
-
-
-            index_below = data < lower_limit
-
-            index_above = data > upper_limit
-
-            qfindex = index_depth & (index_below | index_above)
-
-            new_qf = qf
-            new_qf[qfindex] = 'B'
-
-            qfindex_numeric = np.arange(len(data))
-            qfindex_numeric = qfindex_numeric[qfindex]
-
+        qf = self._convert_qf(qf) if qf is not False and qf is not None else None
+        ignore = get_ignore_boolean(qf, qf_ignore) if qf is not None else None
 
-        return qfindex, new_qf, qfindex_numeric
+        qfindex = range_boolean(data, lower_limit, upper_limit, ignore=ignore, depth=depth,
+                                max_depth=max_depth, min_depth=min_depth)
+        new_qf = self._get_new_qf(qfindex, qf)
 
-    def increasing_dens(self, temperature=False, qtemp=[], salinity=False, qsalt=[], pressure=False, qpres=[], min_delta = 0.01, qf_ignore = ['B','S','?']):
+        return qfindex, new_qf, np.flatnonzero(qfindex)
 
+    def increasing_dens(self, temperature=False, qtemp=[], salinity=False, qsalt=[], pressure=False, qpres=[],
+                        min_delta=0.01, qf_ignore=['B', 'S', '?'], groups=None):
+        """
+        Checks that potential density is increasing. Values with a flag in qf_ignore (in any of the parameters) are
+        marked in qfindex and not used in the check.
+        :return: index for flag changes and the new flag array, also an array with numeric index positions
+        """
         temp = self._convert_to_np_array(temperature)
         salt = self._convert_to_np_array(salinity)
         pres = self._convert_to_np_array(pressure)
 
         dens = sw.pden(salt, temp, pres, 0)
 
+        ignore = np.zeros(len(temp), dtype=bool)
+        for qf in [qtemp, qsalt, qpres]:
+            if qf is not None and len(qf) > 0:
+                ignore |= get_ignore_boolean(self._convert_qf(qf), qf_ignore)
 
-        dens_temp = False
-
-        qfindex = np.full((len(temp)), False)
-        new_qf = np.array(['']*len(temp))
+        qfindex = ignore | increasing_boolean(dens, min_delta=min_delta, ignore=ignore, groups=groups)
+        new_qf = self._get_new_qf(qfindex)
 
-        for i, d in enumerate(dens):
-            if len(qtemp) > 0:
-                if qtemp[i] in qf_ignore:
-                    qfindex[i] = True
-                    continue
-            if len(qsalt) > 0:
-                if qsalt[i] in qf_ignore:
-                    qfindex[i] = True
-                    continue
-            if len(qpres) > 0:
-                if qpres[i] in qf_ignore:
-                    qfindex[i] = True
-                    continue
-
-            if dens_temp:
-                if dens_temp > d: # not increasing = bad
-                    if (dens_temp-d) >= min_delta:
-                        qfindex[i] = True
-
-            dens_temp = d
-
-        new_qf[qfindex] = 'B'
-
-        qfindex_numeric = np.arange(len(temp))
-        qfindex_numeric = qfindex_numeric[qfindex]
-
-        return qfindex, new_qf, qfindex_numeric
-
-    def increasing(self, data=False, qf=[], min_delta = 0.01, qf_ignore = ['B','S','?']):
+        return qfindex, new_qf, np.flatnonzero(qfindex)
 
+    def increasing(self, data=False, qf=[], min_delta=0.01, qf_ignore=['B', 'S', '?'], groups=None):
+        """
+        Checks that data is increasing. Values with a flag in qf_ignore are not used in the check.
+        :return: index for flag changes and the new flag array, also an array with numeric index positions
+        """
         data = self._convert_to_np_array(data)
 
-        data_temp = False
+        ignore = None
+        if qf is not None and len(qf) > 0:
+            ignore = get_ignore_boolean(self._convert_qf(qf), qf_ignore)
 
-        qfindex = np.full((len(data)), False)
-        new_qf = np.array(['']*len(data))
+        qfindex = increasing_boolean(data, min_delta=min_delta, ignore=ignore, groups=groups)
+        new_qf = self._get_new_qf(qfindex)
 
-        for i, d in enumerate(data):
-            if len(qf) > 0:
-                if qf[i] in qf_ignore:
-                    continue
-
-            if data_temp:
-                if data_temp > d: # not increasing = bad
-                    if (data_temp-d) >= min_delta:
-                        qfindex[i] = True
-
-            data_temp = d
-
-        new_qf[qfindex] = 'B'
-
-        qfindex_numeric = np.arange(len(data))
-        qfindex_numeric = qfindex_numeric[qfindex]
-
-        return qfindex, new_qf, qfindex_numeric
+        return qfindex, new_qf, np.flatnonzero(qfindex)
 
     #def spike_check(self):
     #    pass
@@ -217,25 +278,23 @@ class QC(object):
     # CMEMS har vissa gränser satta från data på stationer (och månad)
 
     # std mot hela profilen
-    def _check_std_from_mean(self, data=False, nr_std=3, pressure=False, depth=False):
-
-        if data:
-                data_array = self._convert_to_np_array(data)
-        else:
+    def _check_std_from_mean(self, data=False, nr_std=3, pressure=False, depth=False, groups=None):
+        """
+        Prints a warning for values more than nr_std standard deviations from the mean of the profile.
+        :return: boolean array, True for values more than nr_std standard deviations from the mean
+        """
+        if data is False or data is None or not len(data):
             raise ValueError('Missing data input!')
+        data_array = self._convert_to_np_array(data)
 
-        mean_value = np.nanmean(data_array)  # Mean value
-        std_value = np.nanstd(data_array)    # Std
-
-        if not np.isnan(mean_value):
-            output_array = np.abs(data_array - mean_value) > (std_value * float(nr_std))
-            for i, val in enumerate(output_array):
-                if val:
-                    print('Warning! Value > %.1f std from mean. Value: %s, index: %s' % (float(nr_std), val, i))
-                    if pressure:
-                        print('at %s dbar' % pressure(i))
-                    if depth:
-                        print('at %s meter' % depth(i))
+        output_array = std_from_mean_boolean(data_array, nr_std=nr_std, groups=groups)
+        for i in np.flatnonzero(output_array):
+            print('Warning! Value > %.1f std from mean. Value: %s, index: %s' % (float(nr_std), data_array[i], i))
+            if pressure is not False and pressure is not None:
+                print('at %s dbar' % pressure[i])
+            if depth is not False and depth is not None:
+                print('at %s meter' % depth[i])
+        return output_array
 
     # std mot neighboring??
 
@@ -253,7 +312,8 @@ class QC(object):
             raise ValueError('length of input data differs!')
 
     # delta mellan sensorer om flera finns
-    def sensor_diff(self, data_primary=False, qf_primary=False, data_secondary=False, qf_secondary=False, max_diff=0.2, qf_ignore = ['B','S','?']):
+    def sensor_diff(self, data_primary=False, qf_primary=False, data_secondary=False, qf_secondary=False,
+                    max_diff=0.2, qf_ignore=['B', 'S', '?'], groups=None):
         """
         Function to compare data from primary and secondary sensor
         :param data_primary:
@@ -264,44 +324,72 @@ class QC(object):
         :param qf_ignore:
         :return:
         """
-
-        if data_primary and data_secondary:
-            if len(data_primary) == len(data_secondary):
-                data1 = self._convert_to_np_array(data_primary)
-                data2 = self._convert_to_np_array(data_secondary)
-
-            else:
-                raise ValueError('length of input data differs!')
-        else:
+        if data_primary is False or data_primary is None or data_secondary is False or data_secondary is None or \
+                not len(data_primary) or not len(data_secondary):
             raise ValueError('Missing data input!')
-
-        if qf_primary and qf_secondary:
-            if len(qf_primary) == len(qf_secondary):
-                qf1 = self._convert_to_np_array(qf_primary, dtype='str')
-                qf2 = self._convert_to_np_array(qf_secondary, dtype='str')
-
-            else:
+        if len(data_primary) != len(data_secondary):
+            raise ValueError('length of input data differs!')
+        data1 = self._convert_to_np_array(data_primary)
+        data2 = self._convert_to_np_array(data_secondary)
+
+        ignore1 = None
+        ignore2 = None
+        has_qf = all(qf is not False and qf is not None and len(qf) for qf in [qf_primary, qf_secondary])
+        if has_qf:
+            if len(qf_primary) != len(qf_secondary):
                 raise ValueError('length of quality flag arrays differs!')
+            # remove data with quality flag in qf_ignore
+            ignore1 = get_ignore_boolean(self._convert_qf(qf_primary), qf_ignore)
+            ignore2 = get_ignore_boolean(self._convert_qf(qf_secondary), qf_ignore)
         else:
             print('Warning! Missing quality flag input!')
 
-        # remove data with quality flag in qf_ignore
-        if qf_primary and qf_secondary:
-            counter = 0
-            for qaa, qbb in zip(qf1, qf2):
-                if qaa in qf_ignore:
-                    data1[counter] = np.nan
-                if qbb in qf_ignore:
-                    data2[counter] = np.nan
-
-                counter += 1
-
-        qfindex = np.abs(data1-data2) >= max_diff
+        qfindex = sensor_diff_boolean(data1, data2, max_diff=max_diff, ignore1=ignore1, ignore2=ignore2)
 
         if qfindex.any():
             print('Warning! difference between data differs more than maximum allowed difference %s' % max_diff )
 
-        qfindex_numeric = np.arange(len(qfindex))
-        qfindex_numeric = qfindex_numeric[qfindex]
+        return qfindex, np.flatnonzero(qfindex)
+
+    def run_profiles(self, routine, profiles, **kwargs):
+        """
+        Batch entry point. Runs a check on many profiles in one vectorized call.
 
-        return qfindex, qfindex_numeric
+        :param routine: name of the check, eg. 'range_check', 'increasing', 'increasing_dens' or 'sensor_diff'
+        :param profiles: list of dicts. Each dict holds the per row arguments of one profile (eg. data, qf, depth)
+        :param kwargs: arguments shared by all profiles (eg. lower_limit, qf_ignore)
+        :return: list with the result of every profile, same as calling the routine once per profile
+        """
+        if not profiles:
+            return []
+        keys = [key for key in profiles[0] if key not in kwargs]
+        lengths = [len(next(iter(p[key] for key in keys if len(p[key]) > 0), [])) for p in profiles]
+
+        stacked = {}
+        for key in keys:
+            if all(len(p[key]) == n for p, n in zip(profiles, lengths)):
+                stacked[key] = np.concatenate([self._convert_arg(key, p[key]) for p in profiles])
+        groups = np.repeat(np.arange(len(profiles)), lengths)
+
+        result = getattr(self, routine)(groups=groups, **stacked, **kwargs)
+
+        # Split result per profile. Numeric index arrays are recalculated from the boolean index
+        split_at = np.cumsum(lengths)[:-1]
+        qfindex_list = np.split(result[0], split_at)
+        profile_results = []
+        for i, qfindex in enumerate(qfindex_list):
+            parts = [qfindex]
+            for item in result[1:-1]:
+                parts.append(np.split(item, split_at)[i])
+            parts.append(np.flatnonzero(qfindex))
+            profile_results.append(tuple(parts))
+        return profile_results
+
+    def _convert_arg(self, key, value):
+        """
+        Converts a per row argument for run_profiles. Flags (qf, qtemp, qsalt..) are kept as str or uint8 codes,
+        everything else is converted to float.
+        """
+        if key.startswith('q'):
+            return self._convert_qf(value)
+        return self._convert_to_np_array(value)
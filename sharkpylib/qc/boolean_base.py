@@ -5,7 +5,76 @@ Created on 2019-08-30 15:05
 @author: a002028
 
 """
+import operator
 import numpy as np
+import pandas as pd
+
+
+class BooleanExpression:
+    """
+    Records conditions and evaluates them (combined with AND) in one pass.
+
+    A condition is either array like / bool, or a callable taking an array of row positions and returning the
+    boolean for those rows. Callables are only evaluated for rows that are still True, which means that no work
+    is done on rows already excluded by earlier conditions. The evaluated result is cached and only new
+    conditions are evaluated on the next call.
+    """
+    def __init__(self):
+        self._conditions = []
+        self._mask = None
+        self._nr_evaluated = 0
+
+    def __len__(self):
+        return len(self._conditions)
+
+    def add(self, condition):
+        self._conditions.append(condition)
+
+    def reset(self):
+        self._conditions = []
+        self._mask = None
+        self._nr_evaluated = 0
+
+    def evaluate(self, length):
+        """
+        :param length: number of rows
+        :return: numpy boolean array
+        """
+        if self._mask is None or len(self._mask) != length:
+            self._mask = np.ones(length, dtype=bool)
+            self._nr_evaluated = 0
+
+        mask = self._mask
+        for condition in self._conditions[self._nr_evaluated:]:
+            if callable(condition):
+                rows = np.flatnonzero(mask)
+                if rows.size:
+                    mask[rows] = condition(rows)
+            else:
+                np.logical_and(mask, np.asarray(condition, dtype=bool), out=mask)
+        self._nr_evaluated = len(self._conditions)
+        return mask.copy()
+
+
+def _compare(values, op, value):
+    """
+    :return: op(values, value) as a numpy boolean array. Comparisons with nan are False (except for "not equal")
+    """
+    with np.errstate(invalid='ignore'):
+        return np.asarray(op(values, value), dtype=bool)
+
+
+def _combine_booleans(booleans, func, length):
+    """
+    Combines booleans without stacking them into a new matrix.
+    :param booleans: list of array like
+    :param func: np.logical_and or np.logical_or
+    :return: numpy boolean array
+    """
+    result = np.full(length, func is np.logical_and, dtype=bool)
+    for boolean in booleans:
+        func(result, np.asarray(boolean, dtype=bool), out=result)
+    return result
 
 
 class BooleanBaseDataFrame:
@@ -14,23 +83,29 @@ class BooleanBaseDataFrame:
     def __init__(self):
         super().__init__()
         self.data = None
-        self._boolean = True
+        self._expression = BooleanExpression()
         self._boolean_combo = {}
 
+    def _values(self, param):
+        return self.data[param].to_numpy()
+
+    def _add_comparison(self, param, op, value):
+        self.boolean = lambda rows: _compare(self._values(param)[rows], op, value)
+
     def add_boolean_from_list(self, parameter, value_list):
         """
         :param parameter:
         :param value_list:
         :return: Adds boolean to self.boolean. See property: self.boolean
         """
-        self.boolean = self.data[parameter].isin(value_list)
+        self.boolean = lambda rows: pd.Series(self._values(parameter)[rows]).isin(value_list).to_numpy()
 
     def add_boolean_month(self, month):
         """
         :param month:
         :return:
         """
-        self.boolean = self.data['timestamp'].dt.month == month
+        self.boolean = lambda rows: pd.DatetimeIndex(self._values('timestamp')[rows]).month == month
 
     def add_boolean_diff(self, parameters, accepted_diff):
         """
@@ -41,12 +116,14 @@ class BooleanBaseDataFrame:
         # We need 2, and only 2 parameters
         assert len(parameters) == 2
 
-        # Get the absolute difference between parameter_1 and parameter_2
-        diff = self.data[parameters].astype(float).diff(axis=1).abs()
+        def condition(rows):
+            # Get the absolute difference between parameter_1 and parameter_2
+            diff = np.abs(self._values(parameters[-1])[rows].astype(float) -
+                          self._values(parameters[0])[rows].astype(float))
+            # Check how parameter_2 compares to parameter_1 (True indicates difference acceptance)
+            return _compare(diff, operator.le, accepted_diff)
 
-        # Check how parameter_2 compares to parameter_1 and add this to self.boolean
-        # (True indicates difference acceptance)
-        self.boolean = diff[parameters[-1]] <= accepted_diff
+        self.boolean = condition
 
     def add_boolean_equal(self, param, value):
         """
@@ -54,7 +131,7 @@ class BooleanBaseDataFrame:
         :param value:
         :return:
         """
-        self.boolean = self.data[param] == value
+        self._add_comparison(param, operator.eq, value)
 
     def add_boolean_less_or_equal(self, param, value):
         """
@@ -62,7 +139,7 @@ class BooleanBaseDataFrame:
         :param value:
         :return:
         """
-        self.boolean = self.data[param] <= value
+        self._add_comparison(param, operator.le, value)
 
     def add_boolean_greater_or_equal(self, param, value):
         """
@@ -70,7 +147,7 @@ class BooleanBaseDataFrame:
         :param value:
         :return:
         """
-        self.boolean = self.data[param] >= value
+        self._add_comparison(param, operator.ge, value)
 
     def add_boolean_not_equal(self, param, value):
         """
@@ -78,20 +155,20 @@ class BooleanBaseDataFrame:
         :param value:
         :return:
         """
-        self.boolean = self.data[param] != value
+        self._add_comparison(param, operator.ne, value)
 
     def add_boolean_not_nan(self, param):
         """
         :param param:
         :return:
         """
-        self.boolean = self.data[param].notna()
+        self.boolean = lambda rows: pd.notna(self._values(param)[rows])
 
     def reset_boolean(self):
         """
         :return:
         """
-        self._boolean = True
+        self._expression.reset()
 
     def reset_boolean_combo(self):
         """
@@ -109,7 +186,7 @@ class BooleanBaseDataFrame:
         self._boolean_combo[key] = boolean
         if only_true_values:
             boolean_true = self.boolean_not_nan(key)
-            self._boolean_combo[key] = self._boolean_combo[key] & boolean_true
+            self._boolean_combo[key] = np.asarray(self._boolean_combo[key], dtype=bool) & boolean_true.to_numpy()
 
     def remove_combo_boolean(self, key):
         """
@@ -131,14 +208,15 @@ class BooleanBaseDataFrame:
 
     @property
     def combo_boolean_all(self):
-        try:
-            return self._boolean_stack.all(axis=1)
-        except ValueError:
-            return self._boolean
+        if not self._boolean_combo:
+            return self.boolean
+        return _combine_booleans(self._boolean_combo.values(), np.logical_and, len(self.data))
 
     @property
     def combo_boolean_any(self):
-        return self._boolean_stack.any(axis=1)
+        if not self._boolean_combo:
+            raise ValueError('No combo booleans added')
+        return _combine_booleans(self._boolean_combo.values(), np.logical_or, len(self.data))
 
     @property
     def index(self):
@@ -146,15 +224,17 @@ class BooleanBaseDataFrame:
 
     @property
     def boolean(self):
-        return self._boolean
+        if not len(self._expression):
+            return True
+        return pd.Series(self._expression.evaluate(len(self.data)), index=self.data.index)
 
     @boolean.setter
     def boolean(self, add_bool):
         """
-        :param add_bool:
+        :param add_bool: array like, bool or callable (see BooleanExpression)
         :return:
         """
-        self._boolean = self._boolean & add_bool
+        self._expression.add(add_bool)
 
 
 class BooleanBaseSerie:
@@ -163,16 +243,28 @@ class BooleanBaseSerie:
     def __init__(self):
         super().__init__()
         self.serie = None
-        self._boolean = True
+        self._expression = BooleanExpression()
         self._boolean_combo = {}
 
+    def _values(self):
+        return self.serie.to_numpy()
+
+    def _add_comparison(self, op, value):
+        self.boolean = lambda rows: _compare(self._values()[rows], op, value)
+
+    def _add_comparison_to_other(self, op, other):
+        if isinstance(other, pd.Series):
+            other = other.reindex(self.serie.index)
+        other = np.asarray(other)
+        self.boolean = lambda rows: _compare(self._values()[rows], op, other[rows])
+
     def add_boolean_from_list(self, value_list):
         """
         :param parameter:
         :param value_list:
         :return: Adds boolean to self.boolean. See property: self.boolean
         """
-        self.boolean = self.serie.isin(value_list)
+        self.boolean = lambda rows: pd.Series(self._values()[rows]).isin(value_list).to_numpy()
 
     def add_boolean_equal(self, value):
         """
@@ -180,7 +272,7 @@ class BooleanBaseSerie:
         :param value:
         :return:
         """
-        self.boolean = self.serie == value
+        self._add_comparison(operator.eq, value)
 
     def add_boolean_less_or_equal(self, value):
         """
@@ -188,7 +280,7 @@ class BooleanBaseSerie:
         :param value:
         :return:
         """
-        self.boolean = self.serie <= value
+        self._add_comparison(operator.le, value)
 
     def add_boolean_greater_or_equal(self, value):
         """
@@ -196,7 +288,7 @@ class BooleanBaseSerie:
         :param value:
         :return:
         """
-        self.boolean = self.serie >= value
+        self._add_comparison(operator.ge, value)
 
     def add_boolean_not_equal(self, value):
         """
@@ -204,7 +296,7 @@ class BooleanBaseSerie:
         :param value:
         :return:
         """
-        self.boolean = self.serie != value
+        self._add_comparison(operator.ne, value)
 
     def add_boolean_less_than_other(self, other):
         """
@@ -212,7 +304,7 @@ class BooleanBaseSerie:
         :param other: other pd.Serie of the same length as self.serie
         :return:
         """
-        self.boolean = self.serie.lt(other)
+        self._add_comparison_to_other(operator.lt, other)
 
     def add_boolean_greater_than_other(self, other):
         """
@@ -220,20 +312,20 @@ class BooleanBaseSerie:
         :param other: other pd.Serie of the same length as self.serie
         :return:
         """
-        self.boolean = self.serie.gt(other)
+        self._add_comparison_to_other(operator.gt, other)
 
     def add_boolean_not_nan(self):
         """
         :param param:
         :return:
         """
-        self.boolean = self.serie.notna()
+        self.boolean = lambda rows: pd.notna(self._values()[rows])
 
     def reset_boolean(self):
         """
         :return:
         """
-        self._boolean = True
+        self._expression.reset()
 
     def reset_boolean_combo(self):
         """
@@ -250,8 +342,8 @@ class BooleanBaseSerie:
         """
         self._boolean_combo[key] = boolean
         if only_true_values:
-            boolean_true = self._boolean_not_nan(key)
-            self._boolean_combo[key] = self._boolean_combo[key] & boolean_true
+            boolean_true = self._boolean_not_nan()
+            self._boolean_combo[key] = np.asarray(self._boolean_combo[key], dtype=bool) & boolean_true.to_numpy()
 
     def remove_combo_boolean(self, key):
         """
@@ -273,14 +365,15 @@ class BooleanBaseSerie:
 
     @property
     def combo_boolean_all(self):
-        try:
-            return self._boolean_stack.all(axis=1)
-        except ValueError:
-            return self._boolean
+        if not self._boolean_combo:
+            return self.boolean
+        return _combine_booleans(self._boolean_combo.values(), np.logical_and, len(self.serie))
 
     @property
     def combo_boolean_any(self):
-        return self._boolean_stack.any(axis=1)
+        if not self._boolean_combo:
+            raise ValueError('No combo booleans added')
+        return _combine_booleans(self._boolean_combo.values(), np.logical_or, len(self.serie))
 
     @property
     def index(self):
@@ -288,12 +381,14 @@ class BooleanBaseSerie:
 
     @property
     def boolean(self):
-        return self._boolean
+        if not len(self._expression):
+            return True
+        return pd.Series(self._expression.evaluate(len(self.serie)), index=self.serie.index)
 
     @boolean.setter
     def boolean(self, add_bool):
         """
-        :param add_bool:
+        :param add_bool: array like, bool or callable (see BooleanExpression)
         :return:
         """
-        self._boolean = self._boolean & add_bool
+        self._expression.add(add_bool)
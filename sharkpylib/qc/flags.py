@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+
+class FlagScheme:
+    """
+    Compact uint8 representation of quality flags.
+
+    Flags are given in priority order (lowest first) and the code of a flag is its position in that order.
+    Flags can therefore be combined by priority with np.maximum on the codes (see combine).
+    Conversion from/to flag strings should only be done when reading from or writing to a DataFrame.
+    """
+    def __init__(self, flags):
+        self.flags = np.array(flags)
+        self.codes = {flag: np.uint8(i) for i, flag in enumerate(flags)}
+
+        # Lookup table from byte value of single character flags to code. An empty flag is given code 0
+        self._byte_lookup = np.zeros(256, dtype=np.uint8)
+        self._known_bytes = np.zeros(256, dtype=bool)
+        self._known_bytes[0] = True
+        for flag, code in self.codes.items():
+            self._byte_lookup[ord(flag)] = code
+            self._known_bytes[ord(flag)] = True
+
+    def __len__(self):
+        return len(self.flags)
+
+    def get_code(self, flag):
+        """
+        :param flag: str, eg. 'B'
+        :return: uint8 code for the given flag
+        """
+        return self.codes[str(flag)]
+
+    def to_codes(self, flags):
+        """
+        :param flags: array like of single character flags. Empty flags are given code 0
+        :return: array of uint8 codes. Raises ValueError for unknown flags
+        """
+        flags = np.asarray(flags, dtype=str)
+        if flags.dtype.itemsize > 4 and (np.char.str_len(flags) > 1).any():
+            raise ValueError('Flags should be single characters: {}'.format(
+                sorted(set(flags[np.char.str_len(flags) > 1]))))
+        flags = np.ascontiguousarray(flags, dtype='U1')
+        code_points = flags.view(np.uint32)
+        in_range = code_points < 256
+        code_points = np.where(in_range, code_points, 0)
+        known = in_range & self._known_bytes[code_points]
+        if not known.all():
+            raise ValueError('Unknown flags: {}'.format(sorted(set(flags[~known]))))
+        return self._byte_lookup[code_points]
+
+    def to_strings(self, codes):
+        """
+        :param codes: array of uint8 codes
+        :return: array of str
+        """
+        return self.flags[np.asarray(codes, dtype=np.uint8)]
+
+    def strings_to_matrix(self, strings, width):
+        """
+        Converts flag strings with one flag per QC-routine (eg. 'A00BS') to a code matrix.
+        :param strings: array like of str
+        :param width: number of flags in each string. Shorter strings are padded with '0'
+        :return: uint8 array with shape (len(strings), width). Raises ValueError for strings longer than width
+        """
+        strings = np.asarray(strings, dtype=str)
+        if strings.dtype.itemsize > 4 * width and (np.char.str_len(strings) > width).any():
+            raise ValueError('Flag strings longer than {} flags: {}'.format(
+                width, sorted(set(strings[np.char.str_len(strings) > width]))))
+        strings = strings.astype('U{}'.format(width))
+        if not strings.size:
+            return np.zeros((0, width), dtype=np.uint8)
+        strings = np.ascontiguousarray(np.char.ljust(strings, width, fillchar='0'), dtype='U{}'.format(width))
+        chars = strings.view('U1').reshape(len(strings), width)
+        return self.to_codes(chars)
+
+    def matrix_to_strings(self, matrix):
+        """
+        Converts a code matrix to one flag string per row.
+        :param matrix: uint8 array with shape (n, width)
+        :return: array of str with length n
+        """
+        matrix = np.asarray(matrix, dtype=np.uint8)
+        if not matrix.shape[1]:
+            return np.full(matrix.shape[0], '', dtype='U1')
+        chars = np.ascontiguousarray(self.flags.astype('U1')[matrix])
+        return chars.view('U{}'.format(matrix.shape[1])).ravel()
+
+    @staticmethod
+    def combine(*codes):
+        """
+        :param codes: arrays of codes with the same shape
+        :return: array with the flag of highest priority in each position
+        """
+        return np.maximum.reduce([np.asarray(c, dtype=np.uint8) for c in codes])
+
+
+# SHARK flags: 0 = no QC, A = accepted, E = estimated, ? = uncertain, S = suspicious, B = bad
+SHARK = FlagScheme(['0', 'A', 'E', '?', 'S', 'B'])
+
+# CMEMS / SeaDataNet numeric flags:
+# 0 = no QC, 1 = good, 2 = probably good, 5 = value changed, 8 = interpolated, 6/7 = not used,
+# 3 = probably bad, 4 = bad, 9 = missing value
+CMEMS = FlagScheme(['0', '1', '2', '5', '8', '6', '7', '3', '4', '9'])
+
+NO_QC = SHARK.get_code('0')
+ACCEPTED = SHARK.get_code('A')
+SUSPICIOUS = SHARK.get_code('S')
+BAD = SHARK.get_code('B')
+
+
+def get_flag_code(flag):
+    """
+    :param flag: str, eg. 'B'
+    :return: uint8 code for the given SHARK flag
+    """
+    return SHARK.get_code(flag)
+
+
+def codes_to_strings(codes):
+    """
+    Maps an array of SHARK flag codes to flag strings. Should only be used when writing flags to the DataFrame.
+    :param codes: array of uint8 codes
+    :return: array of str
+    """
+    return SHARK.to_strings(codes)
+
+
+def get_flag_codes(qc_object):
+    """
+    :param qc_object: QC-routine object that has been called
+    :return: uint8 codes from qc_object.flag_codes, or converted from qc_object.flag_return
+    """
+    if hasattr(qc_object, 'flag_codes'):
+        return np.asarray(qc_object.flag_codes, dtype=np.uint8)
+    return SHARK.to_codes(qc_object.flag_return)
+
+
+def add_routine_codes(current, new):
+    """
+    Adds flags from a QC-routine to the flags already set by the routine (eg. for another dataset):
+    0 and A are replaced by the new flag, S is replaced by B and a new S replaces any flag.
+    :param current: uint8 codes already set
+    :param new: uint8 codes from the QC-routine
+    :return: uint8 codes
+    """
+    current = np.asarray(current, dtype=np.uint8)
+    new = np.asarray(new, dtype=np.uint8)
+    replace = (current == NO_QC) | (current == ACCEPTED) | ((current == SUSPICIOUS) & (new == BAD)) | \
+              (new == SUSPICIOUS)
+    return np.where(replace, new, current)
+
+
+def boolean_to_codes(boolean, q_flag):
+    """
+    :param boolean: array like, True where the value passed the QC
+    :param q_flag: str, flag for values that did not pass
+    :return: uint8 codes, ACCEPTED where boolean is True else the code of q_flag
+    """
+    boolean = np.asarray(boolean, dtype=bool)
+    codes = np.full(boolean.size, ACCEPTED, dtype=np.uint8)
+    codes[~boolean] = get_flag_code(q_flag)
+    return codes
@@ -8,5 +8,7 @@ Created on 2020-02-20 13:26
 from sharkpylib.qc.functions.continuous import Decreasing, Increasing
 from sharkpylib.qc.functions.dependencies import Dependencies
 from sharkpylib.qc.functions.diff import DataDiff
+from sharkpylib.qc.functions.position import ImpossibleLocation, ImpossibleSpeed, RasterMask
 from sharkpylib.qc.functions.range import Range
 from sharkpylib.qc.functions.spike import Spike
+from sharkpylib.qc.functions.time import TimeMonotonic
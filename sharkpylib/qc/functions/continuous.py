@@ -7,6 +7,7 @@ Created on 2020-02-20 13:34
 """
 import numpy as np
 import pandas as pd
+from sharkpylib.qc import flags
 from sharkpylib.qc.boolean_base import BooleanBaseSerie
 from sharkpylib.qc.messages import *
 
@@ -37,35 +38,72 @@ class ContinuousBase(BooleanBaseSerie):
         else:
             self.serie = df_or_serie.astype(float)
 
+        self.values = self.serie.to_numpy(dtype=float)
+        # Group codes (one per value) when several profiles are checked at once. Values are only compared within
+        # a group.
+        self.groups = kwargs.get('groups')
         self.qc_passed = False
         self.q_flag = kwargs.get('q_flag') or 'B'
         self.acceptable_error = kwargs.get('acceptable_error')
 
+    def __call__(self):
+        """
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        # TODO handle QC failure.. boolean? report?
+        if self.boolean_array.all():
+            # Data passed with distinction or with acceptable error!
+            self.qc_passed = True
+            # qc_pass_message(self, self.serie.name)
+        else:
+            qc_fail_message(self, self.serie.name)
+
     @property
-    def boolean_return(self):
+    def boolean_array(self):
         """
         We insert one "True" for the first value because these types of QC-routines check value 2
         against value 1. Therefor the first value cannot be False. However! it can in fact be value 1 that is BAD..
 
-        :return: boolean list
+        :return: numpy boolean array
                  True means that the corresponding value has passed the test
                  False means that the value has NOT passed and should be flagged accordingly
         """
-        return pd.Series([True] + list(self.boolean_generator))
-        # boolean = [True] + list(self.generator)
-        # return pd.Series(boolean)
+        boolean = np.ones(self.values.size, dtype=bool)
+        boolean[1:] = self.pairwise_check(self.values[:-1], self.values[1:])
+        if self.groups is not None:
+            groups = np.asarray(self.groups)
+            boolean[1:][groups[1:] != groups[:-1]] = True
+        return boolean
+
+    @property
+    def boolean_return(self):
+        """
+        :return: boolean serie, see boolean_array
+        """
+        return pd.Series(self.boolean_array)
+
+    @property
+    def flag_codes(self):
+        """
+        :return: uint8 flag codes. Mapped to flag strings with flags.codes_to_strings when written to file
+        """
+        return flags.boolean_to_codes(self.boolean_array, self.q_flag)
 
     @property
     def flag_return(self):
         """
         :return:
         """
-        flag_serie = np.array(['A'] * self.serie.__len__())
-        flag_serie[~self.boolean_return] = self.q_flag
-        return flag_serie
+        return flags.codes_to_strings(self.flag_codes)
 
-    @property
-    def boolean_generator(self):
+    def pairwise_check(self, first, second):
+        """
+        :param first: values[:-1]
+        :param second: values[1:]
+        :return: boolean array of length len(values) - 1
+        """
         raise NotImplementedError
 
     @property
@@ -73,7 +111,7 @@ class ContinuousBase(BooleanBaseSerie):
         """
         :return: True or False
         """
-        return all(self.boolean_generator)
+        return bool(self.boolean_array.all())
 
 
 class Decreasing(ContinuousBase):
@@ -81,34 +119,9 @@ class Decreasing(ContinuousBase):
     QC-routine check if value 1 >= value 2 and so on..
     - If not passed: position 1 is flagged as False
     """
-    def __call__(self):
-        """
-        :param args:
-        :param kwargs:
-        :return:
-        """
-        # TODO handle QC failure.. boolean? report?
-        if self.serie.is_monotonic_decreasing:
-            # Data passed with distinction!
-            self.qc_passed = True
-            # qc_pass_message(self, self.serie.name)
-        else:
-            if self.error_magnitude_accepted:
-                # Data passed with acceptable error!
-                self.qc_passed = True
-                # qc_pass_message(self, self.serie.name)
-            else:
-                qc_fail_message(self, self.serie.name)
-
-    @property
-    def boolean_generator(self):
-        """"""
-        return (i >= j for i, j in zip(self.serie, self.control_serie[1:]))
-
-    @property
-    def control_serie(self):
-        """"""
-        return self.serie - self.acceptable_error
+    def pairwise_check(self, first, second):
+        """ Same as np.diff(values) <= acceptable_error, written pairwise to keep the exact comparison """
+        return first >= second - self.acceptable_error
 
 
 class Increasing(ContinuousBase):
@@ -116,34 +129,9 @@ class Increasing(ContinuousBase):
     QC-routine check if value 1 <= value 2 and so on..
     - If not passed: position 1 is flagged as False
     """
-    def __call__(self):
-        """
-        :param args:
-        :param kwargs:
-        :return:
-        """
-        # TODO handle QC failure.. boolean? report?
-        if self.serie.is_monotonic_increasing:
-            # Data passed with distinction!
-            self.qc_passed = True
-            # qc_pass_message(self, self.serie.name)
-        else:
-            if self.error_magnitude_accepted:
-                # Data passed with acceptable error!
-                self.qc_passed = True
-                # qc_pass_message(self, self.serie.name)
-            else:
-                qc_fail_message(self, self.serie.name)
-
-    @property
-    def boolean_generator(self):
-        """"""
-        return (i <= j for i, j in zip(self.serie, self.control_serie[1:]))
-
-    @property
-    def control_serie(self):
-        """"""
-        return self.serie + self.acceptable_error
+    def pairwise_check(self, first, second):
+        """ Same as np.diff(values) >= -acceptable_error, written pairwise to keep the exact comparison """
+        return first <= second + self.acceptable_error
 
 
 if __name__ == "__main__":
@@ -4,4 +4,187 @@ Created on 2020-02-25 15:28
 
 @author: a002028
 
-"""
\ No newline at end of file
+"""
+import numpy as np
+import pandas as pd
+from sharkpylib.geography import latlon_distance_array
+from sharkpylib.qc import flags
+from sharkpylib.qc.boolean_base import BooleanBaseDataFrame
+from sharkpylib.qc.messages import *
+
+
+class RasterMask:
+    """
+    Precomputed raster (eg. land or basin mask) on a regular lat/lon grid.
+    The mask file is a numpy .npz file with:
+        mask: 2D boolean array (lat, lon), True for masked cells (eg. land)
+        lat_min, lon_min: lower left corner of the grid
+        resolution: cell size in degrees
+    Positions outside the grid are not masked.
+    """
+    def __init__(self, file_path=None, mask=None, lat_min=None, lon_min=None, resolution=None):
+        if file_path:
+            with np.load(file_path) as data:
+                mask = data['mask']
+                lat_min = float(data['lat_min'])
+                lon_min = float(data['lon_min'])
+                resolution = float(data['resolution'])
+        self.mask = np.asarray(mask, dtype=bool)
+        self.lat_min = lat_min
+        self.lon_min = lon_min
+        self.resolution = resolution
+
+    def get_masked_boolean(self, lat, lon):
+        """
+        :param lat: array of latitudes (decimal degrees)
+        :param lon: array of longitudes (decimal degrees)
+        :return: boolean array, True for positions in masked cells
+        """
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        with np.errstate(invalid='ignore'):
+            row = np.floor((lat - self.lat_min) / self.resolution)
+            col = np.floor((lon - self.lon_min) / self.resolution)
+            inside = (row >= 0) & (row < self.mask.shape[0]) & (col >= 0) & (col < self.mask.shape[1])
+        boolean = np.zeros(lat.size, dtype=bool)
+        boolean[inside] = self.mask[row[inside].astype(int), col[inside].astype(int)]
+        return boolean
+
+
+class PositionBase(BooleanBaseDataFrame):
+    """
+    Base class for QC-routines working on positions.
+    parameters: [latitude, longitude] or [time, latitude, longitude]
+    """
+    def __init__(self, df, **kwargs):
+        super().__init__()
+        try:
+            assert type(df) == pd.DataFrame
+            assert type(kwargs.get('parameters')) == list
+        except AssertionError:
+            #TODO Fix Logging..
+            assertionerror_tuple = (self.__class__.__name__,
+                                    type(df),
+                                    type(kwargs.get('parameters')))
+            raise AssertionError('Input types to class {} are no good: data ({}), parameters ({})'.format(
+                *assertionerror_tuple))
+
+        self.qc_passed = False
+        self.q_flag = kwargs.get('q_flag') or 'B'
+        self.parameters = kwargs.get('parameters')
+        self.data = df[self.parameters]
+        # Group codes (one per row) when several files/profiles are checked at once
+        self.groups = kwargs.get('groups')
+
+    def __call__(self):
+        """
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        self.boolean = self.get_boolean()
+        # TODO handle QC failure.. boolean? report?
+        if all(self.boolean):
+            # Data passed with distinction!
+            self.qc_passed = True
+            # qc_pass_message(self, self.parameters)
+        else:
+            qc_fail_message(self, self.parameters)
+
+    def get_boolean(self):
+        raise NotImplementedError
+
+    @property
+    def lat(self):
+        return self.data[self.parameters[-2]].to_numpy(dtype=float)
+
+    @property
+    def lon(self):
+        return self.data[self.parameters[-1]].to_numpy(dtype=float)
+
+    @property
+    def boolean_return(self):
+        """
+        :return: boolean list
+                 True means that the corresponding value has passed the test
+                 False means that the value has NOT passed and should be flagged
+        """
+        return self.boolean
+
+    @property
+    def flag_codes(self):
+        """
+        :return: uint8 flag codes. Mapped to flag strings with flags.codes_to_strings when written to file
+        """
+        return flags.boolean_to_codes(self.boolean_return, self.q_flag)
+
+    @property
+    def flag_return(self):
+        """
+        :return:
+        """
+        return flags.codes_to_strings(self.flag_codes)
+
+
+class ImpossibleLocation(PositionBase):
+    """
+    Checks that latitude and longitude are within valid ranges and, if a mask is given, that the position is not
+    masked (eg. on land).
+    - mask_file_path: path to a RasterMask file
+    - mask: any object with a get_masked_boolean(lat, lon) method (eg. RasterMask or qc.mask_areas.MaskAreas)
+    """
+    def __init__(self, df, **kwargs):
+        super().__init__(df, **kwargs)
+        self.lat_range = kwargs.get('lat_range') or [-90, 90]
+        self.lon_range = kwargs.get('lon_range') or [-180, 180]
+        self.mask = kwargs.get('mask')
+        if self.mask is None and kwargs.get('mask_file_path'):
+            self.mask = RasterMask(kwargs.get('mask_file_path'))
+
+    def get_boolean(self):
+        lat = self.lat
+        lon = self.lon
+        with np.errstate(invalid='ignore'):
+            boolean = (lat >= self.lat_range[0]) & (lat <= self.lat_range[1]) & \
+                      (lon >= self.lon_range[0]) & (lon <= self.lon_range[1])
+        if self.mask is not None:
+            boolean[boolean] = ~self.mask.get_masked_boolean(lat[boolean], lon[boolean])
+        return boolean
+
+
+class ImpossibleSpeed(PositionBase):
+    """
+    Checks the speed between consecutive fixes. parameters: [time, latitude, longitude]
+    - max_speed: maximum accepted speed in m/s
+    - If not passed: the second fix of the pair is flagged
+    Pairs with missing or non increasing time are not checked here (see time.TimeMonotonic).
+    """
+    def __init__(self, df, **kwargs):
+        super().__init__(df, **kwargs)
+        self.max_speed = kwargs.get('max_speed')
+
+    @property
+    def time(self):
+        return pd.to_datetime(self.data[self.parameters[0]], errors='coerce').to_numpy(dtype='datetime64[ns]')
+
+    @property
+    def speed(self):
+        """
+        :return: speed in m/s from the previous fix. nan for the first fix
+        """
+        lat = self.lat
+        lon = self.lon
+        seconds = np.diff(self.time).astype('timedelta64[ns]').astype(float) / 1e9
+        seconds[np.isnat(np.diff(self.time))] = np.nan
+        distance = latlon_distance_array(lat[:-1], lon[:-1], lat[1:], lon[1:]) * 1000
+        speed = np.full(lat.size, np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            speed[1:] = np.where(seconds > 0, distance / seconds, np.nan)
+        if self.groups is not None:
+            groups = np.asarray(self.groups)
+            speed[1:][groups[1:] != groups[:-1]] = np.nan
+        return speed
+
+    def get_boolean(self):
+        with np.errstate(invalid='ignore'):
+            return ~(self.speed > self.max_speed)
@@ -7,6 +7,7 @@ Created on 2020-02-20 11:45
 """
 import numpy as np
 import pandas as pd
+from sharkpylib.qc import flags
 from sharkpylib.qc.boolean_base import BooleanBaseSerie
 from sharkpylib.qc.messages import *
 
@@ -68,14 +69,19 @@ class Range(BooleanBaseSerie):
         """
         return self.boolean
 
+    @property
+    def flag_codes(self):
+        """
+        :return: uint8 flag codes. Mapped to flag strings with flags.codes_to_strings when written to file
+        """
+        return flags.boolean_to_codes(self.boolean_return, self.q_flag)
+
     @property
     def flag_return(self):
         """
         :return:
         """
-        flag_serie = np.array(['A'] * self.serie.__len__())
-        flag_serie[~self.boolean_return] = self.q_flag
-        return flag_serie
+        return flags.codes_to_strings(self.flag_codes)
 
 
 if __name__ == "__main__":
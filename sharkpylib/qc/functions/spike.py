@@ -7,14 +7,23 @@ Created on 2020-04-14 12:20
 """
 import numpy as np
 import pandas as pd
+from sharkpylib.qc import flags
 from sharkpylib.qc.boolean_base import BooleanBaseSerie
 from sharkpylib.qc.messages import *
+from sharkpylib.qc.rolling_statistics import RollingStatistics
 
 
 class Spike(BooleanBaseSerie):
     """
     ----------  A very informative description of this class, and its purpose  ----------
+
+    Rolling mean and std are read from a RollingStatistics object. If one is given through kwargs
+    (rolling_statistics) it is shared with other QC-routines, otherwise a new one is created.
     """
+    use_rolling_statistics = True
+    window = 7  # ok window? user can control the outcome with acceptable_stddev_factor
+    min_periods = 3  # or np.floor(self.index_window / 2)
+
     def __init__(self, df_or_serie, **kwargs):
         super().__init__()
         try:
@@ -39,12 +48,37 @@ class Spike(BooleanBaseSerie):
             self.serie = df_or_serie[kwargs.get('parameter')].astype(float)
         else:
             self.serie = df_or_serie.astype(float)
+        if self.serie.name is None:
+            self.serie.name = 'serie'
         self.acceptable_stddev_factor = kwargs.get('acceptable_stddev_factor')
         self.min_stddev_value = kwargs.get('min_stddev_value')
 
-        # self.index_window = 7  # ok window? user can control the outcome with acceptable_stddev_factor
-        # self.min_periods = 3  # or np.floor(self.index_window / 2)
-        self.rolling = self.serie.rolling(7, min_periods=3, center=True)
+        self.rolling_statistics = kwargs.get('rolling_statistics')
+        if not self._valid_rolling_statistics(self.rolling_statistics, df_or_serie):
+            self.rolling_statistics = RollingStatistics(self.serie.to_frame(), window=self.window,
+                                                        min_periods=self.min_periods)
+
+    def _valid_rolling_statistics(self, rolling_statistics, df_or_serie):
+        """
+        Given rolling statistics are only used if calculated on the same data: the same DataFrame or a DataFrame
+        where df_or_serie holds complete groups (eg. some of several stacked profiles) with the same values.
+        Windows over a part of a profile differ from windows over the whole profile.
+        :param rolling_statistics: RollingStatistics or None
+        :param df_or_serie: data given to the routine
+        :return: bool
+        """
+        if rolling_statistics is None:
+            return False
+        if (rolling_statistics.window, rolling_statistics.min_periods) != (self.window, self.min_periods):
+            return False
+        if self.serie.name not in rolling_statistics.df:
+            return False
+        if rolling_statistics.df is df_or_serie:
+            return True
+        if not rolling_statistics.has_complete_groups(self.serie.index):
+            return False
+        values = rolling_statistics.df[self.serie.name].loc[self.serie.index].astype(float)
+        return np.array_equal(values.to_numpy(), self.serie.to_numpy(), equal_nan=True)
 
     def __call__(self):
         """
@@ -52,8 +86,10 @@ class Spike(BooleanBaseSerie):
         :param kwargs:
         :return:
         """
-        self.add_boolean_less_than_other(self.max)
-        self.add_boolean_greater_than_other(self.min)
+        mean = self._mean
+        std = self._std
+        self.add_boolean_less_than_other(mean + std)
+        self.add_boolean_greater_than_other(mean - std)
 
         if all(self.boolean):
             # Data passed with distinction!
@@ -79,14 +115,13 @@ class Spike(BooleanBaseSerie):
     @property
     def _mean(self):
         """"""
-        return self.rolling.mean()
+        return self.rolling_statistics.mean(self.serie.name).reindex(self.serie.index)
 
     @property
     def _std(self):
         """"""
-        std_serie = self.rolling.std()
-        boolean = std_serie < self.min_stddev_value
-        std_serie[boolean] = self.min_stddev_value
+        std_serie = self.rolling_statistics.std(self.serie.name).reindex(self.serie.index)
+        std_serie = std_serie.where(~(std_serie < self.min_stddev_value), self.min_stddev_value)
         return std_serie * self.acceptable_stddev_factor
 
     @property
@@ -99,11 +134,16 @@ class Spike(BooleanBaseSerie):
         """
         return self.boolean
 
+    @property
+    def flag_codes(self):
+        """
+        :return: uint8 flag codes. Mapped to flag strings with flags.codes_to_strings when written to file
+        """
+        return flags.boolean_to_codes(self.boolean_return, self.q_flag)
+
     @property
     def flag_return(self):
         """
         :return:
         """
-        flag_serie = np.array(['A'] * self.serie.__len__())
-        flag_serie[~self.boolean_return] = self.q_flag
-        return flag_serie
+        return flags.codes_to_strings(self.flag_codes)
@@ -5,5 +5,107 @@ Created on 2020-02-25 15:27
 @author: a002028
 
 """
+import numpy as np
 import pandas as pd
-import datetime
\ No newline at end of file
+from sharkpylib.qc import flags
+from sharkpylib.qc.boolean_base import BooleanBaseSerie
+from sharkpylib.qc.messages import *
+
+
+class TimeMonotonic(BooleanBaseSerie):
+    """
+    Checks that time is not decreasing.
+    - Values that are missing or earlier than the last valid (latest) previous time are flagged
+    - If allow_equal_times is True (default) values equal to the last valid time are accepted (eg. all samples of a
+      profile share the same time). Otherwise duplicated times are flagged and time must be strictly increasing
+    - If groups is given (one group code per row, each group in consecutive rows) values are only compared to
+      previous values in the same group
+    """
+    def __init__(self, df, **kwargs):
+        super().__init__()
+        try:
+            assert type(df) == pd.DataFrame
+            assert type(kwargs.get('parameter')) == str
+        except AssertionError:
+            #TODO Fix Logging..
+            assertionerror_tuple = (self.__class__.__name__,
+                                    type(df),
+                                    type(kwargs.get('parameter')))
+            raise AssertionError('Input types to class {} are no good: data ({}), parameter ({})'.format(
+                *assertionerror_tuple))
+
+        self.qc_passed = False
+        self.q_flag = kwargs.get('q_flag') or 'B'
+        self.parameter = kwargs.get('parameter')
+        self.serie = pd.to_datetime(df[self.parameter], errors='coerce')
+        self.groups = kwargs.get('groups')
+        self.allow_equal_times = kwargs.get('allow_equal_times', True)
+
+    def __call__(self):
+        """
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        self.boolean = self.boolean_array
+        # TODO handle QC failure.. boolean? report?
+        if all(self.boolean):
+            # Data passed with distinction!
+            self.qc_passed = True
+            # qc_pass_message(self, self.parameter)
+        else:
+            qc_fail_message(self, self.parameter)
+
+    @property
+    def boolean_array(self):
+        """
+        :return: numpy boolean array, True where time is valid and not decreasing (increasing if equal times are not
+                 allowed)
+        """
+        values = self.serie.to_numpy(dtype='datetime64[ns]').view('int64')
+        missing = np.iinfo(np.int64).min  # NaT
+        valid = values != missing
+        if values.size < 2:
+            return valid
+
+        # Last valid time before each row. Missing values (NaT) never exceed the running maximum
+        if self.groups is None:
+            latest = np.maximum.accumulate(values)
+            new_group = np.zeros(values.size, dtype=bool)
+        else:
+            groups = np.asarray(self.groups)
+            latest = pd.Series(values).groupby(groups, sort=False).cummax().to_numpy()
+            new_group = np.ones(values.size, dtype=bool)
+            new_group[1:] = groups[1:] != groups[:-1]
+        previous = np.full(values.size, missing)
+        previous[1:] = latest[:-1]
+        previous[new_group] = missing
+
+        if self.allow_equal_times:
+            in_order = values >= previous
+        else:
+            in_order = values > previous
+        return valid & in_order
+
+    @property
+    def boolean_return(self):
+        """
+        :return: boolean list
+                 True means that the corresponding value has passed the test
+                 False means that the value has NOT passed and should be flagged
+        """
+        return self.boolean
+
+    @property
+    def flag_codes(self):
+        """
+        :return: uint8 flag codes. Mapped to flag strings with flags.codes_to_strings when written to file
+        """
+        return flags.boolean_to_codes(self.boolean_return, self.q_flag)
+
+    @property
+    def flag_return(self):
+        """
+        :return:
+        """
+        return flags.codes_to_strings(self.flag_codes)
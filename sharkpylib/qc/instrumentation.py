@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+import json
+import time
+import threading
+import numpy as np
+import pandas as pd
+from sharkpylib.qc import flags
+
+
+class QCInstrumentation:
+    """
+    In-memory registry of QC routine invocations.
+
+    Every record holds the source (eg. QCBlueprint), the routine, the parameter, wall time, number of rows processed
+    and the number of rows given each flag. Several records (eg. one per file and parameter) can be added for the
+    same call, rows should then only be given once per file.
+    Disabled by default. When disabled nothing is measured or counted, callers should check self.enabled before doing
+    any extra work for a record.
+
+    Usage:
+        from sharkpylib.qc.instrumentation import instrumentation
+        instrumentation.enable()
+        ... run QC ...
+        instrumentation.to_csv('qc_timing.csv')
+        print(instrumentation.summary())
+    """
+    def __init__(self):
+        self.enabled = False
+        self._records = []
+        self._nr_calls = 0
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self._records = []
+
+    def start(self):
+        """
+        Marks the start of a call.
+        :return: call id and start time to pass to self.add, None if disabled
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            self._nr_calls += 1
+            call = '{}:{}'.format(os.getpid(), self._nr_calls)
+        return call, time.perf_counter()
+
+    def add(self, start, source='', routine='', parameter='', rows=0, flag_counts=None, **kwargs):
+        """
+        Adds a record. Nothing is done if start is None (instrumentation disabled when the measure started).
+        :param start: value returned from self.start()
+        :param source: str, eg. QCBlueprint
+        :param routine: str, name of the QC routine
+        :param parameter: str, parameter (or flag column) the record refers to
+        :param rows: number of rows processed
+        :param flag_counts: dict with flag as key and number of rows given that flag as value
+        :param kwargs: additional information to store in the record
+        :return:
+        """
+        if start is None:
+            return
+        call, start_time = start
+        record = dict(source=source,
+                      routine=routine,
+                      parameter=parameter,
+                      call=call,
+                      rows=int(rows),
+                      seconds=time.perf_counter() - start_time)
+        record.update(kwargs)
+        for flag, count in (flag_counts or {}).items():
+            record['flag_{}'.format(flag)] = int(count)
+        with self._lock:
+            self._records.append(record)
+
+    def extend(self, records):
+        """
+        Adds records collected elsewhere, eg. in a worker process.
+        :param records: list of dicts
+        :return:
+        """
+        if not self.enabled or not records:
+            return
+        with self._lock:
+            self._records.extend(records)
+
+    @property
+    def records(self):
+        with self._lock:
+            return list(self._records)
+
+    def get_dataframe(self):
+        """
+        :return: pd.DataFrame with one row per record
+        """
+        df = pd.DataFrame(self.records)
+        flag_columns = [col for col in df.columns if col.startswith('flag_')]
+        df[flag_columns] = df[flag_columns].fillna(0).astype(int)
+        return df
+
+    def summary(self):
+        """
+        :return: pd.DataFrame with calls, total time, rows and flag counts per source and routine.
+                 Sorted with the most time consuming routine first
+        """
+        df = self.get_dataframe()
+        if df.empty:
+            return df
+        # Records from the same call share the time
+        calls = df.groupby(['source', 'routine', 'call'])['seconds'].max().groupby(level=[0, 1])
+        summary = pd.DataFrame({'calls': calls.size(),
+                                'seconds': calls.sum()})
+        flag_columns = [col for col in df.columns if col.startswith('flag_')]
+        summary = summary.join(df.groupby(['source', 'routine'])[['rows'] + flag_columns].sum())
+        return summary.sort_values('seconds', ascending=False)
+
+    def to_json(self, file_path=None):
+        """
+        :param file_path: str. If not given the json string is returned
+        :return:
+        """
+        text = json.dumps(self.records, indent=4)
+        if not file_path:
+            return text
+        with open(file_path, 'w') as fid:
+            fid.write(text)
+
+    def to_csv(self, file_path=None, sep='\t'):
+        """
+        :param file_path: str. If not given the csv string is returned
+        :param sep: column separator
+        :return:
+        """
+        if not file_path:
+            buffer = io.StringIO()
+            self.get_dataframe().to_csv(buffer, sep=sep, index=False)
+            return buffer.getvalue()
+        self.get_dataframe().to_csv(file_path, sep=sep, index=False)
+
+
+def count_flag_codes(codes, scheme=flags.SHARK):
+    """
+    :param codes: array of uint8 flag codes
+    :param scheme: flags.FlagScheme
+    :return: dict with flag as key and number of occurrences as value (only flags that occur)
+    """
+    counts = np.bincount(np.asarray(codes, dtype=np.uint8), minlength=len(scheme))
+    return {flag: int(count) for flag, count in zip(scheme.flags, counts) if count}
+
+
+def count_flags(values):
+    """
+    :param values: array like of flags (any type)
+    :return: dict with flag as key and number of occurrences as value
+    """
+    flag_values, counts = np.unique(np.asarray(values).astype(str), return_counts=True)
+    return {flag: int(count) for flag, count in zip(flag_values, counts)}
+
+
+def count_changed_flags(old_values, new_values):
+    """
+    :param old_values: array like of flags before QC
+    :param new_values: array like of flags after QC
+    :return: dict with flag as key and number of rows changed to that flag as value
+    """
+    old_values = np.asarray(old_values).astype(str)
+    new_values = np.asarray(new_values).astype(str)
+    return count_flags(new_values[old_values != new_values])
+
+
+# Process wide registry
+instrumentation = QCInstrumentation()
@@ -7,7 +7,7 @@
 import os
 import numpy as np
 from sharkpylib.file.file_handlers import Directory
-from sharkpylib.geography import latlon_distance
+from sharkpylib.geography import latlon_distance_array
 
 
 class MaskAreasDirectory(object):
@@ -41,13 +41,13 @@ class MaskAreas(object):
     def get_masked_boolean(self, lat_list, lon_list):
         if len(lat_list) != len(lon_list):
             raise ValueError('Input lists son the same length!')
+        lat_array = np.asarray(lat_list, dtype=float)
+        lon_array = np.asarray(lon_list, dtype=float)
         combined_boolean = np.zeros(len(lat_list), dtype=bool)
-        dist = []  # save distance in meters
         for item in self.data:
-            for la, lo in zip(lat_list, lon_list):
-                dist.append(latlon_distance((item['lat'], item['lon']), (la, lo))*1000)
-            boolean = np.array(dist) <= float(item['radius'])
-            combined_boolean = combined_boolean | boolean
+            # distance in meters
+            dist = latlon_distance_array(item['lat'], item['lon'], lat_array, lon_array) * 1000
+            combined_boolean |= dist <= float(item['radius'])
         return combined_boolean
 
 
@@ -5,8 +5,14 @@ Created on 2020-02-26 15:23
 @author: a002028
 
 """
+import copy
+import multiprocessing
+import numpy as np
 import pandas as pd
+from sharkpylib.qc import flags
+from sharkpylib.qc.instrumentation import instrumentation, count_flag_codes
 from sharkpylib.qc.settings import Settings
+from sharkpylib.qc.rolling_statistics import RollingStatistics
 from sharkpylib.utils import get_time_as_format
 
 
@@ -71,6 +77,8 @@ class QCBlueprint:
         self.meta = data_item.get('metadata')
 
         self.settings = Settings()
+        self.rolling_statistics = RollingStatistics(self.df)
+        self.flag_matrices = {}
 
     def initialize_qc_object(self, setting, name, item):
         """
@@ -79,7 +87,24 @@ class QCBlueprint:
         :param item:
         :return:
         """
-        return setting['functions'][name].get('function')(self.df, **item)
+        return self.get_qc_function(setting, name)(self.df, rolling_statistics=self.rolling_statistics, **item)
+
+    @staticmethod
+    def get_qc_function(setting, name):
+        routine = Settings.get_routines_setting(setting)[name]
+        return routine.get('routine') or routine.get('function')
+
+    def prepare_rolling_statistics(self, qc_items):
+        """
+        Rolling statistics for all parameters checked by routines using them are calculated in one go.
+        :param qc_items: list of tuples (qc_setting, qc_routine, qc_index, item)
+        :return:
+        """
+        parameters = []
+        for qc_setting, qc_routine, qc_index, item in qc_items:
+            if getattr(self.get_qc_function(qc_setting, qc_routine), 'use_rolling_statistics', False):
+                parameters.append(item.get('parameter'))
+        self.rolling_statistics.prepare(parameters)
 
     def __call__(self):
         """
@@ -89,10 +114,13 @@ class QCBlueprint:
         """
         self._open_up_flag_fields()
 
+        qc_items = []
         for qc_routine, qc_index in self.settings.qc_routines.items():
             qc_setting = getattr(self.settings, qc_routine)
 
             for dataset, item in qc_setting['datasets'].items():
+                # Settings are shared within the process, parameters_available might map parameters in item
+                item = copy.deepcopy(item)
 
                 # Check if parameters exists
                 if not self.parameters_available(item):
@@ -102,21 +130,49 @@ class QCBlueprint:
                 if not self.data_available(item):
                     continue
 
-                # Get QC routine
-                qc_func = self.initialize_qc_object(qc_setting, qc_routine, item)
+                qc_items.append((qc_setting, qc_routine, qc_index, item))
+
+        self.prepare_rolling_statistics(qc_items)
+
+        for qc_setting, qc_routine, qc_index, item in qc_items:
+            start = instrumentation.start()
 
-                # Run QC routine
-                qc_func()
+            # Get QC routine
+            qc_func = self.initialize_qc_object(qc_setting, qc_routine, item)
 
-                # Check results and execute appropriate action (flag the data)
-                self.add_qflag(qc_func.flag_return,
-                               item.get('q_parameters'),
-                               qc_index)
+            # Run QC routine
+            qc_func()
+
+            # Check results and execute appropriate action (flag the data)
+            flag_codes = flags.get_flag_codes(qc_func)
+            self.add_qflag(flag_codes,
+                           item.get('q_parameters'),
+                           qc_index)
+
+            self.add_instrumentation_record(start, qc_routine, item, flag_codes)
 
         self._close_flag_fields()
         self.synchronize_flag_fields()
         self.append_qc_comment()
 
+    def add_instrumentation_record(self, start, qc_routine, item, flag_codes):
+        """
+        Adds timing, rows and flag counts of a QC routine call to the instrumentation registry (if enabled).
+        :param start: value from instrumentation.start()
+        :param qc_routine: str
+        :param item: dataset settings
+        :param flag_codes: uint8 flag codes returned from the routine
+        :return:
+        """
+        if start is None:
+            return
+        instrumentation.add(start,
+                            source=self.__class__.__name__,
+                            routine=qc_routine,
+                            parameter=item.get('parameter') or ', '.join(item.get('parameters', [])),
+                            rows=len(flag_codes),
+                            flag_counts=count_flag_codes(flag_codes))
+
     def synchronize_flag_fields(self):
         """
         Auto-QC corresponds to flag field "Q0_{parameter}", when calling synchronize_flag_fields() we import flags from
@@ -131,36 +187,40 @@ class QCBlueprint:
         ( during the manual quality control we only change the primary flag field )
         :return:
         """
-        q0_fields = iter(q for q in self.df.columns if q.startswith('Q0_'))
-
-        for q0_key in q0_fields:
+        for q0_key in self.flag_matrices:
             primary_q_key = q0_key.replace('Q0_', 'Q_')
             for f in ['S', 'B']:
                 self._sync_flag(q0_key, primary_q_key, f)
 
     def _sync_flag(self, q0_key, q_key, flag):
-        boolean = self.df[q0_key].str.contains(flag, regex=False)
+        boolean = (self.flag_matrices[q0_key] == flags.get_flag_code(flag)).any(axis=1)
         if boolean.any():
             self.df.loc[boolean, q_key] = flag
 
     def add_qflag(self, flag_field, q_flag_keys, qc_index):
         """
-        :param flag_field:
+        Flags are added with flags.add_routine_codes: 0 and A are replaced, B overrides S and a new S overrides B.
+        :param flag_field: uint8 flag codes
         :param q_flag_keys:
         :param qc_index:
         :return:
         """
         for flag_key in q_flag_keys:
-            if flag_key not in self.df:
+            if flag_key not in self.flag_matrices:
                 continue
+            matrix = self.flag_matrices[flag_key]
+            matrix[:, qc_index] = flags.add_routine_codes(matrix[:, qc_index], flag_field)
 
-            for qf_list, qf in zip(self.df[flag_key], flag_field):
-                if qf_list[qc_index] == '0' or qf_list[qc_index] == 'A':
-                    qf_list[qc_index] = qf
-                elif qf_list[qc_index] == 'S' and qf == 'B':
-                    qf_list[qc_index] = qf
-                elif qf == 'S': # qf_list[qc_index] != 'B'
-                    qf_list[qc_index] = qf
+    def get_routine_q_parameters(self):
+        """
+        Flag fields listed in the QC-routine settings are created also for metadata columns (eg. Q0_LATITUDE_DD).
+        :return: set with q_parameters of all datasets in the QC-routine settings
+        """
+        q_parameters = set()
+        for qc_routine in self.settings.qc_routines:
+            for item in getattr(self.settings, qc_routine)['datasets'].values():
+                q_parameters.update(item.get('q_parameters') or [])
+        return q_parameters
 
     def set_qc0_standard_format(self, key=None):
         """
@@ -176,9 +236,10 @@ class QCBlueprint:
         meta_columns = set(['YEAR', 'MONTH', 'DAY', 'HOUR', 'MINUTE', 'SECOND',
                            'CRUISE', 'STATION', 'LATITUDE_DD', 'LONGITUDE_DD',
                             'COMNT_SAMP', 'SCAN_BIN_CTD'])
+        routine_q_parameters = self.get_routine_q_parameters()
         for key in self.df:
             key = key.split(' ')[0]
-            if key not in meta_columns:
+            if key not in meta_columns or 'Q0_'+key in routine_q_parameters:
                 if not key.startswith('Q'):
                     if 'Q0_'+key not in self.df:
                         self.set_qc0_standard_format(key='Q0_'+key)
@@ -189,20 +250,23 @@ class QCBlueprint:
                     elif not len(self.df[key][0]):
                         self.set_qc0_standard_format(key=key)
 
+        self.flag_matrices = {}
         for q_key in self.df:
             if q_key.startswith('Q0_'):
-                self.df[q_key] = self.df[q_key].apply(list)
+                q_flags = self.df[q_key].fillna('').astype(str).values
+                self.flag_matrices[q_key] = flags.SHARK.strings_to_matrix(q_flags, self.settings.number_of_routines)
 
     def _close_flag_fields(self):
         """
         :return:
         """
-        for q_key in self.df:
-            if q_key.startswith('Q0_'):
-                self.df[q_key] = self.df[q_key].apply(''.join)
+        for q_key, matrix in self.flag_matrices.items():
+            self.df[q_key] = flags.SHARK.matrix_to_strings(matrix).astype(object)
 
     def parameters_available(self, item):
         """
+        Parameters in item are replaced with mapped parameters (self.parameter_mapping) if needed.
+        Item should therefore be a copy of the settings.
         :param item:
         :return:
         """
@@ -230,13 +294,23 @@ class QCBlueprint:
         :return:
         """
         if item.get('parameter'):
-            if self.df[item.get('parameter')].any():
+            if self._has_data(self.df[item.get('parameter')]):
                 return True
 
         if item.get('parameters'):
-            if all(self.df[p].any() for p in item.get('parameters')):
+            if all(self._has_data(self.df[p]) for p in item.get('parameters')):
                 return True
 
+    @staticmethod
+    def _has_data(serie):
+        """
+        :param serie: pd.Series
+        :return: True if any value is set (datetime columns do not support any())
+        """
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            return serie.notna().any()
+        return serie.any()
+
     def append_qc_comment(self):
         """
         :param metadata:
@@ -247,6 +321,245 @@ class QCBlueprint:
             self.settings.user, time_stamp, self.settings.repo_version)
 
 
+class QCBlueprintBatch(QCBlueprint):
+    """
+    Runs the QC-routines of QCBlueprint on many profiles at once.
+
+    All profiles (data_items) are stacked into one DataFrame and every QC-routine is run once on the stacked data.
+    Routines comparing neighbouring values (continuous and spike checks) get the profile group of each row and never
+    look across profile boundaries. Flags are scattered back to the DataFrame of each profile.
+
+    data_items: dict {key: data_item} where data_item is the same as for QCBlueprint
+    processes: if > 1 the profiles are split in chunks and handled in a process pool
+    """
+    def __init__(self, data_items, processes=None, **kwargs):
+        for data_item in data_items.values():
+            try:
+                assert type(data_item.get('data')) == pd.DataFrame
+                assert type(data_item.get('metadata')) == pd.Series
+            except AssertionError:
+                assertion_error_tuple = (self.__class__.__name__,
+                                         type(data_item.get('data')),
+                                         type(data_item.get('metadata')))
+                raise AssertionError('Input type to class {} should be pd.DataFrame and pd.Series not {} and {}'.format(
+                    *assertion_error_tuple))
+
+        self.data_items = data_items
+        self.processes = processes
+        self.parameter_mapping = kwargs.get('parameter_mapping')
+
+        self.df = None
+        self.groups = None
+        self.profile_keys = list(data_items)
+        self.profile_slices = {}
+        self.profile_columns = {}
+        self.rolling_statistics = None
+        self.flag_matrices = {}
+
+        self.settings = Settings()
+
+    def __call__(self):
+        """
+        :return:
+        """
+        if self.processes and self.processes > 1 and len(self.data_items) > 1:
+            self._run_in_pool()
+        else:
+            self._run()
+
+    def _run_in_pool(self):
+        chunks = np.array_split(np.arange(len(self.profile_keys)), min(self.processes, len(self.profile_keys)))
+        jobs = [({self.profile_keys[i]: self.data_items[self.profile_keys[i]] for i in chunk},
+                 self.parameter_mapping,
+                 instrumentation.enabled) for chunk in chunks if len(chunk)]
+        with multiprocessing.Pool(processes=self.processes) as pool:
+            results = pool.starmap(_run_qc_batch, jobs)
+
+        for result, records in results:
+            instrumentation.extend(records)
+            for key, data_item in result.items():
+                target_df = self.data_items[key]['data']
+                for col in data_item['data']:
+                    if col.startswith('Q') and (col not in target_df or
+                                                not target_df[col].equals(data_item['data'][col])):
+                        target_df[col] = data_item['data'][col].values
+                meta = self.data_items[key]['metadata']
+                for index in data_item['metadata'].index.difference(meta.index):
+                    meta[index] = data_item['metadata'][index]
+
+    def _run(self):
+        self._stack_profiles()
+        self._open_up_flag_fields()
+        self.rolling_statistics = RollingStatistics(self.df, groups=self.groups)
+        pre_run_columns = set(self.df.columns)
+
+        qc_items = []
+        for qc_routine, qc_index in self.settings.qc_routines.items():
+            qc_setting = getattr(self.settings, qc_routine)
+
+            for dataset, item in qc_setting['datasets'].items():
+                # Settings are shared within the process, parameters_available might map parameters in item
+                item = copy.deepcopy(item)
+
+                # Check if parameters exists in any profile
+                if not self.parameters_available(item):
+                    continue
+
+                # Check for which profiles parameters and data exist
+                rows = self.available_rows(item)
+                if not rows.any():
+                    continue
+
+                qc_items.append((qc_setting, qc_routine, qc_index, item, rows))
+
+        self.prepare_rolling_statistics([qc_item[:-1] for qc_item in qc_items])
+
+        for qc_setting, qc_routine, qc_index, item, rows in qc_items:
+            start = instrumentation.start()
+
+            # Get QC routine
+            qc_func = self.get_qc_function(qc_setting, qc_routine)(self.df.loc[rows],
+                                                                   rolling_statistics=self.rolling_statistics,
+                                                                   groups=self.groups[rows],
+                                                                   **item)
+
+            # Run QC routine
+            qc_func()
+
+            # Check results and execute appropriate action (flag the data)
+            flag_codes = flags.get_flag_codes(qc_func)
+            self.add_qflag(flag_codes,
+                           item.get('q_parameters'),
+                           qc_index,
+                           rows=rows)
+
+            self.add_instrumentation_record(start, qc_routine, item, flag_codes)
+
+        self._close_flag_fields()
+        self.synchronize_flag_fields()
+        self._scatter_profiles(set(self.df.columns) - pre_run_columns)
+        self.append_qc_comment()
+
+    def _get_flag_columns(self, df):
+        """
+        Same logic as QCBlueprint._open_up_flag_fields but for one profile and without changing it.
+        :return: dict with the Q0-columns that should be (re)set to standard format
+        """
+        meta_columns = set(['YEAR', 'MONTH', 'DAY', 'HOUR', 'MINUTE', 'SECOND',
+                            'CRUISE', 'STATION', 'LATITUDE_DD', 'LONGITUDE_DD',
+                            'COMNT_SAMP', 'SCAN_BIN_CTD'])
+        routine_q_parameters = self.get_routine_q_parameters()
+        default = '0' * self.settings.number_of_routines
+        flag_columns = {}
+        for key in df:
+            key = key.split(' ')[0]
+            if key in meta_columns and 'Q0_' + key not in routine_q_parameters:
+                continue
+            if not key.startswith('Q'):
+                if 'Q0_' + key not in df:
+                    flag_columns['Q0_' + key] = default
+            elif key.startswith('Q0_'):
+                if not len(df) or not type(df[key].iloc[0]) == str or not len(df[key].iloc[0]):
+                    flag_columns[key] = default
+        return flag_columns
+
+    def _stack_profiles(self):
+        """
+        Stacks all profiles in self.df. self.groups holds the profile number for each row.
+        :return:
+        """
+        frames = []
+        start = 0
+        for key in self.profile_keys:
+            df = self.data_items[key]['data']
+            flag_columns = self._get_flag_columns(df)
+            if flag_columns:
+                df = df.assign(**flag_columns)
+            self.profile_columns[key] = set(df.columns)
+            self.profile_slices[key] = slice(start, start + len(df))
+            start += len(df)
+            frames.append(df.reset_index(drop=True))
+
+        self.df = pd.concat(frames, ignore_index=True, sort=False)
+        self.groups = np.repeat(np.arange(len(frames)), [len(df) for df in frames])
+
+        default = '0' * self.settings.number_of_routines
+        for key in self.df:
+            if key.startswith('Q0_'):
+                self.df[key] = self.df[key].fillna(default)
+
+    def _scatter_profiles(self, new_columns):
+        """
+        Writes flag columns back to the DataFrame of each profile.
+        :param new_columns: columns created during the QC-run. Only added to a profile if they hold any value
+        :return:
+        """
+        for key in self.profile_keys:
+            target_df = self.data_items[key]['data']
+            profile_slice = self.profile_slices[key]
+            for col in self.df.columns:
+                if not col.startswith('Q'):
+                    continue
+                values = self.df[col].values[profile_slice]
+                if col in self.profile_columns[key]:
+                    target_df[col] = values
+                elif col in new_columns and pd.notna(values).any():
+                    target_df[col] = values
+
+    def available_rows(self, item):
+        """
+        Same check as in QCBlueprint.data_available but done for every profile at once.
+        :param item:
+        :return: boolean array, True for rows belonging to profiles where parameters and data exist
+        """
+        parameters = [item['parameter']] if item.get('parameter') else item.get('parameters')
+        profile_boolean = np.array([all(p in self.profile_columns[key] for p in parameters)
+                                    for key in self.profile_keys])
+        for par in parameters:
+            has_value = self.df[par].fillna('').astype(bool).to_numpy()
+            profile_boolean &= np.bincount(self.groups[has_value], minlength=len(self.profile_keys)) > 0
+        return profile_boolean[self.groups]
+
+    def add_qflag(self, flag_field, q_flag_keys, qc_index, rows=None):
+        """
+        :param flag_field: uint8 flag codes
+        :param q_flag_keys:
+        :param qc_index:
+        :param rows: boolean array. flag_field holds flags for these rows
+        :return:
+        """
+        for flag_key in q_flag_keys:
+            if flag_key not in self.flag_matrices:
+                continue
+            matrix = self.flag_matrices[flag_key]
+            matrix[rows, qc_index] = flags.add_routine_codes(matrix[rows, qc_index], flag_field)
+
+    def append_qc_comment(self):
+        """
+        :return:
+        """
+        time_stamp = get_time_as_format(now=True, fmt='%Y%m%d%H%M')
+        comment = '//COMNT_QC; AUTOMATIC QC PERFORMED BY {}; TIMESTAMP {}; {}'.format(
+            self.settings.user, time_stamp, self.settings.repo_version)
+        for data_item in self.data_items.values():
+            meta = data_item['metadata']
+            meta[len(meta) + 1] = comment
+
+
+def _run_qc_batch(data_items, parameter_mapping, instrumentation_enabled=False):
+    """
+    Used by QCBlueprintBatch to run QC on a chunk of profiles in a worker process.
+    :return: data_items with updated data and metadata, and instrumentation records from the worker
+    """
+    instrumentation.reset()
+    if instrumentation_enabled:
+        instrumentation.enable()
+    else:
+        instrumentation.disable()
+    QCBlueprintBatch(data_items, parameter_mapping=parameter_mapping)()
+    return data_items, instrumentation.records
+
+
 if __name__ == "__main__":
     df = {'metadata': pd.Series([1, 2, 3, 4, 5]),
           'data': pd.DataFrame({'a': [1,2,3,4,5]})}
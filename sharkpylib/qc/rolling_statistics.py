@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+
+class RollingStatistics:
+    """
+    Centered rolling mean and standard deviation (ddof=1) for several columns of a DataFrame.
+    Results are the same as for pd.Series.rolling(window, min_periods=min_periods, center=True).
+
+    All requested columns are calculated in one vectorized pass based on cumulative sums.
+    Results are cached so that several QC-routines (spike, gradient, rate of change..) working on the same
+    DataFrame can share them.
+
+    If groups is given (array of group codes, one per row, with each group stored in consecutive rows) windows
+    never reach outside the group of the center value. Several stacked profiles can then be handled at once.
+    """
+    def __init__(self, df, window=7, min_periods=3, groups=None):
+        self.df = df
+        self.window = window
+        self.min_periods = min_periods
+        self.groups = groups
+        self._mean = {}
+        self._std = {}
+
+    def prepare(self, parameters):
+        """
+        Calculates statistics for all given parameters that are not already cached.
+        :param parameters: list of columns in self.df
+        :return:
+        """
+        parameters = [p for p in dict.fromkeys(parameters) if p in self.df and p not in self._mean]
+        if not parameters:
+            return
+
+        # Values that are not numeric (eg. empty strings in a profile without data) are treated as missing
+        data = self.df[parameters].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+        mean, std = self._calculate(data)
+        for i, par in enumerate(parameters):
+            self._mean[par] = pd.Series(mean[:, i], index=self.df.index, name=par)
+            self._std[par] = pd.Series(std[:, i], index=self.df.index, name=par)
+
+    def mean(self, parameter):
+        """
+        :param parameter: str
+        :return: pd.Series with rolling mean
+        """
+        self.prepare([parameter])
+        return self._mean[parameter]
+
+    def std(self, parameter):
+        """
+        :param parameter: str
+        :return: pd.Series with rolling standard deviation
+        """
+        self.prepare([parameter])
+        return self._std[parameter]
+
+    def reset(self):
+        self._mean = {}
+        self._std = {}
+
+    def has_complete_groups(self, index):
+        """
+        Rolling statistics are only valid for a subset of self.df if the windows are the same, that is if the subset
+        holds complete groups (all rows if groups is not given) in the same order as in self.df.
+        :param index: index of the subset
+        :return: True if index covers complete groups of self.df
+        """
+        nr_rows = len(self.df)
+        if not self.df.index.is_unique:
+            return False
+        positions = self.df.index.get_indexer(index)
+        if not len(positions) or (positions < 0).any() or (np.diff(positions) <= 0).any():
+            return False
+        group_start, group_end = self._get_group_limits(nr_rows)
+        selected = np.zeros(nr_rows, dtype=bool)
+        selected[positions] = True
+        # Rows in the same group as a selected row must also be selected
+        in_selected_group = np.isin(group_start, group_start[positions])
+        return bool((selected == in_selected_group).all())
+
+    def _calculate(self, data):
+        """
+        :param data: 2D float array, one column per parameter
+        :return: rolling mean and rolling std as 2D arrays with the same shape as data
+        """
+        nr_rows = data.shape[0]
+        valid = ~np.isnan(data)
+
+        # Subtract column means to keep the variance calculation numerically stable
+        with np.errstate(invalid='ignore'):
+            offset = np.nanmean(data, axis=0) if valid.any() else np.zeros(data.shape[1])
+        offset = np.nan_to_num(offset)
+        values = np.where(valid, data - offset, 0.)
+
+        # Centered window (same as pandas with center=True)
+        group_start, group_end = self._get_group_limits(nr_rows)
+        upper = np.minimum(np.arange(nr_rows) + self.window - self.window // 2, group_end)
+        lower = np.maximum(np.arange(nr_rows) - self.window // 2, group_start)
+
+        def window_sum(array):
+            cumsum = np.zeros((nr_rows + 1, array.shape[1]))
+            np.cumsum(array, axis=0, out=cumsum[1:])
+            return cumsum[upper] - cumsum[lower]
+
+        count = window_sum(valid.astype(float))
+        sum_1 = window_sum(values)
+        sum_2 = window_sum(values ** 2)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = sum_1 / count
+            var = (sum_2 - sum_1 * mean) / (count - 1)
+        var = np.where(var < 0, 0., var)
+
+        enough = count >= max(self.min_periods, 1)
+        mean = np.where(enough, mean + offset, np.nan)
+        std = np.where(enough & (count > 1), np.sqrt(var), np.nan)
+        return mean, std
+
+    def _get_group_limits(self, nr_rows):
+        """
+        :return: first row (inclusive) and last row (exclusive) of the group of every row
+        """
+        if self.groups is None:
+            return np.zeros(nr_rows, dtype=int), np.full(nr_rows, nr_rows, dtype=int)
+        groups = np.asarray(self.groups)
+        new_group = np.ones(nr_rows, dtype=bool)
+        new_group[1:] = groups[1:] != groups[:-1]
+        starts = np.flatnonzero(new_group)
+        ends = np.append(starts[1:], nr_rows)
+        group_nr = np.cumsum(new_group) - 1
+        return starts[group_nr], ends[group_nr]
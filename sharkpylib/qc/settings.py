@@ -7,31 +7,149 @@ Created on 2020-02-26 10:20
 """
 import os
 import json
+import threading
 from sharkpylib.file.yaml_reader import YAMLreader
 from sharkpylib.utils import git_version
 
 
 class Settings:
     """
+    Settings for the QC. Settings() returns the same instance every time it is called (within a process).
+
+    Files in etc are found once but each file is loaded the first time its settings are requested
+    (eg. settings.qc_range). Loaded files are reloaded if they have been modified on disk. The instance is
+    safe to share between threads.
     """
-    qc_routines = {}
+    _instance = None
+    _lock = threading.RLock()
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                instance = super().__new__(cls)
+                instance.__dict__['_initialized'] = False
+                cls._instance = instance
+            return cls._instance
 
     def __init__(self):
-        self.base_directory = os.path.dirname(os.path.realpath(__file__))
-        self._load_settings(os.path.abspath(os.path.join(self.base_directory, 'etc')))
-        self.user = os.path.expanduser('~').split('\\')[-1]
-        self.repo_version = git_version()
-        print('QC - USER: {}'.format(self.user))
+        with self._lock:
+            if self._initialized:
+                self.reload_modified_files()
+                return
+            self.base_directory = os.path.dirname(os.path.realpath(__file__))
+            self.etc_directory = os.path.abspath(os.path.join(self.base_directory, 'etc'))
+            self._setting_files = self._get_setting_files(self.etc_directory)
+            self._mtimes = {}
+            self._qc_routines = {}
+            self._repo_version = None
+            self.user = os.path.expanduser('~').split('\\')[-1]
+            print('QC - USER: {}'.format(self.user))
+            self._initialized = True
+
+    def __getattr__(self, name):
+        """
+        Only called if name is not an attribute yet. Loads the settings file corresponding to name.
+        :param name: str
+        :return: loaded settings
+        """
+        setting_files = self.__dict__.get('_setting_files', {})
+        if name not in setting_files:
+            raise AttributeError("'{}' object has no attribute '{}'".format(self.__class__.__name__, name))
+        with self._lock:
+            if name not in self.__dict__:
+                self._load_setting_file(name)
+            return self.__dict__[name]
 
-    @classmethod
-    def update_routines(cls, value):
+    @property
+    def qc_routines(self):
+        """
+        Only the files in etc/qc_routines are loaded.
+        :return: copy of dict with qc_routine name as key and qc_index as value
+        """
+        with self._lock:
+            self._load_routine_setting_files()
+            return dict(self._qc_routines)
+
+    @property
+    def repo_version(self):
+        """
+        Resolved the first time it is requested
+        :return: str
+        """
+        if self._repo_version is None:
+            self._repo_version = git_version()
+        return self._repo_version
+
+    @staticmethod
+    def get_routines_setting(value):
+        """
+        Routines are listed under "routines" in the qc_routines files (older files use "functions").
+        :param value: dict, loaded settings file
+        :return: dict with routine settings or None
+        """
+        if not isinstance(value, dict):
+            return None
+        return value.get('routines') or value.get('functions')
+
+    def update_routines(self, value):
         """
         :param value:
         :return:
         """
-        for key, func in value['functions'].items():
-            cls.qc_routines.setdefault(func.get('name'),
-                                       func.get('qc_index'))
+        for key, func in self.get_routines_setting(value).items():
+            self._qc_routines.setdefault(func.get('name'),
+                                         func.get('qc_index'))
+
+    def reload_modified_files(self):
+        """
+        Drops loaded settings files that have been modified since they were loaded.
+        They are loaded again the next time they are requested.
+        :return:
+        """
+        with self._lock:
+            for name, mtime in list(self._mtimes.items()):
+                if os.path.getmtime(self._setting_files[name]) == mtime:
+                    continue
+                value = self.__dict__.pop(name, None)
+                self._mtimes.pop(name)
+                if self.get_routines_setting(value):
+                    for func in self.get_routines_setting(value).values():
+                        self._qc_routines.pop(func.get('name'), None)
+
+    def _get_setting_files(self, etc_path):
+        """
+        :param etc_path: str, local path to settings
+        :return: dict with file name (without extension) as key and file path as value
+        """
+        setting_files = {}
+        for path in self.generate_filepaths(etc_path, pattern='.yaml'):
+            setting_files[YAMLreader.get_file_name(path)] = path
+        setting_files['parameter_dependencies'] = os.path.join(etc_path, 'parameter_dependencies.json')
+        return setting_files
+
+    def _load_setting_file(self, name):
+        """
+        :param name: str, file name without extension
+        :return: Updates attributes of self
+        """
+        path = self._setting_files[name]
+        mtime = os.path.getmtime(path)
+        if path.endswith('.json'):
+            with open(path, 'r') as f:
+                value = json.load(f)
+        else:
+            value = YAMLreader().load_yaml([path], file_names_as_key=True, return_config=True)[name]
+        self.set_attributes(self, **{name: value})
+        self._mtimes[name] = mtime
+
+    def _load_routine_setting_files(self):
+        routines_directory = os.path.join(self.etc_directory, 'qc_routines')
+        with self._lock:
+            for name, path in self._setting_files.items():
+                if name in self.__dict__:
+                    continue
+                if os.path.dirname(path) == routines_directory:
+                    self._load_setting_file(name)
 
     def __setattr__(self, name, value):
         """
@@ -71,18 +189,6 @@ class Settings:
             elif 'path' in item:
                 dictionary[item] = ''.join([self.base_directory, value])
 
-    def _load_settings(self, etc_path):
-        """
-        :param etc_path: str, local path to settings
-        :return: Updates attributes of self
-        """
-        paths = self.generate_filepaths(etc_path, pattern='.yaml')
-        settings = YAMLreader().load_yaml(paths, file_names_as_key=True, return_config=True)
-        self.set_attributes(self, **settings)
-        with open(os.path.join(etc_path, 'parameter_dependencies.json'), 'r') as f:
-            f = json.load(f)
-        self.set_attributes(self, parameter_dependencies=f)
-
     def set_attributes(self, obj, **kwargs):
         """
         #TODO Move to utils?
@@ -92,7 +198,7 @@ class Settings:
         :return: sets attributes to object
         """
         for key, value in kwargs.items():
-            if 'functions' in value and 'datasets' in value:
+            if self.get_routines_setting(value) and 'datasets' in value:
                 self.update_routines(value)
             setattr(obj, key, value)
 
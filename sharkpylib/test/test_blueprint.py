@@ -1,11 +1,48 @@
 import unittest
+import copy
+
+import numpy as np
+import pandas as pd
+
+from sharkpylib.qc.qc_default import QCBlueprint, QCBlueprintBatch
+
+
+def get_profile(rng, nr_rows, missing_columns=(), empty_columns=()):
+    depth = np.arange(1, nr_rows + 1, dtype=float)
+    data = {'time': ['2020-01-01 10:00'] * nr_rows,
+            'LATITUDE_DD': [57.1] * nr_rows,
+            'LONGITUDE_DD': [11.5] * nr_rows,
+            'DEPH': depth,
+            'PRES_CTD': depth * 1.01,
+            'TEMP_CTD': 15 - depth * 0.1 + rng.normal(0, 0.05, nr_rows),
+            'TEMP2_CTD': 15 - depth * 0.1 + rng.normal(0, 0.05, nr_rows),
+            'SALT_CTD': 7 + depth * 0.05 + rng.normal(0, 0.05, nr_rows),
+            'SALT2_CTD': 7 + depth * 0.05 + rng.normal(0, 0.05, nr_rows),
+            'CNDC_CTD': 1 + depth * 0.01 + rng.normal(0, 0.01, nr_rows),
+            'DOXY_CTD': 9 - depth * 0.05 + rng.normal(0, 0.05, nr_rows)}
+    # Spikes, out of range values and sensor differences
+    for par in ['TEMP_CTD', 'SALT_CTD', 'DOXY_CTD', 'CNDC_CTD']:
+        data[par][rng.integers(0, nr_rows, 2)] += rng.choice([-5, 5, 50])
+    data['TEMP2_CTD'][rng.integers(0, nr_rows)] += 2
+    data['DEPH'][rng.integers(0, nr_rows)] = 3000
+    data['LATITUDE_DD'][rng.integers(0, nr_rows)] = rng.choice([57.1, 95.])
+    df = pd.DataFrame({par: [f'{value:.3f}' if isinstance(value, float) else value for value in values]
+                       for par, values in data.items() if par not in missing_columns})
+    for par in empty_columns:
+        df[par] = ''
+    return {'data': df, 'metadata': pd.Series(['//METADATA'])}
 
 
 class TestBlueprint(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls):
-        pass
+        rng = np.random.default_rng(3)
+        cls.data_items = {'a': get_profile(rng, 40),
+                          'b': get_profile(rng, 25, missing_columns=['DOXY_CTD', 'TEMP2_CTD']),
+                          'c': get_profile(rng, 3),
+                          'd': get_profile(rng, 30, empty_columns=['SALT2_CTD']),
+                          'e': get_profile(rng, 50, missing_columns=['time'])}
 
     @classmethod
     def tearDownClass(cls):
@@ -15,4 +52,34 @@ class TestBlueprint(unittest.TestCase):
         pass
 
     def tearDown(self):
-        pass
\ No newline at end of file
+        pass
+
+    def _assert_same_flags(self, data_items, expected_items):
+        for key, expected_item in expected_items.items():
+            df = data_items[key]['data']
+            expected_df = expected_item['data']
+            q_columns = [col for col in expected_df if col.startswith('Q')]
+            self.assertEqual(q_columns, [col for col in df if col.startswith('Q')])
+            for col in q_columns:
+                self.assertEqual(list(df[col].fillna('')), list(expected_df[col].fillna('')), msg=f'{key}: {col}')
+
+    def test_batch_gives_same_flags_as_blueprint(self):
+        expected_items = copy.deepcopy(self.data_items)
+        for data_item in expected_items.values():
+            QCBlueprint(data_item, parameter_mapping={})()
+        all_flags = ''.join(''.join(df[col]) for df in [item['data'] for item in expected_items.values()]
+                            for col in df if col.startswith('Q0_'))
+        self.assertIn('B', all_flags)
+        self.assertIn('A', all_flags)
+
+        data_items = copy.deepcopy(self.data_items)
+        QCBlueprintBatch(data_items, parameter_mapping={})()
+        self._assert_same_flags(data_items, expected_items)
+
+        data_items = copy.deepcopy(self.data_items)
+        QCBlueprintBatch(data_items, processes=2, parameter_mapping={})()
+        self._assert_same_flags(data_items, expected_items)
+
+
+if __name__ == '__main__':
+    unittest.main()
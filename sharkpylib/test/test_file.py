@@ -3,7 +3,12 @@ from pathlib import Path
 import os
 import shutil
 
+import pandas as pd
+
 from sharkpylib.file.file_handlers import Directory
+from sharkpylib.file.file_handlers import FileObjectCache
+from sharkpylib.file.files import MappingFile
+from sharkpylib.file.files import ListFile
 
 
 class TestFile(unittest.TestCase):
@@ -47,6 +52,55 @@ class TestFile(unittest.TestCase):
 
         # file_type='', match_string='', match_format='', prefix=''):
 
+    def test_mapping_file(self):
+        file_path = Path(self.data_folder, 'mapping_file.txt')
+        with open(file_path, 'w') as fid:
+            fid.write('\n'.join(['internal\texternal\tunit',
+                                 'TEMP\tTEMP_CTD\tdegC',
+                                 'SALT\t\tpsu',
+                                 'TEMP\tTEMP_BTL\tdegC']))
+        mapping = MappingFile(str(file_path))
+        self.assertEqual(mapping.get('TEMP'), 'TEMP_CTD')
+        self.assertEqual(mapping.get('SALT', missing_value='missing'), 'missing')
+        self.assertEqual(mapping.get('DOXY'), '')
+        self.assertEqual(mapping.get('TEMP_BTL', from_col='external', to_col='unit'), 'degC')
+        self.assertEqual(mapping.get_mapped_list(['DOXY', 'TEMP', 'SALT'], missing_value='missing'),
+                         ['missing', 'TEMP_CTD', 'missing'])
+        series = mapping.get_mapped_series(pd.Series(['TEMP', 'DOXY'], index=[3, 4]))
+        self.assertEqual(list(series.index), [3, 4])
+        self.assertEqual(list(series), ['TEMP_CTD', ''])
+
+    def test_file_object_cache(self):
+        file_paths = []
+        for k in range(3):
+            file_path = Path(self.data_folder, 'list_cache_{}.txt'.format(k))
+            with open(file_path, 'w') as fid:
+                fid.write('a\nb')
+            file_paths.append(str(file_path))
+        cache = FileObjectCache(maxsize=2)
+        list_object = cache.get(ListFile, file_paths[0])
+        self.assertIs(cache.get(ListFile, os.path.abspath(file_paths[0])), list_object)
+        self.assertIsNot(cache.get(ListFile, file_paths[0], comment='#'), list_object)
+
+        # Least recently used object is removed
+        comment_object = cache.get(ListFile, file_paths[0], comment='#')
+        cache.get(ListFile, file_paths[0])
+        cache.get(ListFile, file_paths[1])
+        self.assertEqual(len(cache), 2)
+        self.assertIs(cache.get(ListFile, file_paths[0]), list_object)
+        self.assertIsNot(cache.get(ListFile, file_paths[0], comment='#'), comment_object)
+
+        # Changed file is read again
+        list_object = cache.get(ListFile, file_paths[2])
+        stat = os.stat(file_paths[2])
+        with open(file_paths[2], 'w') as fid:
+            fid.write('a\nb\nc')
+        os.utime(file_paths[2], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+        self.assertEqual(cache.get(ListFile, file_paths[2]).get(), ['a', 'b', 'c'])
+
+        with self.assertRaises(FileNotFoundError):
+            cache.get(ListFile, str(Path(self.data_folder, 'missing.txt')))
+
 
 if __name__ == '__main__':
     unittest.main()
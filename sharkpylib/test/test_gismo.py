@@ -0,0 +1,107 @@
+import unittest
+import logging
+import multiprocessing
+import tempfile
+import shutil
+import os
+
+import numpy as np
+import pandas as pd
+
+from sharkpylib.gismo import qc_routines
+from sharkpylib.gismo.qc import IOCFTP_QC
+
+
+class IOCFTPFile:
+    """ The attributes of a gismo iocftp file used by QCiocftp """
+    columns = ['20', '8002', '88002', '8003', '88003', '8179', '88179', '8181', '88181']
+
+    def __init__(self, file_id, rows):
+        self.file_id = file_id
+        self.internal_station_name = 'Transpaper'
+        self.external_station_name = 'Transpaper'
+        self.df = pd.DataFrame(rows, columns=self.columns)
+        self.original_columns = self.columns[:]
+
+    def get_qf_par(self, par):
+        if '8' + par in self.df:
+            return '8' + par
+        return False
+
+
+def get_iocftp_files(nr_files=3):
+    rng = np.random.default_rng(5)
+    files = []
+    for k in range(nr_files):
+        rows = []
+        for r in range(6):
+            rows.append([f'201806011{k}{r:02d}00', f'{57.5 + r / 100:.2f}', '0', f'{11.2 + r / 100:.2f}', '0',
+                         f'{rng.normal(15, 5):.2f}', '0', f'{rng.normal(7, 3):.2f}', '0'])
+        rows[k][1] = '-999'
+        rows[k + 1][5] = ''
+        files.append(IOCFTPFile(f'file_{k}', rows))
+    return files
+
+
+class TestGismo(unittest.TestCase):
+
+    def setUp(self):
+        self.log_directory = tempfile.mkdtemp()
+        self.qc = qc_routines.QCiocftp(log_directory=os.path.join(self.log_directory, 'log'))
+
+    def tearDown(self):
+        shutil.rmtree(self.log_directory)
+
+    def _get_expected_flags(self, gismo_object):
+        """ Flags from calling IOCFTP_QC directly """
+        data_matrix = qc_routines.get_float_matrix(gismo_object.df, gismo_object.original_columns)
+        header_nr = np.array([int(col) for col in gismo_object.original_columns])
+        data_matrix = IOCFTP_QC.QC_CHECK_FERRYBOX(gismo_object.internal_station_name,
+                                                  gismo_object.external_station_name,
+                                                  data_matrix, header_nr, 'test_gismo', '')
+        return {qpar: list(data_matrix[:, i].astype(int).astype(str))
+                for i, qpar in enumerate(gismo_object.original_columns) if len(qpar) == 5}
+
+    def _get_log_lines(self):
+        lines = []
+        for file_name in os.listdir(self.qc.log_directory):
+            with open(os.path.join(self.qc.log_directory, file_name)) as fid:
+                lines.extend(fid.readlines())
+        return lines
+
+    def test_iocftp_qc_writes_flag_columns(self):
+        expected = [self._get_expected_flags(gismo_object) for gismo_object in get_iocftp_files()]
+        for qpar in ['88002', '88179']:
+            self.assertNotEqual(set(expected[0][qpar]), {'0'})
+
+        for kwargs in [{}, {'processes': 2}]:
+            gismo_objects = get_iocftp_files()
+            self.qc.run_qc(gismo_objects, **kwargs)
+            for gismo_object, expected_flags in zip(gismo_objects, expected):
+                for qpar, flags in expected_flags.items():
+                    self.assertEqual(list(gismo_object.df[qpar]), flags, msg=f'{kwargs}: {qpar}')
+
+        # One file at a time
+        gismo_object = get_iocftp_files()[1]
+        self.qc.run_qc(gismo_object)
+        self.assertEqual(list(gismo_object.df['88179']), expected[1]['88179'])
+
+        self.assertFalse(logging.getLogger(self.qc.qc_logger_name).handlers)
+        self.assertEqual(sum('QC_CHECK: ' in line for line in self._get_log_lines()), 3 + 3 + 1)
+
+    def test_iocftp_qc_log_in_spawned_worker(self):
+        gismo_object = get_iocftp_files(1)[0]
+        log_path = os.path.join(self.qc.log_directory, 'spawn.log')
+        job = (gismo_object.internal_station_name, gismo_object.external_station_name,
+               qc_routines.get_float_matrix(gismo_object.df, gismo_object.original_columns),
+               np.array([int(col) for col in gismo_object.original_columns]), self.qc.qc_logger_name)
+        with multiprocessing.get_context('spawn').Pool(processes=1,
+                                                       initializer=qc_routines._init_iocftp_qc,
+                                                       initargs=(self.qc.cfg_directory, self.qc.qc_directory,
+                                                                 self.qc.qc_logger_name, log_path)) as pool:
+            pool.starmap(qc_routines._run_iocftp_qc, [job])
+        self.assertEqual(sum('QC_CHECK: ' in line for line in self._get_log_lines()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+import unittest
+from pathlib import Path
+import os
+import re
+import shutil
+import codecs
+
+import numpy as np
+import pandas as pd
+
+from sharkpylib import mappinglib
+from sharkpylib import iocftp
+from sharkpylib.gismo import convert
+
+
+HEADER = ['YEAR', 'STATION', 'PRES_CTD [dbar]', 'Q_PRES_CTD', 'TEMP_CTD [°C]', 'QC0_TEMP_CTD', 'SALT_CTD [psu]']
+
+
+def _reference_add_nodc_qc_columns_to_df(df, default_q='', default_qc0='0', default_qc1='0'):
+    """ Column by column implementation of mappinglib.add_nodc_qc_columns_to_df before the layout was computed once """
+    df = df.copy()
+    columns = list(df.columns)
+    metadata_columns = mappinglib.ListDirectory().get_file_object('list_metadata_columns.txt').get()
+    data_par_list = [par for par in columns if par not in metadata_columns and
+                     not any([par.startswith(qc) for qc in ['Q_', 'QC0_', 'QC1']])]
+    new_columns = []
+    for par in columns:
+        if par in data_par_list:
+            qpar = par.split('[')[0].strip()
+            new_columns.extend([par, f'Q_{qpar}', f'QC0_{qpar}', f'QC1_{qpar}'])
+        elif par not in new_columns:
+            new_columns.append(par)
+    for col in new_columns:
+        if col not in columns:
+            if col.startswith('QC0'):
+                df[col] = default_qc0
+            elif col.startswith('QC1'):
+                df[col] = default_qc1
+            elif col.startswith('Q'):
+                df[col] = default_q
+    return df[new_columns]
+
+
+def _reference_convert(file_path, output_file_path, comment_id='//', data_delimiter='\t'):
+    """ Implementation of convert_standard_format_to_nodc_standard_format before rows were streamed """
+    metadata = []
+    header = []
+    data = []
+    with codecs.open(file_path, encoding='cp1252') as fid:
+        for line in fid:
+            if line.startswith(comment_id):
+                metadata.append(line)
+            else:
+                split_line = [item.strip() for item in re.split(data_delimiter, line.strip('\n\r'))]
+                if not header:
+                    header = split_line
+                else:
+                    data.append(split_line)
+    df = _reference_add_nodc_qc_columns_to_df(pd.DataFrame(data, columns=header))
+    data_dict = df.to_dict('split')
+    with codecs.open(output_file_path, 'w', encoding='cp1252') as fid:
+        fid.write(''.join(metadata))
+        fid.write(data_delimiter.join(data_dict['columns']))
+        fid.write('\n')
+        for line in data_dict['data']:
+            fid.write(data_delimiter.join(line))
+            fid.write('\n')
+
+
+def _reference_add_qc0_columns(df):
+    """ Column by column implementation of CreateIOCFTPfile._add_qc0_columns before add_QC0_columns_to_df was used """
+    df = df.copy().fillna('')
+    added_columns = []
+    parent_added_column = []
+    new_columns_in_order = []
+    for col in df.columns:
+        col = str(col)
+        new_columns_in_order.append(col)
+        if len(col) == 4:
+            qc_col = '8'+col
+            new_columns_in_order.append(qc_col)
+            added_columns.append(qc_col)
+            parent_added_column.append(col)
+    qc0_flag_series = np.zeros(len(df)).astype(int).astype(str)
+    for col, parent_col in zip(added_columns, parent_added_column):
+        boolean = df[parent_col] == ''
+        add_series = qc0_flag_series.copy()
+        add_series[boolean] = ''
+        df[col] = add_series
+    return df[new_columns_in_order].fillna('')
+
+
+def write_standard_format_file(file_path, nr_rows=25, seed=0):
+    rng = np.random.default_rng(seed)
+    lines = ['//METADATA;STATION;Å14', '//COMNT_QC;test']
+    lines.append('\t'.join(HEADER))
+    for _ in range(nr_rows):
+        lines.append('\t'.join([rng.choice(['', ' 1.5', '2 ', 'x']) for _ in HEADER]))
+    with codecs.open(file_path, 'w', encoding='cp1252') as fid:
+        fid.write('\n'.join(lines) + '\n')
+
+
+class TestMappinglib(unittest.TestCase):
+    data_folder = Path('test_mappinglib_data')
+
+    @classmethod
+    def setUpClass(cls):
+        if cls.data_folder.exists():
+            raise PermissionError
+        os.mkdir(cls.data_folder)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.data_folder)
+
+    def test_add_nodc_qc_columns_to_df(self):
+        df = pd.DataFrame({col: ['1', ''] for col in HEADER})
+        result = mappinglib.add_nodc_qc_columns_to_df(df.copy(), default_q='Q', default_qc1='1')
+        expected = _reference_add_nodc_qc_columns_to_df(df, default_q='Q', default_qc1='1')
+        self.assertEqual(list(result.columns), list(expected.columns))
+        self.assertEqual(list(result.columns[:6]), ['YEAR', 'STATION', 'PRES_CTD [dbar]', 'Q_PRES_CTD',
+                                                    'QC0_PRES_CTD', 'QC1_PRES_CTD'])
+        self.assertTrue(result.astype(str).equals(expected.astype(str)))
+        self.assertEqual(list(result['QC1_TEMP_CTD']), ['1', '1'])
+        self.assertEqual(list(result['Q_TEMP_CTD']), ['Q', 'Q'])
+
+    def test_map_values(self):
+        file_path = Path(self.data_folder, 'station_mapping.txt')
+        with codecs.open(file_path, 'w', encoding='cp1252') as fid:
+            fid.write('external\tinternal\nA\tStation A\nB\tStation B\nÅ\tStation Å\n')
+        values = ['A', np.nan, 'B', 'C', 'A', 'Å', np.nan]
+        for kwargs in [{}, {'missing_value': 'missing'}]:
+            mapping_object = mappinglib.MapAndFilterPandasDataframe(pd.DataFrame({'STATN': values, 'other': 'A'}))
+            mapping_object.set_mapping_file(str(file_path), from_col='external', to_col='internal')
+            mapping_object.map_values('STATN', **kwargs)
+            expected = [mapping_object.mapping_object.get(value, **kwargs) for value in values]
+            self.assertEqual(list(mapping_object.df['STATN']), expected)
+            self.assertEqual(list(mapping_object.df['other']), ['A'] * len(values))
+        self.assertEqual(expected, ['Station A', 'missing', 'Station B', 'missing', 'Station A', 'Station Å',
+                                    'missing'])
+
+    def test_add_qc0_columns_to_df(self):
+        df = pd.DataFrame({'datetime': ['201906011200', '201906011201'],
+                           '8179': ['5.1', ''],
+                           '8181': ['7.1', '7.2'],
+                           '88179': ['4', '1'],
+                           '8002': ['57.5', '']})
+        result = iocftp.add_QC0_columns_to_df(df)
+        self.assertEqual(list(result.columns), ['datetime', '8179', '88179', '8181', '88181', '8002', '88002'])
+        self.assertEqual(list(result['88179']), ['4', '1'])
+        self.assertEqual(list(result['88181']), ['0', '0'])
+        self.assertEqual(list(result['88002']), ['0', ''])
+
+    def test_create_iocftp_file_qc0_columns(self):
+        rng = np.random.default_rng(2)
+        df = pd.DataFrame({'datetime': ['2019060112{:02d}'.format(k) for k in range(20)],
+                           '8179': rng.choice(['5.1', '6.2', '', np.nan], 20),
+                           '8181': rng.choice(['7.1', ''], 20),
+                           '8002': '57.5',
+                           '8003': rng.choice(['11.5', ''], 20)})
+        # Only the QC0 step (the filtered dataframe is normally created from data and mapping files)
+        iocftp_file = iocftp.CreateIOCFTPfile.__new__(iocftp.CreateIOCFTPfile)
+        iocftp_file.mapping_object = mappinglib.MapAndFilterPandasDataframe(df)
+        iocftp_file.mapping_object.df_filtered = df
+        iocftp_file._add_qc0_columns()
+
+        expected = _reference_add_qc0_columns(df)
+        self.assertEqual(list(iocftp_file.df_iocftp.columns),
+                         ['datetime', '8179', '88179', '8181', '88181', '8002', '88002', '8003', '88003'])
+        self.assertEqual(list(iocftp_file.df_iocftp.columns), list(expected.columns))
+        self.assertTrue(iocftp_file.df_iocftp.astype(str).equals(expected.astype(str)))
+
+    def test_convert_standard_format_to_nodc_standard_format(self):
+        directory = Path(self.data_folder, 'convert')
+        os.makedirs(directory)
+        for k in range(2):
+            write_standard_format_file(Path(directory, f'ctd_{k}.txt'), nr_rows=25 + k, seed=k)
+
+        output_file_paths = convert.convert_standard_format_directory_to_nodc_standard_format(str(directory),
+                                                                                              chunk_size=7)
+        self.assertEqual([os.path.basename(path) for path in output_file_paths], ['nodc_ctd_0.txt', 'nodc_ctd_1.txt'])
+        for k, output_file_path in enumerate(output_file_paths):
+            reference_file_path = Path(directory, f'reference_{k}.dat')
+            _reference_convert(Path(directory, f'ctd_{k}.txt'), reference_file_path)
+            with open(output_file_path, 'rb') as fid, open(reference_file_path, 'rb') as reference_fid:
+                self.assertEqual(fid.read(), reference_fid.read())
+
+        # Already converted files are not converted again
+        output_file_paths = convert.convert_standard_format_directory_to_nodc_standard_format(str(directory))
+        self.assertEqual(len(output_file_paths), 2)
+
+    def test_convert_invalid_row_length(self):
+        file_path = Path(self.data_folder, 'invalid.txt')
+        with open(file_path, 'w') as fid:
+            fid.write('STATN\tTEMP [C]\tSALT\nA\t1\t2\t\n')
+        with self.assertRaises(ValueError):
+            convert.convert_standard_format_to_nodc_standard_format(str(file_path))
+        self.assertEqual(os.listdir(self.data_folder).count('nodc_invalid.txt'), 0)
+        self.assertEqual(os.listdir(self.data_folder).count('nodc_invalid.txt.tmp'), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,418 @@
+import unittest
+from pathlib import Path
+import os
+import shutil
+import datetime
+import filecmp
+import json
+
+import pandas as pd
+
+from sharkpylib.odv import create
+from sharkpylib.odv import history
+from sharkpylib.odv import modify
+from sharkpylib.odv import odvfile
+from sharkpylib.odv import spreadsheet
+
+
+HEADER = ['Cruise', 'Station', 'Type', 'yyyy-mm-ddThh:mm:ss.sss', 'Longitude [degrees_east]',
+          'Latitude [degrees_north]', 'LOCAL_CDI_ID', 'Depth [m]', 'QF', 'TEMP [degC]', 'QF']
+
+
+def write_spreadsheet_file(file_path, nr_stations=4, nr_depths=3, compact=True, quality_column='QF'):
+    lines = ['//<DataType>Profiles</DataType>',
+             '//<MetaVariable>label="Cruise" var_type="TEXT:40" </MetaVariable>',
+             '//<DataVariable>label="Depth [m]" is_primary_variable="T" comment="SDN:P01::ADEPZZ01"</DataVariable>',
+             '//<DataVariable>label="TEMP [degC]" comment="SDN:P01::TEMPPR01 SDN:P06::UPAA"</DataVariable>',
+             '\t'.join([quality_column if col == 'QF' else col for col in HEADER])]
+    for st in range(nr_stations):
+        time_string = '2018-0{}-01T10:00:00'.format(st + 1)
+        for depth in range(nr_depths):
+            if depth and compact:
+                metadata = ['', '', '', time_string, '', '', '']
+            else:
+                metadata = ['77SE', 'ST{}'.format(st), 'B', time_string, '11.5', '57.5', 'cdi_{}'.format(st % 2)]
+            lines.append('\t'.join(metadata + [str(depth), '1', '{}.5'.format(st), '1']))
+        if st == 1:
+            lines.append('//<History>\t\t\tTEMP [degC] @ Depth [m]=2: 1->4<EDITFLAGS></History>')
+    with open(file_path, 'w') as fid:
+        fid.write('\n'.join(lines) + '\n')
+
+
+class TestODV(unittest.TestCase):
+    data_folder = Path('test_odv_data')
+
+    @classmethod
+    def setUpClass(cls):
+        if cls.data_folder.exists():
+            raise PermissionError
+        os.mkdir(cls.data_folder)
+        cls.file_path = Path(cls.data_folder, 'data_from_test.txt')
+        write_spreadsheet_file(cls.file_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.data_folder)
+
+    def test_spreadsheet_scan(self):
+        sfile = spreadsheet.SpreadsheetFile(self.file_path)
+        cdi_consumer = spreadsheet.LocalCdiConsumer()
+        count_consumer = spreadsheet.StationCountConsumer()
+        station_consumer = spreadsheet.UniqueListConsumer('Station', metadata=True)
+        vocab_consumer = spreadsheet.VocabListConsumer('P01')
+        flag_consumer = spreadsheet.EditedFlagsConsumer()
+        nr_lines = sfile.scan(cdi_consumer, count_consumer, station_consumer, vocab_consumer, flag_consumer)
+
+        self.assertEqual(nr_lines, 18)
+        self.assertEqual(cdi_consumer.cdi_list, ['cdi_0', 'cdi_1'])
+        self.assertEqual(count_consumer.result, 4)
+        self.assertEqual(station_consumer.unique_list, ['ST0', 'ST1', 'ST2', 'ST3'])
+        self.assertEqual(sorted(vocab_consumer.vocab_list), ['ADEPZZ01', 'TEMPPR01'])
+        edited_flags = flag_consumer.edited_flags
+        self.assertEqual(list(edited_flags), ['TEMP [degC]'])
+        self.assertEqual(edited_flags['TEMP [degC]']['4'][0][1], '2')
+
+        # The single purpose methods give the same result
+        self.assertEqual(sfile.get_local_cdi_list(show_process_every=None), cdi_consumer.cdi_list)
+        self.assertEqual(sfile.get_edited_flags(), edited_flags)
+        self.assertFalse(sfile.get_unique_list('not_a_column', show_process_every=None))
+
+    def test_spreadsheet_encoding(self):
+        file_path = Path(self.data_folder, 'data_cp1252.txt')
+        with open(self.file_path) as fid:
+            text = fid.read().replace('cdi_1', 'cdi_Å')
+        with open(file_path, 'w', encoding='cp1252') as fid:
+            fid.write(text)
+        sfile = spreadsheet.SpreadsheetFile(file_path)
+        self.assertEqual(sfile.get_local_cdi_list(show_process_every=None, encoding='cp1252'), ['cdi_0', 'cdi_Å'])
+        self.assertEqual(sfile.get_odv_station_count(show_process_every=None, encoding='cp1252'), 4)
+        self.assertEqual(list(sfile.get_edited_flags(encoding='cp1252')), ['TEMP [degC]'])
+        with self.assertRaises(UnicodeDecodeError):
+            sfile.get_local_cdi_list(show_process_every=None, encoding='utf8')
+
+        # Same result with the index
+        index = spreadsheet.SpreadsheetIndex(file_path, encoding='cp1252', save=False)
+        self.assertEqual(index.get_local_cdi_list(), ['cdi_0', 'cdi_Å'])
+        with self.assertRaises(UnicodeDecodeError):
+            spreadsheet.SpreadsheetIndex(file_path, save=False)
+        other_file_path = Path(self.data_folder, 'data_cp1252_other.txt')
+        with open(other_file_path, 'w', encoding='cp1252') as fid:
+            fid.write(text.replace('cdi_0', 'cdi_Ö'))
+        for use_index in [False, True]:
+            result = spreadsheet.compare_non_matching_local_cdi_id(str(self.data_folder), file_path.name,
+                                                                  other_file_path.name, use_index=use_index,
+                                                                  encoding='cp1252')
+            self.assertEqual(result['cdi_id_not_in_data_cp1252'], ['cdi_Ö'])
+            self.assertEqual(result['cdi_id_not_in_data_cp1252_other'], ['cdi_0'])
+
+    def test_spreadsheet_index(self):
+        file_path = Path(self.data_folder, 'data_for_index.txt')
+        write_spreadsheet_file(file_path)
+        index = spreadsheet.SpreadsheetIndex(file_path)
+        self.assertTrue(os.path.exists(index.index_file_path))
+        self.assertEqual(index.get_station_count(), 4)
+        self.assertEqual(index.get_local_cdi_list(), ['cdi_0', 'cdi_1'])
+        self.assertEqual(index.stations[1]['station'], 'ST1')
+        self.assertEqual(index.stations[1]['lat'], 57.5)
+        self.assertEqual(index.stations[1]['variables'], ['Depth [m]', 'TEMP [degC]'])
+
+        entries = index.get_entries(local_cdi_id='cdi_1')
+        df = index.get_dataframe(entries)
+        self.assertEqual(list(df.columns), HEADER)
+        self.assertEqual(len(df), 6)
+        self.assertEqual(list(df['Station']), ['ST1', '', '', 'ST3', '', ''])
+
+        # Loaded from sidecar file
+        self.assertEqual(spreadsheet.SpreadsheetIndex(file_path).stations, index.stations)
+
+        # Rebuilt when the file has changed
+        write_spreadsheet_file(file_path, nr_stations=6)
+        self.assertEqual(spreadsheet.SpreadsheetIndex(file_path).get_station_count(), 6)
+
+        # Index not possible to save
+        index_file_path = str(Path(self.data_folder, 'missing_directory', 'data_for_index.txt.index.json'))
+        index = spreadsheet.SpreadsheetIndex(file_path, index_file_path=index_file_path)
+        self.assertFalse(os.path.exists(index_file_path))
+        self.assertEqual(index.get_station_count(), 6)
+
+    def test_spreadsheet_file_columns_several_files(self):
+        file_paths = [Path(self.data_folder, 'data_{}.txt'.format(k)) for k in range(3)]
+        for k, file_path in enumerate(file_paths):
+            write_spreadsheet_file(file_path, nr_stations=k + 1, compact=False, quality_column='QV:SEADATANET')
+        # Second file without temperature
+        with open(file_paths[1]) as fid:
+            lines = [line.split('\t')[:9] if not line.startswith('//') else [line] for line in fid.read().splitlines()]
+        with open(file_paths[1], 'w') as fid:
+            fid.write('\n'.join(['\t'.join(line) for line in lines]))
+
+        sfile = spreadsheet.SpreadsheetFileColumns([str(path) for path in file_paths])
+        self.assertEqual(len(sfile.df), 18)
+        self.assertIn('TEMP [degC] - QV:SEADATANET', sfile.header_list)
+        self.assertEqual(str(sfile.df['LOCAL_CDI_ID'].dtype), 'category')
+        self.assertEqual(list(sfile.df['TEMP [degC]'].iloc[3:9]), [''] * 6)
+        self.assertEqual(list(sfile.df['STATN'].unique()), ['ST0', 'ST1', 'ST2'])
+
+    def test_spreadsheet_file_columns_several_files_qf(self):
+        file_paths = [Path(self.data_folder, 'data_qf_{}.txt'.format(k)) for k in range(2)]
+        for k, file_path in enumerate(file_paths):
+            write_spreadsheet_file(file_path, nr_stations=k + 1, compact=False)
+        for processes in [None, 2]:
+            sfile = spreadsheet.SpreadsheetFileColumns([str(path) for path in file_paths], processes=processes)
+            self.assertEqual(len(sfile.df), 9)
+            self.assertIn('Depth [m] - QF', sfile.header_list)
+            self.assertIn('TEMP [degC] - QF', sfile.header_list)
+            self.assertNotIn('QF', sfile.header_list)
+            self.assertEqual(list(sfile.df['TEMP [degC]']), ['0.5'] * 3 + ['0.5'] * 3 + ['1.5'] * 3)
+            self.assertEqual(list(sfile.df['TEMP [degC] - QF']), ['1'] * 9)
+
+    def test_simple_odv_file_chunks(self):
+        data = {'time': [datetime.datetime(2019, 5, 1, 12, 0, k) for k in range(5)],
+                'lat': ['57.1', '57.2', '57.3', '57.4', '57.5'],
+                'lon': '11.5',
+                'TEMP': ['5.1', '5.2', '5.3', '5.4', '5.5'],
+                '8TEMP': ['1', '1', '4.0', '1', '1'],
+                'data_type': 'Trajectories'}
+        odv_file = create.SimpleODVfile(data=data, qf_prefix='8')
+        file_path = Path(self.data_folder, 'simple_odv_file.txt')
+        odv_file.create_file(file_path, chunk_size=2)
+        with open(file_path, encoding='cp1252') as fid:
+            lines = fid.read().split('\n')
+        data_lines = lines[lines.index(odv_file._get_header_row()) + 1:]
+        self.assertEqual(data_lines, odv_file._get_data_rows())
+        self.assertEqual(len(data_lines), 5)
+        self.assertEqual(data_lines[2], '\t'.join(['Cruise_2', 'Station_2', 'B', '2019-05-01T12:00:02', '11.5', '57.3',
+                                                   '', '2019-05-01T12:00:02', '1', '5.3', '4']))
+
+    def _get_biota_eea_object(self, output_directory):
+        rows = []
+        for k in range(24):
+            rows.append({'Species': ['Clupea harengus', 'Perca fluviatilis'][k % 2],
+                         'NationalStationID': ['Landsort', 'Utlängan', 'Ängskär'][k % 3],
+                         'Year': '2015', 'Month': str(k % 4 + 1), 'Day': '1',
+                         'LATIT': ['5820', '5610', '6010'][k % 3], 'LONGI': ['1810', '1620', '1720'][k % 3],
+                         'SampleID': 'S{}'.format(k % 5), 'CASNumber': ['CAS1', 'CAS2'][k % 2 * (k % 3 == 0)],
+                         'Determinand_HazSubs': ['HG', 'CD'][k % 2 * (k % 3 == 0)], 'Concentration': str(k / 10),
+                         'LOD_LOQ_Flag': ['', '<'][k % 7 == 0], 'Unit_HazSubs': 'µg/kg', 'Basis': 'wet weight',
+                         'Tissue': 'MU'})
+        df = pd.DataFrame(rows)
+        p01_mapping = pd.DataFrame({'vocab_search_string': ['%'.join([cas, 'wet weight', sp, 'MU'])
+                                                            for cas in ['CAS1', 'CAS2']
+                                                            for sp in ['Clupea harengus', 'Perca fluviatilis']]})
+        p01_mapping['P01'] = ['P01_{}'.format(k) for k in range(len(p01_mapping))]
+        p01_file_path = Path(self.data_folder, 'p01_mapping.txt')
+        p01_mapping.to_csv(p01_file_path, sep='\t', index=False, encoding='cp1252')
+        p02_file_path = Path(self.data_folder, 'p02_mapping.txt')
+        with open(p02_file_path, 'w') as fid:
+            fid.write('\n'.join(['{}\tP02_A'.format(p01) for p01 in p01_mapping['P01']]))
+        return create.CreateODVfilesBiotaEEA(df, output_directory=str(output_directory), primary_variabel='time_series',
+                                             p01_mapping_file_path=str(p01_file_path),
+                                             p02_mapping_file_path=str(p02_file_path))
+
+    def test_create_odv_files_in_pool(self):
+        serial_directory = Path(self.data_folder, 'serial')
+        pool_directory = Path(self.data_folder, 'pool')
+        for directory, processes in [(serial_directory, None), (pool_directory, 2)]:
+            os.makedirs(Path(directory, 'odv'))
+            odv_files = self._get_biota_eea_object(directory)
+            odv_files.create_files(odv_files=True, cdi_lines=True, processes=processes)
+
+        file_names = sorted(os.listdir(Path(serial_directory, 'odv')))
+        self.assertEqual(len(file_names), len(odv_files.station_id_set) + 1)
+        self.assertEqual(file_names, sorted(os.listdir(Path(pool_directory, 'odv'))))
+        match, mismatch, errors = filecmp.cmpfiles(Path(serial_directory, 'odv'), Path(pool_directory, 'odv'),
+                                                   file_names, shallow=False)
+        self.assertEqual(mismatch + errors, [])
+
+    def test_create_odv_file_lines(self):
+        def semantic_line(name, p01):
+            return '//<subject>SDN:LOCAL:{}</subject><object>SDN:P01::{}</object><units>SDN:P06::UUKG</units>'.format(
+                name, p01)
+
+        columns = ['_sample_id', '_sdate', '_data_column_name', '_p01', '_concentration', '_qf']
+        rows = [['S2', '2015-02-01', 'HG [ug/kg]', 'P01_HG', '0.2', '1'],
+                ['S1', '2015-01-01', 'HG [ug/kg]', 'P01_HG', '0.1', 'Q'],
+                ['S1', '2015-01-01', 'CD [ug/kg]', 'P01_CD', '0.3', '1'],
+                ['S3', '2015-03-01', 'CD [ug/kg]', 'P01_CD', '0.4', '1'],
+                ['S3', '2015-03-01', 'CD [ug/kg]', 'P01_CD', '0.5', '1']]
+        df = pd.DataFrame(rows, columns=columns)
+        df['_semantic_line'] = [semantic_line(name, p01) for name, p01 in zip(df['_data_column_name'], df['_p01'])]
+        for col, value in [('_cruise', 'C1'), ('_statn', 'Landsort'), ('_latit_dg', '58.3333'),
+                           ('_longi_dg', '18.1667'), ('_local_cdi_id', 'cdi_landsort'), ('_edmo_author', '545'),
+                           ('_comment', 'Test comment'), ('_p02', 'P02_A')]:
+            df[col] = value
+        df.index = [10, 3, 7, 1, 5]
+
+        output_directory = Path(self.data_folder, 'create_lines')
+        odv_object = create.CreateODVfileTimeseriesRow(df, output_directory=str(output_directory))
+        text = odv_object.create_odv_file()
+        with open(Path(output_directory, 'odv', 'cdi_landsort.txt'), encoding='utf8') as fid:
+            self.assertEqual(fid.read(), text)
+
+        header = ['Cruise', 'Station', 'Type', 'yyyy-mm-ddThh:mm:ss.sss', 'Longitude [degrees_east]',
+                  'Latitude [degrees_north]', 'LOCAL_CDI_ID', 'EDMO_code', 'Bot. Depth [m]',
+                  'time_ISO8601 [yyyy-mm-dd]', 'QV:SEADATANET', 'sample_id', 'QV:SEADATANET',
+                  'CD [ug/kg]', 'QV:SEADATANET', 'HG [ug/kg]', 'QV:SEADATANET']
+        metadata = ['C1', 'Landsort', '*', '{}', '+18.1667', '+58.3333', 'cdi_landsort', '545', '', '{}', '1']
+        expected_lines = ['//Test comment',
+                          '//',
+                          '//SDN_parameter_mapping',
+                          odv_object.primary_variable['semantic_line'],
+                          odv_object.include_columns[0]['semantic_line'],
+                          semantic_line('CD [ug/kg]', 'P01_CD'),
+                          semantic_line('HG [ug/kg]', 'P01_HG'),
+                          '//',
+                          '\t'.join(header),
+                          '\t'.join(metadata + ['S1', '1', '0.3', '1', '0.1', 'Q']).format('2015-01-01', '2015-01-01'),
+                          '\t'.join(metadata + ['S2', '1', '', '', '0.2', '1']).format('2015-02-01', '2015-02-01'),
+                          # Last row is used for duplicates
+                          '\t'.join(metadata + ['S3', '1', '0.5', '1', '', '']).format('2015-03-01', '2015-03-01')]
+        self.assertEqual(text.split('\n'), expected_lines)
+
+        cdi_lines = odv_object.get_cdi_lines()
+        self.assertEqual(len(cdi_lines), 1)
+        cdi_line = dict(zip(create.CreateODVfileRow.cdi_lines_columns, cdi_lines[0].split('\t')))
+        self.assertEqual(cdi_line['LOCAL_CDI_ID'], 'cdi_landsort')
+        self.assertEqual(cdi_line['PDV_CODE'], 'P02_A')
+        self.assertEqual(cdi_line['AREA_TYPE'], 'Point')
+        self.assertEqual(float(cdi_line['DATA_SIZE']), os.stat(odv_object.file_path).st_size / 1e6)
+
+    def test_history_files(self):
+        file_path = Path(self.data_folder, 'history_flags.txt')
+        with open(file_path, 'w', encoding='cp1252') as fid:
+            fid.write('\n'.join(['Station 2: SMHI_2 545)\t2018-05-01\tuser\tEDITFLAGS\tTEMP @ Depth [m] = 5:1 -> 4',
+                                  'Station 1: SMHI_1 545)\t2018-05-01\tuser\tEDITFLAGS\tPSAL @ Depth [m] = 2:1 -> 3',
+                                  'Station 1: SMHI_1 545)\t2018-05-01\tuser\tEDITDATA\tTEMP @ Depth [m] = 2:1 -> 1']))
+        flag_file = history.HistoryFlagFile(file_path)
+        self.assertEqual(list(flag_file.df['local_cdi_id']), ['SMHI_1', 'SMHI_1', 'SMHI_2'])
+        self.assertEqual(list(flag_file.df['edmo']), ['545'] * 3)
+        self.assertEqual(list(flag_file.df['QF']), ['3', '', '4'])
+        self.assertEqual(list(flag_file.df['par']), ['PSAL', 'TEMP', 'TEMP'])
+        self.assertEqual(list(flag_file.df['flag_depth']), ['2:1 -> 3', '2:1 -> 1', '5:1 -> 4'])
+
+        directory = Path(self.data_folder, 'history_flags')
+        os.makedirs(directory)
+        flag_file.write_flags_for_all_local_cdi_id(str(directory), exclude_par='TEMP', type='EDITFLAGS')
+        self.assertEqual(sorted(os.listdir(directory)), ['all_flagged_local_cdi_id_odv_style.txt',
+                                                         'flags_for_local_cdi_id_SMHI_1.txt'])
+
+        file_path = Path(self.data_folder, 'history.txt')
+        with open(file_path, 'w') as fid:
+            fid.write('\n'.join(['[12]  SMHI_1 545:  2018-01-01  user  EDITFLAGS  TEMP  @  Depth [m] = 2:1 -> 4',
+                                  '[13]  SMHI_2 545:  2018-01-01  user  ADD  some   other info']))
+        history_file = history.HistoryFile(file_path)
+        self.assertEqual(history_file.nr, ['12', '13'])
+        self.assertEqual(history_file.allinfo, ['TEMP @ Depth [m] = 2:1 -> 4', 'some other info'])
+        self.assertEqual(history_file.editflags, {'545': {'TEMP': {'SMHI_1': {'Accession Number': '12',
+                                                                              'All_flags': ['Depth [m] = 2:1 -> 4']}}}})
+
+    def test_modify_odv_files_streaming(self):
+        directory = Path(self.data_folder, 'modify')
+        os.makedirs(Path(directory, 'in'))
+        lines = ['//<DataType>Profiles</DataType>',
+                 '//<subject>SDN:LOCAL:Depth</subject><object>SDN:P01::ADEPZZ01</object><units>SDN:P06::ULAA</units>',
+                 '\t'.join(['Cruise', 'Station', 'yyyy-mm-ddThh:mm:ss.sss', 'Bot. Depth [m]', 'Depth [m]', 'QF',
+                            'TEMP [degC]', 'QF']),
+                 '\t'.join(['77SE', 'ST1', '2018-05-01T10:00:00', 'None', '1', '1', '5.1', '1']),
+                 '//<History>comment</History>',
+                 '\t'.join(['77SE', 'ST1', '2018-05-01T10:00:00', 'None', '2', '1', '', '1'])]
+        for k in range(3):
+            with open(Path(directory, 'in', 'file_{}.txt'.format(k)), 'w', encoding='cp1252') as fid:
+                fid.write('\n'.join(lines))
+
+        def modify_file(obj):
+            obj.replace_values_in_col(column_name='Bot. Depth [m]', old_val='None', new_val='')
+            obj.convert_to_timeseries()
+            obj.set_qf_for_column('TEMP [degC]', '3', replace_flag='1')
+            obj.replace_string_in_metadata('Profiles', 'timeSeries')
+
+        os.makedirs(Path(directory, 'in_memory'))
+        for file_name in os.listdir(Path(directory, 'in')):
+            modify_obj = modify.ModifyODVfile(str(Path(directory, 'in', file_name)))
+            modify_obj.load_metadata()
+            modify_obj.load_data()
+            modify_file(modify_obj)
+            modify_obj.write_new_odv(str(Path(directory, 'in_memory')), file_name)
+
+        transform = modify.ODVfileTransform()
+        modify_file(transform)
+        log_path = Path(directory, 'log.txt')
+        file_paths = modify.transform_odv_directory(str(Path(directory, 'in')), transform,
+                                                    str(Path(directory, 'streamed')), log_path=str(log_path),
+                                                    processes=2)
+        self.assertEqual(len(file_paths), 3)
+        for file_path in file_paths:
+            self.assertTrue(filecmp.cmp(file_path, Path(directory, 'in_memory', os.path.basename(file_path)),
+                                        shallow=False))
+        with open(file_paths[0], encoding='cp1252') as fid:
+            data_lines = fid.read().split('\n')[-3:-1]
+        self.assertEqual(data_lines[1].split('\t')[3:6], ['', '2018-05-01T10:00:00', '1'])
+        self.assertEqual(data_lines[1].split('\t')[-1], '9')
+        with open(log_path) as fid:
+            self.assertEqual(len(fid.readlines()), 9)
+
+    def test_odv_directory_catalog(self):
+        directory = Path(self.data_folder, 'catalog')
+        os.makedirs(directory)
+        header = ['Cruise', 'Station', 'LOCAL_CDI_ID', 'Bot. Depth [m]', 'Depth [m]', 'QF', 'TEMP [degC]', 'QF']
+        for k in range(3):
+            with open(Path(directory, 'file_{}.txt'.format(k)), 'w', encoding='cp1252') as fid:
+                fid.write('\n'.join(['//<subject>SDN:LOCAL:TEMP</subject><object>SDN:P01::TEMPPR0{}</object>'.format(k),
+                                     '\t'.join(header),
+                                     '\t'.join(['77SE', 'ST{}'.format(k), 'cdi_{}'.format(k), '20', '1', '1', '5.1',
+                                                '1']),
+                                     '\t'.join(['', '', '', '', '2', '1', '5.2', '1'])]))
+        odv_directory = odvfile.ODVdirectory(str(directory))
+        self.assertEqual(len(odv_directory.catalog.files), 3)
+        self.assertFalse(Path(directory, 'odv_catalog.json').exists())
+
+        odv_directory = odvfile.ODVdirectory(str(directory), save_catalog=True)
+        self.assertEqual(sorted(odv_directory.get_mapping_of_primary_variable()['Depth [m]']),
+                         ['file_0.txt', 'file_1.txt', 'file_2.txt'])
+        self.assertTrue(Path(directory, 'odv_catalog.json').exists())
+        self.assertEqual(odv_directory.catalog.get_entry(odv_directory.file_paths[0])['local_cdi_ids'],
+                         [os.path.basename(odv_directory.file_paths[0]).replace('file', 'cdi').split('.')[0]])
+        self.assertEqual([os.path.basename(file_path) for file_path in
+                          odv_directory.get_files_with_string('SDN:P01::TEMPPR01')], ['file_1.txt'])
+        self.assertEqual([os.path.basename(file_path) for file_path in
+                          odv_directory.get_files_with_string('ST2', chunk_size=4)], ['file_2.txt'])
+
+        with open(Path(directory, 'file_3.txt'), 'w', encoding='cp1252') as fid:
+            fid.write('\t'.join(header))
+        catalog = odv_directory.catalog
+        self.assertEqual(catalog.update(), ['file_3.txt'])
+        self.assertEqual(catalog.update(), [])
+        with open(catalog.catalog_file_path) as fid:
+            saved_files = json.load(fid)['files']
+        self.assertEqual(sorted(saved_files), ['file_0.txt', 'file_1.txt', 'file_2.txt', 'file_3.txt'])
+        self.assertEqual(saved_files['file_3.txt']['header'], header)
+        self.assertEqual(saved_files['file_3.txt']['local_cdi_ids'], [])
+        self.assertEqual(saved_files['file_1.txt']['p01'], ['TEMPPR01'])
+        # Saved entries are loaded and not scanned again
+        self.assertEqual(odvfile.ODVcatalog(str(directory), save=True).update(), [])
+
+        odv_directory = odvfile.ODVdirectory(str(directory))
+        self.assertEqual(len(odv_directory.get_files_with_local_cdi_id('cdi_1')), 1)
+        self.assertEqual(len(odv_directory.get_mapping_of_primary_variable()['Depth [m]']), 4)
+
+    def test_odv_file_has_string(self):
+        file_paths = []
+        for encoding in ['cp1252', 'utf-8']:
+            file_path = Path(self.data_folder, 'string_{}.txt'.format(encoding))
+            with open(file_path, 'w', encoding=encoding) as fid:
+                fid.write('Cruise\tStation\n77SE\tÅlgrund\n')
+            file_paths.append(str(file_path))
+        for file_path in file_paths:
+            odv_file = odvfile.ODVfile(file_path)
+            self.assertTrue(odv_file.has_string('Ålgrund', chunk_size=4))
+            self.assertFalse(odv_file.has_string('Ölgrund'))
+            # Not possible to encode in cp1252
+            self.assertFalse(odv_file.has_string('Ålgrund ☃'))
+        self.assertEqual(odvfile.search_files(file_paths, 'Ålgrund'), file_paths)
+
+        with open(file_paths[1], 'a', encoding='utf-8') as fid:
+            fid.write('77SE\t☃\n')
+        self.assertEqual(odvfile.search_files(file_paths, '☃'), file_paths[1:])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,13 +1,106 @@
 import unittest
+import json
+import tempfile
+import warnings
 import yaml
 from pathlib import Path
 import os
 import pandas as pd
 import numpy as np
+import seawater as sw
 
 import sharkpylib.qc.functions.continuous
+from sharkpylib.gismo.qc.qc_profile import QCrangeFile
+from sharkpylib.qc import flags
+from sharkpylib.qc.QC import QC
+from sharkpylib.qc.boolean_base import BooleanBaseDataFrame
+from sharkpylib.qc.instrumentation import QCInstrumentation, count_flag_codes, count_changed_flags
 from sharkpylib.qc import functions
 from sharkpylib.qc.mask_areas import MaskAreasDirectory
+from sharkpylib.qc.rolling_statistics import RollingStatistics
+from sharkpylib.qc.qc_default import QCBlueprint, QCBlueprintBatch
+from sharkpylib.qc.settings import Settings
+
+
+def _reference_increasing(data, qf=[], min_delta=0.01, qf_ignore=['B', 'S', '?']):
+    """ Loop implementation of QC.increasing before it was vectorized """
+    data_temp = False
+    qfindex = np.full((len(data)), False)
+    for i, d in enumerate(data):
+        if len(qf) > 0:
+            if qf[i] in qf_ignore:
+                continue
+        if data_temp:
+            if data_temp > d:
+                if (data_temp-d) >= min_delta:
+                    qfindex[i] = True
+        data_temp = d
+    return qfindex
+
+
+def _reference_range_check(data, qf, lower_limit, upper_limit, qf_ignore=['B', 'S', '?']):
+    """ Loop free implementation of QC.range_check before it was vectorized (single limits) """
+    data = np.array(data, dtype=float)
+    qf = np.array(qf, dtype=str)
+    index = np.full((len(data)), True)
+    for i in qf_ignore:
+        index = index & (qf != i)
+    qfindex = index & ((data < lower_limit) | (data > upper_limit))
+    qf[qfindex] = 'B'
+    return qfindex, qf
+
+
+def _reference_increasing_dens(dens, qtemp=[], qsalt=[], qpres=[], min_delta=0.01, qf_ignore=['B', 'S', '?']):
+    """ Loop implementation of QC.increasing_dens before it was vectorized (density given) """
+    dens_temp = False
+    qfindex = np.full((len(dens)), False)
+    for i, d in enumerate(dens):
+        if len(qtemp) > 0:
+            if qtemp[i] in qf_ignore:
+                qfindex[i] = True
+                continue
+        if len(qsalt) > 0:
+            if qsalt[i] in qf_ignore:
+                qfindex[i] = True
+                continue
+        if len(qpres) > 0:
+            if qpres[i] in qf_ignore:
+                qfindex[i] = True
+                continue
+        if dens_temp:
+            if dens_temp > d:
+                if (dens_temp-d) >= min_delta:
+                    qfindex[i] = True
+        dens_temp = d
+    return qfindex
+
+
+def _reference_sensor_diff(data_primary, qf_primary, data_secondary, qf_secondary, max_diff=0.2,
+                           qf_ignore=['B', 'S', '?']):
+    """ Loop implementation of QC.sensor_diff before it was vectorized """
+    data1 = np.array(data_primary, dtype=float)
+    data2 = np.array(data_secondary, dtype=float)
+    if qf_primary and qf_secondary:
+        for counter, (qaa, qbb) in enumerate(zip(qf_primary, qf_secondary)):
+            if qaa in qf_ignore:
+                data1[counter] = np.nan
+            if qbb in qf_ignore:
+                data2[counter] = np.nan
+    with np.errstate(invalid='ignore'):
+        return np.abs(data1-data2) >= max_diff
+
+
+def _reference_std_from_mean(data, nr_std=3):
+    """ Implementation of QC._check_std_from_mean before it was vectorized (boolean returned instead of None) """
+    data_array = np.array(data, dtype=float)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean_value = np.nanmean(data_array)
+        std_value = np.nanstd(data_array)
+    if np.isnan(mean_value):
+        return np.full(len(data_array), False)
+    with np.errstate(invalid='ignore'):
+        return np.abs(data_array - mean_value) > (std_value * float(nr_std))
 
 
 class TestQC(unittest.TestCase):
@@ -36,8 +129,9 @@ class TestQC(unittest.TestCase):
             body = os.path.splitext(file_name)[0]
             file_path = Path(self.qc_routines_directory, file_name)
             with open(file_path, encoding='utf8') as fid:
-                data = yaml.load(fid)
-                qc_index = data.get('functions').get(body).get('qc_index')
+                data = yaml.load(fid, Loader=yaml.UnsafeLoader)
+                routines = data.get('routines') or data.get('functions')
+                qc_index = routines.get(body).get('qc_index')
                 qc_index_list.append(qc_index)
 
         self.assertEqual(sorted(qc_index_list), sorted(set(qc_index_list)))
@@ -55,6 +149,12 @@ class TestQC(unittest.TestCase):
         decreasing()
         self.assertFalse(increasing.qc_passed)
         self.assertTrue(decreasing.qc_passed)
+        self.assertEqual(list(increasing.flag_return), ['A', 'A', 'B', 'A', 'A'])
+        self.assertEqual(increasing.flag_codes.dtype, np.uint8)
+
+        increasing = functions.continuous.Increasing(df, parameter='test_4', acceptable_error=0.1)
+        increasing()
+        self.assertTrue(increasing.qc_passed)
 
     def test_function_diff(self):
         df = pd.DataFrame({'a': [1, 2, 3, 7.2, 5, 6],
@@ -65,6 +165,374 @@ class TestQC(unittest.TestCase):
         diff()
         self.assertTrue(diff.qc_passed)
 
+    def test_rolling_statistics(self):
+        df = pd.DataFrame({'a': [1, 2, 3, 7.2, 5, 6, np.nan, 4, 3, 2],
+                           'b': [1000.1, 1000.2, 1000.1, 1000.3, 1000.2, 1000.1, 1000.4, 1000.2, 1000.1, 1000.]})
+        rolling_statistics = RollingStatistics(df, window=7, min_periods=3)
+        rolling_statistics.prepare(['a', 'b'])
+        for par in ['a', 'b']:
+            rolling = df[par].rolling(7, min_periods=3, center=True)
+            np.testing.assert_allclose(rolling_statistics.mean(par), rolling.mean(), atol=1e-9)
+            np.testing.assert_allclose(rolling_statistics.std(par), rolling.std(), atol=1e-9)
+
+    def test_rolling_statistics_groups(self):
+        df_1 = pd.DataFrame({'a': [1, 2, 3, 7.2, 5, 6]})
+        df_2 = pd.DataFrame({'a': [4, 3, 2, 1, 8]})
+        df = pd.concat([df_1, df_2], ignore_index=True)
+        rolling_statistics = RollingStatistics(df, groups=[0] * len(df_1) + [1] * len(df_2))
+        expected = pd.concat([df_1['a'].rolling(7, min_periods=3, center=True).std(),
+                              df_2['a'].rolling(7, min_periods=3, center=True).std()], ignore_index=True)
+        np.testing.assert_allclose(rolling_statistics.std('a'), expected, atol=1e-9)
+
+    def test_function_continuous_groups(self):
+        df = pd.DataFrame({'a': [1, 2, 3, 0, 1, 2]})
+        increasing = functions.continuous.Increasing(df, parameter='a', acceptable_error=0,
+                                                     groups=[0, 0, 0, 1, 1, 1])
+        increasing()
+        self.assertTrue(increasing.qc_passed)
+
+    def test_function_spike(self):
+        df = pd.DataFrame({'a': [1, 1.1, 1.2, 1.1, 5, 1.2, 1.1, 1.2, 1.1, 1.]})
+        spike = functions.spike.Spike(df, parameter='a', acceptable_stddev_factor=1.25, min_stddev_value=0.1,
+                                      rolling_statistics=RollingStatistics(df))
+        spike()
+        self.assertFalse(spike.qc_passed)
+        self.assertEqual(list(spike.flag_return).count('B'), 1)
+        self.assertEqual(spike.flag_return[4], 'B')
+
+        # Rolling statistics of other data are not used
+        other_df = pd.DataFrame({'a': [1.] * 10})
+        for rolling_statistics in [RollingStatistics(other_df), RollingStatistics(df.iloc[:5])]:
+            spike = functions.spike.Spike(df, parameter='a', acceptable_stddev_factor=1.25, min_stddev_value=0.1,
+                                          rolling_statistics=rolling_statistics)
+            self.assertIsNot(spike.rolling_statistics, rolling_statistics)
+            spike()
+            self.assertEqual(list(spike.flag_return).count('B'), 1)
+
+        # Rolling statistics of stacked profiles are used for one of the profiles
+        stacked_df = pd.concat([df, df], ignore_index=True)
+        rolling_statistics = RollingStatistics(stacked_df, groups=[0] * len(df) + [1] * len(df))
+        spike = functions.spike.Spike(stacked_df.iloc[len(df):], parameter='a', acceptable_stddev_factor=1.25,
+                                      min_stddev_value=0.1, rolling_statistics=rolling_statistics)
+        self.assertIs(spike.rolling_statistics, rolling_statistics)
+        spike()
+        self.assertEqual(spike.flag_return[4], 'B')
+
+        # Rolling statistics are not used for a part of a profile
+        for rolling_statistics in [RollingStatistics(df), rolling_statistics]:
+            part_df = rolling_statistics.df.iloc[2:7]
+            spike = functions.spike.Spike(part_df, parameter='a', acceptable_stddev_factor=1.25,
+                                          min_stddev_value=0.1, rolling_statistics=rolling_statistics)
+            self.assertIsNot(spike.rolling_statistics, rolling_statistics)
+            np.testing.assert_allclose(spike._mean, part_df['a'].rolling(7, min_periods=3, center=True).mean())
+
+    def test_rolling_statistics_complete_groups(self):
+        df = pd.DataFrame({'a': range(7)}, index=[10, 11, 12, 13, 14, 15, 16])
+        rolling_statistics = RollingStatistics(df, groups=[0, 0, 0, 1, 1, 2, 2])
+        self.assertTrue(rolling_statistics.has_complete_groups(df.index))
+        self.assertTrue(rolling_statistics.has_complete_groups([10, 11, 12, 15, 16]))
+        self.assertFalse(rolling_statistics.has_complete_groups([10, 11, 15, 16]))
+        self.assertFalse(rolling_statistics.has_complete_groups([13, 14, 17]))
+        self.assertFalse(rolling_statistics.has_complete_groups([13, 14, 10, 11, 12]))
+        self.assertFalse(rolling_statistics.has_complete_groups([]))
+        self.assertTrue(RollingStatistics(df).has_complete_groups(df.index))
+        self.assertFalse(RollingStatistics(df).has_complete_groups(df.index[1:]))
+
+    def test_flags(self):
+        matrix = flags.SHARK.strings_to_matrix(['A00BS', '0000S', 'AAAAA'], 5)
+        self.assertEqual(matrix.dtype, np.uint8)
+        self.assertEqual(list(flags.SHARK.matrix_to_strings(matrix)), ['A00BS', '0000S', 'AAAAA'])
+
+        combined = flags.SHARK.combine(flags.SHARK.to_codes(['A', 'S', 'B', 'S']),
+                                       flags.SHARK.to_codes(['S', 'B', 'S', '0']))
+        self.assertEqual(list(flags.SHARK.to_strings(combined)), ['S', 'B', 'B', 'S'])
+
+        # A new S overrides B within the same QC-routine
+        added = flags.add_routine_codes(flags.SHARK.to_codes(['0', 'A', 'S', 'B', 'B', 'S']),
+                                        flags.SHARK.to_codes(['B', 'S', 'B', 'S', 'A', 'A']))
+        self.assertEqual(list(flags.SHARK.to_strings(added)), ['B', 'S', 'B', 'S', 'B', 'S'])
+
+        self.assertEqual(list(flags.SHARK.to_codes(['', 'A'])), [flags.NO_QC, flags.ACCEPTED])
+        with self.assertRaises(ValueError):
+            flags.SHARK.to_codes(['A', 'X'])
+        with self.assertRaises(ValueError):
+            flags.SHARK.to_codes(['AB'])
+        with self.assertRaises(ValueError):
+            flags.SHARK.strings_to_matrix(['A00', 'A00BS'], 3)
+        self.assertEqual(list(flags.SHARK.matrix_to_strings(flags.SHARK.strings_to_matrix(['A', ''], 3))),
+                         ['A00', '000'])
+
+        combined = flags.CMEMS.combine(flags.CMEMS.to_codes(['1', '4', '2']), flags.CMEMS.to_codes(['3', '1', '9']))
+        self.assertEqual(list(flags.CMEMS.to_strings(combined)), ['3', '4', '9'])
+
+    def test_boolean_base(self):
+        df = pd.DataFrame({'a': [1., 2., np.nan, 4., 5.],
+                           'b': ['x', 'y', 'x', 'x', 'z']})
+        boolean_base = BooleanBaseDataFrame()
+        boolean_base.data = df
+        self.assertTrue(boolean_base.boolean)
+
+        evaluated_rows = []
+
+        def condition(rows):
+            evaluated_rows.extend(rows)
+            return np.ones(len(rows), dtype=bool)
+
+        boolean_base.add_boolean_greater_or_equal('a', 2)
+        boolean_base.add_boolean_equal('b', 'x')
+        boolean_base.boolean = condition
+        self.assertEqual(list(boolean_base.boolean), [False, False, False, True, False])
+        self.assertEqual(evaluated_rows, [3])
+
+        boolean_base.add_combo_boolean('a', df['a'] > 1)
+        boolean_base.add_combo_boolean('b', df['b'] == 'x')
+        self.assertEqual(list(boolean_base.combo_boolean_all), [False, False, False, True, False])
+        self.assertEqual(list(boolean_base.combo_boolean_any), [True, True, True, True, True])
+
+    def test_function_position(self):
+        df = pd.DataFrame({'lat': [57.1, 57.2, 95., 57.3, 57.4],
+                           'lon': [11.1, 11.2, 11.3, 181., 12.5]})
+        mask = functions.RasterMask(mask=[[False, False], [False, True]], lat_min=56., lon_min=11., resolution=1.)
+        location = functions.ImpossibleLocation(df, parameters=['lat', 'lon'], mask=mask)
+        location()
+        self.assertFalse(location.qc_passed)
+        self.assertEqual(list(location.flag_return), ['A', 'A', 'B', 'B', 'B'])
+
+        df['time'] = pd.to_datetime(['2020-01-01 00:00', '2020-01-01 01:00', '2020-01-01 01:01',
+                                     '2020-01-01 01:02', '2020-01-01 02:00'])
+        df['lat'] = [57., 57.05, 57.053, 57.5, 57.51]
+        df['lon'] = 11.
+        speed = functions.ImpossibleSpeed(df, parameters=['time', 'lat', 'lon'], max_speed=15)
+        speed()
+        self.assertEqual(list(speed.flag_return), ['A', 'A', 'A', 'B', 'A'])
+
+        speed = functions.ImpossibleSpeed(df, parameters=['time', 'lat', 'lon'], max_speed=15,
+                                          groups=np.array([0, 0, 0, 1, 1]))
+        speed()
+        self.assertTrue(speed.qc_passed)
+
+    def test_function_time(self):
+        df = pd.DataFrame({'time': ['2020-01-01 00:00', '2020-01-01 01:00', '2020-01-01 01:00',
+                                    '2020-01-01 00:30', '', '2020-01-01 02:00']})
+        time_check = functions.TimeMonotonic(df, parameter='time')
+        time_check()
+        self.assertFalse(time_check.qc_passed)
+        self.assertEqual(list(time_check.flag_return), ['A', 'A', 'A', 'B', 'B', 'A'])
+
+        # All samples of a profile share the same time
+        df = pd.DataFrame({'time': ['2020-01-01 00:00'] * 4})
+        time_check = functions.TimeMonotonic(df, parameter='time')
+        time_check()
+        self.assertTrue(time_check.qc_passed)
+
+        df = pd.DataFrame({'time': ['2020-01-01 00:00', '2020-01-01 01:00', '2020-01-01 00:00']})
+        time_check = functions.TimeMonotonic(df, parameter='time', groups=np.array([0, 0, 1]))
+        time_check()
+        self.assertTrue(time_check.qc_passed)
+
+        # Compared to the last valid time, not only to the previous row
+        df = pd.DataFrame({'time': ['2020-01-01 10:00', '', '2020-01-01 05:00', '2020-01-01 06:00',
+                                    '2020-01-01 11:00']})
+        time_check = functions.TimeMonotonic(df, parameter='time')
+        time_check()
+        self.assertEqual(list(time_check.flag_return), ['A', 'B', 'B', 'B', 'A'])
+
+        # Duplicated times
+        df = pd.DataFrame({'time': ['2020-01-01 00:00', '2020-01-01 01:00', '2020-01-01 01:00', '2020-01-01 00:00',
+                                    '2020-01-01 00:00', '2020-01-01 00:00', '2020-01-01 02:00']})
+        groups = np.array([0, 0, 0, 0, 1, 1, 1])
+        expected = {(True, False): ['A', 'A', 'A', 'B', 'B', 'B', 'A'],
+                    (False, False): ['A', 'A', 'B', 'B', 'B', 'B', 'A'],
+                    (True, True): ['A', 'A', 'A', 'B', 'A', 'A', 'A'],
+                    (False, True): ['A', 'A', 'B', 'B', 'A', 'B', 'A']}
+        for (allow_equal_times, use_groups), flag_list in expected.items():
+            time_check = functions.TimeMonotonic(df, parameter='time', allow_equal_times=allow_equal_times,
+                                                 groups=groups if use_groups else None)
+            time_check()
+            self.assertEqual(list(time_check.flag_return), flag_list, msg=f'{allow_equal_times}, {use_groups}')
+
+    def test_instrumentation(self):
+        registry = QCInstrumentation()
+        registry.add(registry.start(), source='test', routine='range', rows=10)
+        self.assertEqual(registry.records, [])
+        self.assertTrue(registry.get_dataframe().empty)
+
+        registry.enable()
+        start = registry.start()
+        registry.add(start, source='test', routine='range', parameter='a', rows=5,
+                     flag_counts=count_flag_codes(flags.SHARK.to_codes(['A', 'A', 'B', 'S', 'A'])))
+        registry.add(start, source='test', routine='range', parameter='b',
+                     flag_counts=count_changed_flags(['0', '0', '1'], ['0', '4', '4']))
+        registry.add(registry.start(), source='test', routine='range', parameter='a', rows=5)
+        summary = registry.summary()
+        self.assertEqual(summary.loc[('test', 'range'), 'calls'], 2)
+        self.assertEqual(summary.loc[('test', 'range'), 'rows'], 10)
+        self.assertEqual(summary.loc[('test', 'range'), 'flag_B'], 1)
+        self.assertEqual(summary.loc[('test', 'range'), 'flag_4'], 2)
+        self.assertIn('flag_S', registry.to_csv().splitlines()[0])
+        self.assertEqual(len(json.loads(registry.to_json())), 3)
+
+    def test_qc_range_file_limits_for_points(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = Path(directory, 'TEST.txt')
+            with open(file_path, 'w') as fid:
+                fid.write('month\tlat_min\tlat_max\tlon_min\tlon_max\tdepth_min\tdepth_max\trange_min\trange_max\n'
+                          '1\t50\t60\t0\t20\t0\t10\t1\t2\n'
+                          '1\t50\t60\t0\t20\t5\t20\t3\t4\n'
+                          '2\t50\t60\t0\t20\t0\t20\t5\t6\n')
+            range_file = QCrangeFile(str(file_path))
+
+        time = pd.to_datetime(['2020-01-01'] * 4 + ['2020-02-01', '2020-03-01'])
+        depth = [-1, 7, 15, 25, 3, 3]
+        limits, ambiguous = range_file.get_limits_for_points('range_min', 'range_max', time=time, depth=depth)
+        np.testing.assert_array_equal(limits['range_min'], [1, 1, 3, np.nan, 5, np.nan])
+        np.testing.assert_array_equal(limits['range_max'], [2, 2, 4, np.nan, 6, np.nan])
+        self.assertEqual(list(ambiguous), [False, True, False, False, False, False])
+
+        # Grid is built once for every combination of filters
+        grid = range_file._get_lookup_grid(('month', 'depth'))
+        limits, ambiguous = range_file.get_limits_for_points('range_min', time=time[:2], depth=depth[:2])
+        np.testing.assert_array_equal(limits['range_min'], [1, 1])
+        self.assertIs(range_file._get_lookup_grid(('month', 'depth')), grid)
+        limits, ambiguous = range_file.get_limits_for_points('range_min', depth=[3, 15], lat=[55, 55])
+        np.testing.assert_array_equal(limits['range_min'], [1, 3])
+        self.assertEqual(list(ambiguous), [True, True])
+        self.assertEqual(sorted(range_file._lookup_grids), [('lat', 'depth'), ('month', 'depth')])
+
+        for t, d, expected in zip(time, depth, limits['range_min']):
+            if np.isnan(expected) or d == 7:
+                continue
+            self.assertEqual(range_file.get_limit('range_min', time=t, depth=d)['range_min'], expected)
+
+    def test_profile_qc_equivalence(self):
+        rng = np.random.default_rng(0)
+        qc = QC()
+        flag_values = ['A', 'B', 'S', '?', '0', '']
+        for _ in range(50):
+            nr = rng.integers(1, 30)
+            data = list(np.round(rng.normal(10, 5, nr), 2))
+            data[rng.integers(nr)] = np.nan
+            data[rng.integers(nr)] = 0.
+            qf = list(rng.choice(flag_values, nr))
+
+            qfindex, new_qf, qfindex_numeric = qc.increasing(data=data, qf=qf, min_delta=0.5)
+            np.testing.assert_array_equal(qfindex, _reference_increasing(data, qf, min_delta=0.5))
+            np.testing.assert_array_equal(qfindex_numeric, np.flatnonzero(qfindex))
+            self.assertEqual(list(new_qf[qfindex]), ['B'] * len(qfindex_numeric))
+
+            qfindex, new_qf, qfindex_numeric = qc.range_check(data=data, qf=qf, lower_limit=5, upper_limit=15)
+            reference_qfindex, reference_qf = _reference_range_check(data, qf, 5, 15)
+            np.testing.assert_array_equal(qfindex, reference_qfindex)
+            np.testing.assert_array_equal(new_qf, reference_qf)
+
+            # Same result with flag codes
+            codes = flags.SHARK.to_codes(np.array(qf, dtype='U1'))
+            qfindex_codes, new_codes, _ = qc.range_check(data=data, qf=codes, lower_limit=5, upper_limit=15)
+            np.testing.assert_array_equal(qfindex_codes, reference_qfindex)
+            self.assertTrue((new_codes[qfindex_codes] == flags.BAD).all())
+
+    def test_profile_qc_equivalence_dens_diff_std(self):
+        rng = np.random.default_rng(4)
+        qc = QC()
+        flag_values = ['A', 'B', 'S', '?', '0', '']
+        for k in range(50):
+            nr = rng.integers(1, 30)
+            qf_ignore = ['B', 'S', '?'] if k % 2 else ['B']
+            temp = list(np.round(rng.normal(10, 5, nr), 2))
+            salt = list(np.round(rng.normal(7, 2, nr), 2))
+            pres = list(np.round(np.sort(rng.uniform(0, 100, nr)), 1))
+            temp[rng.integers(nr)] = np.nan
+            salt[rng.integers(nr)] = np.nan
+            qtemp, qsalt, qpres = [list(rng.choice(flag_values, nr)) for _ in range(3)]
+            if k % 5 == 0:
+                qsalt = []
+
+            qfindex, new_qf, qfindex_numeric = qc.increasing_dens(temperature=temp, qtemp=qtemp, salinity=salt,
+                                                                  qsalt=qsalt, pressure=pres, qpres=qpres,
+                                                                  min_delta=0.05, qf_ignore=qf_ignore)
+            dens = sw.pden(np.array(salt), np.array(temp), np.array(pres), 0)
+            np.testing.assert_array_equal(qfindex, _reference_increasing_dens(dens, qtemp, qsalt, qpres,
+                                                                              min_delta=0.05, qf_ignore=qf_ignore))
+            np.testing.assert_array_equal(qfindex_numeric, np.flatnonzero(qfindex))
+            self.assertEqual(list(new_qf[qfindex]), ['B'] * len(qfindex_numeric))
+
+            temp2 = list(np.array(temp) + rng.choice([0, 0.1, 0.3, np.nan], nr))
+            qtemp2 = list(rng.choice(flag_values, nr))
+            for qf_primary, qf_secondary in [(qtemp, qtemp2), (False, False)]:
+                qfindex, qfindex_numeric = qc.sensor_diff(data_primary=temp, qf_primary=qf_primary,
+                                                          data_secondary=temp2, qf_secondary=qf_secondary,
+                                                          max_diff=0.2, qf_ignore=qf_ignore)
+                np.testing.assert_array_equal(qfindex, _reference_sensor_diff(temp, qf_primary, temp2, qf_secondary,
+                                                                              max_diff=0.2, qf_ignore=qf_ignore))
+                np.testing.assert_array_equal(qfindex_numeric, np.flatnonzero(qfindex))
+
+            temp[rng.integers(nr)] = 50.
+            np.testing.assert_array_equal(qc._check_std_from_mean(data=temp, nr_std=2),
+                                          _reference_std_from_mean(temp, nr_std=2))
+
+        # Mean and std are calculated per profile
+        profiles = [[1, 2, np.nan, 1, 2, 9], [np.nan, np.nan], [5.], [10, 11, 10, 12, 40, 11, 10]]
+        groups = np.concatenate([[k] * len(profile) for k, profile in enumerate(profiles)])
+        np.testing.assert_array_equal(qc._check_std_from_mean(data=np.concatenate(profiles), nr_std=2, groups=groups),
+                                      np.concatenate([_reference_std_from_mean(profile, nr_std=2)
+                                                      for profile in profiles]))
+
+    def test_profile_qc_batch(self):
+        rng = np.random.default_rng(1)
+        qc = QC()
+        profiles = [dict(data=list(rng.normal(10, 5, n)), qf=list(rng.choice(['A', 'B', 'S'], n)))
+                    for n in [5, 1, 12, 7]]
+        results = qc.run_profiles('increasing', profiles, min_delta=0.5)
+        self.assertEqual(len(results), len(profiles))
+        for profile, result in zip(profiles, results):
+            expected = qc.increasing(min_delta=0.5, **profile)
+            for item, expected_item in zip(result, expected):
+                np.testing.assert_array_equal(item, expected_item)
+
+    def test_blueprint_parameter_mapping_not_kept_in_settings(self):
+        def get_data_item(depth_column, depth):
+            return dict(data=pd.DataFrame({depth_column: [str(value) for value in depth],
+                                           'TEMP_CTD': ['5.0'] * len(depth)}),
+                        metadata=pd.Series(['//METADATA']))
+
+        mapped_item = get_data_item('DEPTH', [1, 2, 3])
+        QCBlueprint(mapped_item, parameter_mapping={'DEPH': 'DEPTH'})()
+        self.assertEqual(Settings().qc_range['datasets']['DEPH']['parameter'], 'DEPH')
+
+        data_item = get_data_item('DEPH', [1, 2, 3000])
+        QCBlueprint(data_item, parameter_mapping={'DEPH': 'DEPTH'})()
+        qc_index = Settings().qc_routines['qc_range']
+        self.assertEqual([flag[qc_index] for flag in data_item['data']['Q0_DEPH']], ['A', 'A', 'B'])
+
+        routines = Settings().qc_routines
+        routines.clear()
+        self.assertTrue(Settings().qc_routines)
+
+    def test_blueprint_position_flags(self):
+        def get_data_item(lat, lon):
+            return dict(data=pd.DataFrame({'time': ['2020-01-01 10:00'] * 3,
+                                           'LATITUDE_DD': lat,
+                                           'LONGITUDE_DD': lon,
+                                           'TEMP_CTD': ['5.0'] * 3}),
+                        metadata=pd.Series(['//METADATA']))
+
+        qc_index = Settings().qc_routines['qc_position']
+        data_item = get_data_item(['57.1', '95.0', '57.1'], ['11.5', '11.5', '11.5'])
+        QCBlueprint(data_item, parameter_mapping={})()
+        df = data_item['data']
+        self.assertEqual([flag[qc_index] for flag in df['Q0_LATITUDE_DD']], ['A', 'B', 'A'])
+        self.assertEqual([flag[qc_index] for flag in df['Q0_LONGITUDE_DD']], ['A', 'B', 'A'])
+        self.assertEqual(df['Q_LATITUDE_DD'][1], 'B')
+        self.assertEqual(df['Q_LONGITUDE_DD'][1], 'B')
+        self.assertNotIn('B', ''.join(df['Q0_time']))
+
+        data_items = {'a': get_data_item(['57.1', '57.2', '57.3'], ['11.5', '11.5', '11.5']),
+                      'b': get_data_item(['57.1', '57.2', '57.3'], ['11.5', '190.0', '11.5'])}
+        QCBlueprintBatch(data_items, parameter_mapping={})()
+        self.assertEqual([flag[qc_index] for flag in data_items['a']['data']['Q0_LONGITUDE_DD']], ['A', 'A', 'A'])
+        self.assertEqual([flag[qc_index] for flag in data_items['b']['data']['Q0_LONGITUDE_DD']], ['A', 'B', 'A'])
+        self.assertEqual(data_items['b']['data']['Q_LONGITUDE_DD'][1], 'B')
+
     def test_mask_areas(self):
         mask_dir = MaskAreasDirectory()
         mask_obj = mask_dir.get_file_object('mask_areas_tavastland.txt')